@@ -25,6 +25,7 @@ from PyQt6 import QtCore, QtWidgets
 from beeref import constants
 from beeref.assets import BeeAssets
 from beeref.config import CommandlineArgs, BeeSettings, logfile_name
+from beeref import tiles
 from beeref.utils import create_palette_from_dict
 from beeref.view import BeeGraphicsView
 
@@ -107,6 +108,7 @@ def main():
     logger.info(f'Logging to: {logfile_name()}')
     CommandlineArgs(with_check=True)  # Force checking
     app = BeeRefApplication(sys.argv)
+    tiles.set_allocation_limit()
     palette = create_palette_from_dict(constants.COLORS)
     app.setPalette(palette)
 
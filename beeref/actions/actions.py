@@ -32,6 +32,17 @@ actions = [
         'shortcuts': ['Ctrl+Shift+S'],
         'callback': 'on_action_save_as',
     },
+    {
+        'id': 'link_folder',
+        'text': '&Link Folder...',
+        'callback': 'on_action_link_folder',
+    },
+    {
+        'id': 'unlink_folder',
+        'text': 'U&nlink Folder',
+        'callback': 'on_action_unlink_folder',
+        'group': 'active_when_linked_folder',
+    },
     {
         'id': 'quit',
         'text': '&Quit',
@@ -152,6 +163,22 @@ actions = [
         'callback': 'on_action_crop',
         'group': 'active_when_croppable',
     },
+    {
+        'id': 'bake_crop',
+        'text': '&Bake Crop',
+        'callback': 'on_action_bake_crop',
+        'group': 'active_when_selection',
+    },
+    {
+        'id': 'bake_all_crops',
+        'text': 'Ba&ke All Crops',
+        'callback': 'on_action_bake_all_crops',
+    },
+    {
+        'id': 'optimize_resolution',
+        'text': 'Optimi&ze Resolution...',
+        'callback': 'on_action_optimize_resolution',
+    },
     {
         'id': 'flip_horizontally',
         'text': 'Flip &Horizontally',
@@ -278,6 +305,28 @@ actions = [
         'checkable': True,
         'callback': 'on_action_always_on_top',
     },
+    {
+        'id': 'smooth_rendering',
+        'text': 'Smoot&h Rendering',
+        'checkable': True,
+        'checked': True,
+        'settings': 'View/smooth_rendering',
+        'callback': 'on_action_smooth_rendering',
+    },
+    {
+        'id': 'render_cache',
+        'text': 'Cache &Rendered Images',
+        'checkable': True,
+        'settings': 'View/render_cache',
+        'callback': 'on_action_render_cache',
+    },
+    {
+        'id': 'viewport_cache',
+        'text': 'Cache Rendered &Viewport',
+        'checkable': True,
+        'settings': 'View/viewport_cache',
+        'callback': 'on_action_viewport_cache',
+    },
     {
         'id': 'open_settings_dir',
         'text': 'Open Settings Folder',
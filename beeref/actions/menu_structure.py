@@ -29,6 +29,9 @@ menu_structure = [
             'save',
             'save_as',
             MENU_SEPARATOR,
+            'link_folder',
+            'unlink_folder',
+            MENU_SEPARATOR,
             'quit',
         ],
     },
@@ -61,6 +64,10 @@ menu_structure = [
             'show_scrollbars',
             'show_menubar',
             'show_titlebar',
+            MENU_SEPARATOR,
+            'smooth_rendering',
+            'render_cache',
+            'viewport_cache',
         ],
     },
     {
@@ -82,6 +89,10 @@ menu_structure = [
             'reset_flip',
             'reset_crop',
             'reset_transforms',
+            MENU_SEPARATOR,
+            'bake_crop',
+            'bake_all_crops',
+            'optimize_resolution',
         ],
     },
     {
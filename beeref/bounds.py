@@ -0,0 +1,108 @@
+# This file is part of BeeRef.
+#
+# BeeRef is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BeeRef is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Keeps the bounding rect of many individually changing rects.
+
+Each edge of the bounding rect is tracked in a heap. Changed or removed
+rects leave stale heap entries behind, which are skipped when they reach
+the top, so updates and queries take O(log n) amortized.
+"""
+
+import heapq
+import itertools
+
+from PyQt6 import QtCore
+
+
+class BoundsIndex:
+    """Rects by key and the bounding rect of all of them."""
+
+    def __init__(self):
+        self.rects = {}
+        # left, top, -right, -bottom
+        self.heaps = ([], [], [], [])
+        self.versions = itertools.count()
+
+    def __len__(self):
+        return len(self.rects)
+
+    def __contains__(self, key):
+        return key in self.rects
+
+    def get(self, key):
+        entry = self.rects.get(key)
+        return entry[0] if entry else None
+
+    def set(self, key, rect):
+        self.update([(key, rect)])
+
+    def update(self, rects):
+        """Set the rects of many keys at once, given as ``(key, rect)``
+        pairs. Large batches are heapified in one go instead of pushing
+        each entry."""
+
+        entries = ([], [], [], [])
+        for key, rect in rects:
+            version = next(self.versions)
+            self.rects[key] = (QtCore.QRectF(rect), version)
+            edges = (rect.left(), rect.top(), -rect.right(), -rect.bottom())
+            for column, value in zip(entries, edges):
+                column.append((value, version, key))
+
+        if len(entries[0]) > len(self.heaps[0]) // 4:
+            for heap, column in zip(self.heaps, entries):
+                heap.extend(column)
+                heapq.heapify(heap)
+        else:
+            for heap, column in zip(self.heaps, entries):
+                for entry in column:
+                    heapq.heappush(heap, entry)
+        self._compact()
+
+    def remove(self, key):
+        self.remove_many([key])
+
+    def remove_many(self, keys):
+        for key in keys:
+            self.rects.pop(key, None)
+        self._compact()
+
+    def _compact(self):
+        """Rebuild the heaps when they are mostly stale entries."""
+
+        if len(self.heaps[0]) <= 2 * len(self.rects) + 16:
+            return
+        self.heaps = ([], [], [], [])
+        for key, (rect, version) in self.rects.items():
+            edges = (rect.left(), rect.top(), -rect.right(), -rect.bottom())
+            for heap, value in zip(self.heaps, edges):
+                heap.append((value, version, key))
+        for heap in self.heaps:
+            heapq.heapify(heap)
+
+    def _edge(self, heap):
+        while True:
+            value, version, key = heap[0]
+            entry = self.rects.get(key)
+            if entry and entry[1] == version:
+                return value
+            heapq.heappop(heap)
+
+    def bounding_rect(self):
+        if not self.rects:
+            return QtCore.QRectF(0, 0, 0, 0)
+        left, top, right, bottom = (self._edge(heap) for heap in self.heaps)
+        return QtCore.QRectF(QtCore.QPointF(left, top),
+                             QtCore.QPointF(-right, -bottom))
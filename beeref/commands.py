@@ -13,8 +13,191 @@
 # You should have received a copy of the GNU General Public License
 # along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
 
+import logging
+import time
+
 from PyQt6 import QtCore, QtGui
 
+from beeref.config import BeeSettings
+from beeref.pixelcache import SpilledData, get_pixel_cache
+
+
+logger = logging.getLogger(__name__)
+
+# Default in MB, can be changed in the settings file
+UNDO_BUDGET_MB = 512
+
+# Consecutive move, scale and rotate commands on the same items are
+# merged if they are pushed within this many seconds of each other
+MERGE_INTERVAL = 1.0
+
+MOVE_ITEMS_ID = 1
+SCALE_ITEMS_ID = 2
+ROTATE_ITEMS_ID = 3
+
+
+class BeeUndoStack(QtGui.QUndoStack):
+    """Undo stack that keeps the memory held by its commands within a
+    budget.
+
+    Commands that hold on to image data implement ``cost``, returning
+    the bytes they keep in RAM, and ``spill``, moving that data to a
+    spill file. When over budget, the commands furthest away from the
+    current index are spilled first.
+
+    Costs are cached with a running total. A command's cost only
+    changes when it is undone or redone, which moves its items in or
+    out of the scene, or when it is spilled.
+    """
+
+    def __init__(self, parent=None, budget=None):
+        super().__init__(parent)
+        if budget is None:
+            budget = BeeSettings().value(
+                'Memory/undo_budget_mb', UNDO_BUDGET_MB, type=int) * 2**20
+        self.budget = budget
+        # Top level commands as of the last index change, with the
+        # commands inside them that implement ``cost``
+        self.tops = []
+        self.costly = {}
+        self.costs = {}
+        self.total_cost = 0
+        self.cost_index = 0
+        self.indexChanged.connect(self.on_index_changed)
+
+    def commands(self):
+        return [self.command(i) for i in range(self.count())]
+
+    def discard(self, command):
+        """Remove a command whose changes have been reverted outside of
+        the undo stack.
+
+        The most recent command is removed right away. Older ones are
+        made obsolete, so that the stack drops them without undoing or
+        redoing them once they are reached.
+        """
+
+        command.setObsolete(True)
+        index = self.index()
+        if index and self.command(index - 1) is command:
+            self.undo()
+
+    def memory_usage(self):
+        return self.total_cost
+
+    def on_index_changed(self, index):
+        self.update_costs(index)
+        self.enforce_budget()
+
+    def set_cost(self, cmd, cost):
+        self.total_cost += cost - self.costs.get(cmd, 0)
+        self.costs[cmd] = cost
+
+    def update_costs(self, index):
+        """Update the cached costs of the commands that have been
+        pushed, dropped, undone or redone since the last call."""
+
+        count = self.count()
+        if count == len(self.tops) and (
+                not count or self.command(count - 1) is self.tops[-1]):
+            # Only undo or redo
+            low = min(index, self.cost_index)
+            high = max(index, self.cost_index)
+            changed = self.tops[low:high]
+        else:
+            # Commands have been pushed, or dropped by pushing, by the
+            # undo limit or by becoming obsolete
+            tops = self.commands()
+            current = set(tops)
+            for top in self.tops:
+                if top not in current:
+                    for cmd in self.costly.pop(top):
+                        self.total_cost -= self.costs.pop(cmd)
+            known = set(self.tops)
+            done_before = set(self.tops[:self.cost_index])
+            done_now = set(tops[:index])
+            changed = [top for top in tops
+                       if top not in known
+                       or (top in done_before) != (top in done_now)]
+            for top in changed:
+                if top not in known:
+                    self.costly[top] = list(costly_children(top))
+            self.tops = tops
+
+        for top in changed:
+            for cmd in self.costly[top]:
+                self.set_cost(cmd, cmd.cost())
+        self.cost_index = index
+
+    def enforce_budget(self):
+        if self.total_cost <= self.budget:
+            return
+
+        logger.debug(f'Undo history uses {self.total_cost} bytes, spilling')
+        spill_file = get_pixel_cache().get_spill_file()
+        index = self.index()
+        costly = [(abs(i - index), cmd)
+                  for i, top in enumerate(self.tops)
+                  for cmd in self.costly[top]
+                  if self.costs[cmd]]
+        costly.sort(key=lambda entry: entry[0], reverse=True)
+        for distance, cmd in costly:
+            if self.total_cost <= self.budget:
+                break
+            cmd.spill(spill_file)
+            self.set_cost(cmd, cmd.cost())
+
+
+def costly_children(cmd):
+    """Yields the command and all commands inside it, e.g. in macros,
+    that implement ``cost``."""
+
+    if hasattr(cmd, 'cost'):
+        yield cmd
+    for i in range(cmd.childCount()):
+        yield from costly_children(cmd.child(i))
+
+
+def items_cost(items):
+    """Memory used by the image data of items that aren't in a scene,
+    i.e. that are only kept by an undo command."""
+
+    return sum(item.memory_usage() for item in items
+               if item.scene() is None and hasattr(item, 'memory_usage'))
+
+
+def spill_items(items, spill_file):
+    for item in items:
+        if item.scene() is None and hasattr(item, 'spill'):
+            item.spill(spill_file)
+
+
+def data_cost(values):
+    """Memory used by encoded image data in RAM kept in ``values``."""
+
+    return sum(len(value['data']) for value in values
+               if not isinstance(value['data'], SpilledData))
+
+
+def spill_data(values, spill_file):
+    for value in values:
+        if not isinstance(value['data'], SpilledData):
+            value['data'] = SpilledData(spill_file, value['data'])
+
+
+def read_data(data):
+    if isinstance(data, SpilledData):
+        return data.read()
+    return data
+
+
+def can_merge(command, other):
+    """Whether ``other`` directly follows ``command`` on the same
+    items."""
+
+    return (set(command.items) == set(other.items)
+            and other.timestamp - command.timestamp <= MERGE_INTERVAL)
+
 
 class InsertItems(QtGui.QUndoCommand):
 
@@ -35,19 +218,26 @@ class InsertItems(QtGui.QUndoCommand):
             for item in self.items:
                 self.old_positions.append(item.pos())
                 item.setPos(item.pos() + self.position - rect.center())
-        self.scene.clearSelection()
-        for item in self.items:
-            self.scene.addItem(item)
-            item.setSelected(True)
+        with self.scene.bulk_mutation(len(self.items)):
+            for item in self.items:
+                self.scene.addItem(item)
+            self.scene.select_items(self.items, clear=True)
 
     def undo(self):
-        self.scene.clearSelection()
-        for item in self.items:
-            self.scene.removeItem(item)
+        with self.scene.bulk_mutation(len(self.items)):
+            self.scene.clearSelection()
+            for item in self.items:
+                self.scene.removeItem(item)
         if self.position:
             for item, pos in zip(self.items, self.old_positions):
                 item.setPos(pos)
 
+    def cost(self):
+        return items_cost(self.items)
+
+    def spill(self, spill_file):
+        spill_items(self.items, spill_file)
+
 
 class DeleteItems(QtGui.QUndoCommand):
 
@@ -57,14 +247,22 @@ class DeleteItems(QtGui.QUndoCommand):
         self.items = items
 
     def redo(self):
-        for item in self.items:
-            self.scene.removeItem(item)
+        with self.scene.bulk_mutation(len(self.items)):
+            for item in self.items:
+                self.scene.removeItem(item)
 
     def undo(self):
-        self.scene.clearSelection()
-        for item in self.items:
-            item.setSelected(True)
-            self.scene.addItem(item)
+        with self.scene.bulk_mutation(len(self.items)):
+            self.scene.clearSelection()
+            for item in self.items:
+                item.setSelected(True)
+                self.scene.addItem(item)
+
+    def cost(self):
+        return items_cost(self.items)
+
+    def spill(self, spill_file):
+        spill_items(self.items, spill_file)
 
 
 class MoveItemsBy(QtGui.QUndoCommand):
@@ -74,6 +272,18 @@ class MoveItemsBy(QtGui.QUndoCommand):
         self.items = items
         self.delta = delta
         self.ignore_first_redo = ignore_first_redo
+        self.timestamp = time.monotonic()
+
+    def id(self):
+        return MOVE_ITEMS_ID
+
+    def mergeWith(self, other):
+        if not can_merge(self, other):
+            return False
+        self.delta = self.delta + other.delta
+        self.timestamp = other.timestamp
+        self.setObsolete(self.delta.isNull())
+        return True
 
     def redo(self):
         if self.ignore_first_redo:
@@ -96,6 +306,18 @@ class ScaleItemsBy(QtGui.QUndoCommand):
         self.items = items
         self.factor = factor
         self.anchor = anchor
+        self.timestamp = time.monotonic()
+
+    def id(self):
+        return SCALE_ITEMS_ID
+
+    def mergeWith(self, other):
+        if not (can_merge(self, other) and self.anchor == other.anchor):
+            return False
+        self.factor *= other.factor
+        self.timestamp = other.timestamp
+        self.setObsolete(self.factor == 1)
+        return True
 
     def redo(self):
         if self.ignore_first_redo:
@@ -120,6 +342,18 @@ class RotateItemsBy(QtGui.QUndoCommand):
         self.items = items
         self.delta = delta
         self.anchor = anchor
+        self.timestamp = time.monotonic()
+
+    def id(self):
+        return ROTATE_ITEMS_ID
+
+    def mergeWith(self, other):
+        if not (can_merge(self, other) and self.anchor == other.anchor):
+            return False
+        self.delta += other.delta
+        self.timestamp = other.timestamp
+        self.setObsolete(self.delta == 0)
+        return True
 
     def redo(self):
         if self.ignore_first_redo:
@@ -144,10 +378,10 @@ class NormalizeItems(QtGui.QUndoCommand):
         self.scale_factors = scale_factors
 
     def redo(self):
-        self.old_scale_factors = []
-        for item, factor in zip(self.items, self.scale_factors):
-            self.old_scale_factors.append(item.scale())
-            item.setScale(item.scale() * factor, item.center)
+        self.old_scale_factors = [item.scale() for item in self.items]
+        for item, old, factor in zip(
+                self.items, self.old_scale_factors, self.scale_factors):
+            item.setScale(old * factor, item.center)
 
     def undo(self):
         for item, factor in zip(self.items, self.old_scale_factors):
@@ -240,6 +474,100 @@ class ResetCrop(QtGui.QUndoCommand):
             item.crop = crop
 
 
+class BakeCrops(QtGui.QUndoCommand):
+    """Replaces the images of the items with their cropped regions,
+    given as ``(image, source_bytes)`` tuples. ``old_data`` holds the
+    full images encoded, so that we don't hold on to the decoded pixels
+    we wanted to get rid of; see ``fileio.crop_images``."""
+
+    def __init__(self, items, images, old_data):
+        super().__init__('Bake Crops')
+        self.items = items
+        self.images = images
+        self.old_values = [{'data': data} for data in old_data]
+
+    def redo(self):
+        for item, (img, source_bytes), old in zip(
+                self.items, self.images, self.old_values):
+            old['crop'] = item.crop
+            old['pos'] = item.pos()
+            item.bake_crop(img, source_bytes)
+
+    def undo(self):
+        for item, old in zip(self.items, self.old_values):
+            item.pixmap_from_bytes(read_data(old['data']))
+            item.crop = old['crop']
+            item.setPos(old['pos'])
+
+    def cost(self):
+        return data_cost(self.old_values)
+
+    def spill(self, spill_file):
+        spill_data(self.old_values, spill_file)
+
+
+class ResampleImages(QtGui.QUndoCommand):
+    """Replaces the images of the items with resampled versions, given
+    as ``(image, source_bytes)`` tuples. ``old_data`` holds the current
+    images encoded, since encoding them here would block the main
+    thread; see ``fileio.resample_images``."""
+
+    def __init__(self, items, images, old_data):
+        super().__init__('Optimize Resolution')
+        self.items = items
+        self.images = images
+        self.old_values = [{'data': data} for data in old_data]
+
+    def redo(self):
+        for item, (img, source_bytes), old in zip(
+                self.items, self.images, self.old_values):
+            old['crop'] = item.crop
+            old['scale'] = item.scale()
+            item.resample_image(img, source_bytes)
+
+    def undo(self):
+        for item, old in zip(self.items, self.old_values):
+            item.pixmap_from_bytes(read_data(old['data']))
+            item.crop = old['crop']
+            item.setScale(old['scale'])
+
+    def cost(self):
+        return data_cost(self.old_values)
+
+    def spill(self, spill_file):
+        spill_data(self.old_values, spill_file)
+
+
+class ReplaceImages(QtGui.QUndoCommand):
+    """Replaces the images of the items with the given images, which
+    are ``(image, source_bytes)`` tuples."""
+
+    def __init__(self, items, images):
+        super().__init__('Update Images')
+        self.items = items
+        self.images = images
+
+    def redo(self):
+        self.old_values = []
+        for item, (img, source_bytes) in zip(self.items, self.images):
+            self.old_values.append({
+                'data': item.pixmap_to_bytes(),
+                'crop': item.crop,
+            })
+            item.replace_image(img, source_bytes)
+
+    def undo(self):
+        for item, old in zip(self.items, self.old_values):
+            item.pixmap_from_bytes(read_data(old['data']))
+            item.crop = old['crop']
+
+    def cost(self):
+        return data_cost(getattr(self, 'old_values', []))
+
+    def spill(self, spill_file):
+        spill_data(getattr(self, 'old_values', []), spill_file)
+
+
 class ResetTransforms(QtGui.QUndoCommand):
 
     def __init__(self, items):
@@ -283,13 +611,14 @@ class ArrangeItems(QtGui.QUndoCommand):
         self.positions = positions
 
     def redo(self):
-        self.old_positions = []
-        for item, pos in zip(self.items, self.positions):
-            self.old_positions.append(item.pos())
-            orig_topleft = item.mapToScene(QtCore.QPointF(0, 0))
-            rect_topleft = self.scene.itemsBoundingRect(
-                items=[item]).topLeft()
-            item.setPos(pos + orig_topleft - rect_topleft)
+        geometry = self.scene.item_geometry(self.items)
+        self.old_positions = [QtCore.QPointF(x, y)
+                              for x, y in zip(geometry.x, geometry.y)]
+        for item, pos, x, y, left, top in zip(
+                self.items, self.positions, geometry.x, geometry.y,
+                geometry.left, geometry.top):
+            # Positions are given for the top left of the bounding rect
+            item.setPos(pos.x() + x - left, pos.y() + y - top)
 
     def undo(self):
         for item, pos in zip(self.items, self.old_positions):
@@ -36,5 +36,6 @@ COLORS = {
     # BeeRef specific:
     'Scene:Selection': (116, 234, 231),
     'Scene:Canvas': (60, 60, 60),
+    'Scene:Placeholder': (90, 90, 90),
     'Scene:Text': (200, 200, 200)
 }
@@ -13,15 +13,33 @@
 # You should have received a copy of the GNU General Public License
 # along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
 
+from concurrent.futures import ThreadPoolExecutor
 import logging
+import os
+import os.path
 
-from PyQt6 import QtCore
+from PyQt6 import QtCore, QtGui
 
 from beeref import commands
+from beeref import utils
+from beeref.fileio.archive import (
+    ARCHIVE_ERRORS,
+    ARCHIVE_EXTENSIONS,
+    is_archive,
+    iter_archive_images,
+    local_path,
+)
 from beeref.fileio.errors import BeeFileIOError
-from beeref.fileio.image import load_image
+from beeref.fileio.image import (
+    encoded_image_from_mimedata,
+    image_size_from_bytes,
+    image_with_source,
+    load_image,
+)
 from beeref.fileio.sql import SQLiteIO, is_bee_file
-from beeref.items import BeePixmapItem
+from beeref.fileio.watcher import FolderWatcher
+from beeref.items import BeePixmapItem, BeeTiledPixmapItem
+from beeref import tiles
 
 
 __all__ = [
@@ -29,6 +47,15 @@ __all__ = [
     'load_bee',
     'save_bee',
     'load_images',
+    'load_images_from_archives',
+    'load_image_data',
+    'load_images_into_queue',
+    'resample_images',
+    'FolderWatcher',
+    'is_archive',
+    'ARCHIVE_EXTENSIONS',
+    'encoded_image_from_mimedata',
+    'image_size_from_bytes',
     'ThreadedLoader',
     'BeeFileIOError',
 ]
@@ -52,25 +79,99 @@ def save_bee(filename, scene, create_new=False, worker=None):
     logger.info('Saved!')
 
 
+def _add_image_later(img, filename, pos, scene, items, source_bytes=None):
+    item = BeePixmapItem(img, filename)
+    # Keeping the encoded data saves the pixel cache from encoding the
+    # image on the main thread when it needs to drop the pixmap
+    item.source_bytes = source_bytes
+    item.set_pos_center(pos)
+    scene.add_item_later({'item': item, 'type': 'pixmap'}, selected=True)
+    items.append(item)
+
+
+def _add_tiled_image_later(path, pos, scene, items):
+    """Split a large image file into tiles and add it as a tiled item.
+    Returns ``False`` if the image can't be read."""
+
+    logger.info(f'Loading large image as tiles from file {path}')
+    store = tiles.tile_image_file(path)
+    if store is None:
+        return False
+    item = BeeTiledPixmapItem(store, path)
+    item.set_pos_center(pos)
+    scene.add_item_later(
+        {'item': item, 'type': 'tiledpixmap'}, selected=True)
+    items.append(item)
+    return True
+
+
+def _load_archive(filename, pos, scene, worker, items, errors,
+                  on_progress=None):
+    """Stream the images from the archive ``filename`` into the scene.
+
+    :param on_progress: Called with the number of bytes read from the
+        archive so far after each image
+    :returns: ``False`` if the worker has been canceled, else ``True``
+    """
+
+    logger.info(f'Loading images from archive {filename}')
+    try:
+        for name, data, position in iter_archive_images(filename):
+            path = os.path.join(filename, name)
+            logger.debug(f'Loading image from archive entry {path}')
+            img, source_bytes = image_with_source(path, data)
+            if img.isNull():
+                logger.info(f'Could not load archive entry {path}')
+                errors.append(path)
+            else:
+                _add_image_later(img, path, pos, scene, items, source_bytes)
+            if on_progress:
+                on_progress(position)
+            if worker.canceled:
+                return False
+            # Give main thread time to process items:
+            worker.msleep(10)
+    except ARCHIVE_ERRORS:
+        logger.exception(f'Could not read archive {filename}')
+        errors.append(filename)
+    return True
+
+
 def load_images(filenames, pos, scene, worker):
-    """Add images to existing scene."""
+    """Add images to existing scene.
+
+    Archives among the given files are streamed image by image.
+    """
 
     errors = []
     items = []
     worker.begin_processing.emit(len(filenames))
     for i, filename in enumerate(filenames):
+        if is_archive(filename):
+            if not _load_archive(local_path(filename), pos, scene, worker,
+                                 items, errors):
+                break
+            worker.progress.emit(i)
+            continue
+
+        path = local_path(filename)
+        if path and tiles.is_large_image(path):
+            if not _add_tiled_image_later(path, pos, scene, items):
+                errors.append(path)
+            worker.progress.emit(i)
+            if worker.canceled:
+                break
+            continue
+
         logger.info(f'Loading image from file {filename}')
-        img, filename = load_image(filename)
+        img, filename, source_bytes = load_image(filename)
         worker.progress.emit(i)
         if img.isNull():
             logger.info(f'Could not load file {filename}')
             errors.append(filename)
             continue
 
-        item = BeePixmapItem(img, filename)
-        item.set_pos_center(pos)
-        scene.add_item_later({'item': item, 'type': 'pixmap'}, selected=True)
-        items.append(item)
+        _add_image_later(img, filename, pos, scene, items, source_bytes)
         if worker.canceled:
             break
         # Give main thread time to process items:
@@ -81,6 +182,141 @@ def load_images(filenames, pos, scene, worker):
     worker.finished.emit('', errors)
 
 
+def load_images_from_archives(filenames, pos, scene, worker):
+    """Add images from ZIP/TAR archives to existing scene.
+
+    The archive entries are streamed without extracting them to
+    disk. Progress is reported in KiB read from the archive files.
+    """
+
+    errors = []
+    items = []
+    filenames = [local_path(filename) for filename in filenames]
+    sizes = [os.path.getsize(filename) if os.path.exists(filename) else 0
+             for filename in filenames]
+    worker.begin_processing.emit(sum(sizes) // 1024)
+    done = 0
+    for filename, size in zip(filenames, sizes):
+        def on_progress(position):
+            worker.progress.emit((done + position) // 1024)
+
+        if not _load_archive(filename, pos, scene, worker, items, errors,
+                             on_progress):
+            break
+        done += size
+
+    scene.undo_stack.push(
+        commands.InsertItems(scene, items, ignore_first_redo=True))
+    worker.finished.emit('', errors)
+
+
+def load_images_into_queue(filenames, queue, worker):
+    """Decode images without creating items, for updating existing items
+    in place.
+
+    The results are put into ``queue`` as ``(filename, image,
+    source_bytes)`` tuples, see ``load_image``.
+    """
+
+    errors = []
+    worker.begin_processing.emit(len(filenames))
+    for i, filename in enumerate(filenames):
+        logger.info(f'Loading image from file {filename}')
+        img, filename, source_bytes = load_image(filename)
+        worker.progress.emit(i)
+        if img.isNull():
+            logger.info(f'Could not load file {filename}')
+            errors.append(filename)
+        else:
+            queue.put((filename, img, source_bytes))
+        if worker.canceled:
+            break
+    worker.finished.emit('', errors)
+
+
+def _process_images(func, jobs, worker):
+    """Apply ``func`` to each job in a thread pool."""
+
+    worker.begin_processing.emit(len(jobs))
+    with ThreadPoolExecutor() as executor:
+        for i, _ in enumerate(executor.map(func, jobs)):
+            worker.progress.emit(i)
+            if worker.canceled:
+                executor.shutdown(cancel_futures=True)
+                break
+    worker.finished.emit('', [])
+
+
+def _encode_results(job):
+    job['result_data'] = utils.image_to_bytes(job['result'])
+    job['old_data'] = (job.get('source_bytes')
+                       or utils.image_to_bytes(job['image']))
+
+
+def resample_images(jobs, worker):
+    """Resample images in a thread pool.
+
+    :param jobs: List of dicts with the ``image`` to resample, the
+        target ``size`` and optionally the image's encoded
+        ``source_bytes``. The resampled image is stored as ``result``
+        and encoded as ``result_data``. The original image is stored
+        encoded as ``old_data``, so that it can be restored later.
+    """
+
+    def resample(job):
+        job['result'] = job['image'].scaled(
+            job['size'],
+            QtCore.Qt.AspectRatioMode.IgnoreAspectRatio,
+            QtCore.Qt.TransformationMode.SmoothTransformation)
+        _encode_results(job)
+
+    _process_images(resample, jobs, worker)
+
+
+def crop_images(jobs, worker):
+    """Cut regions out of images in a thread pool.
+
+    :param jobs: List of dicts with the ``image``, the ``rect`` to keep
+        and optionally the image's encoded ``source_bytes``. Results
+        are stored like with ``resample_images``.
+    """
+
+    def crop(job):
+        job['result'] = job['image'].copy(job['rect'])
+        _encode_results(job)
+
+    _process_images(crop, jobs, worker)
+
+
+def load_image_data(data, item, worker):
+    """Decode and convert raw image data for a placeholder item (see
+    ``BeePixmapItem.create_placeholder``).
+
+    The result is stored as the item's pending image, which needs to be
+    applied on the main thread once the worker has finished.
+
+    :param data: A ``QImage`` or encoded image data as bytes
+    """
+
+    errors = []
+    if isinstance(data, QtGui.QImage):
+        img = data
+        source_bytes = None
+    else:
+        img = QtGui.QImage.fromData(data)
+        source_bytes = data
+
+    if img.isNull():
+        logger.info('Could not decode image data')
+        errors.append('Image data')
+    else:
+        img = utils.optimize_pixel_format(img)
+        if source_bytes is None:
+            source_bytes = utils.image_to_bytes(img)
+        item.pending_image = (img, source_bytes)
+    worker.finished.emit('', errors)
+
+
 class ThreadedIO(QtCore.QThread):
     """Dedicated thread for loading and saving."""
 
@@ -96,6 +332,14 @@ class ThreadedIO(QtCore.QThread):
         self.kwargs['worker'] = self
         self.canceled = False
 
+    @property
+    def thread_finished(self):
+        """QThread's own ``finished`` signal, which is shadowed by ours.
+        Unlike ours, it is emitted once the thread has actually exited, so
+        it is safe to drop the worker then."""
+
+        return QtCore.QThread.finished.__get__(self, type(self))
+
     def run(self):
         self.func(*self.args, **self.kwargs)
 
@@ -0,0 +1,100 @@
+# This file is part of BeeRef.
+#
+# BeeRef is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BeeRef is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Reading images directly from ZIP and TAR archives, without
+extracting them to disk first."""
+
+from functools import cache
+import logging
+import os.path
+import tarfile
+import zipfile
+
+from PyQt6 import QtCore, QtGui
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tar', '.tar.gz', '.tgz', '.tar.bz2',
+                      '.tbz2', '.tar.xz', '.txz')
+ARCHIVE_ERRORS = (zipfile.BadZipFile, tarfile.TarError, OSError)
+
+
+def local_path(path):
+    """Returns the local file path for the given string or QUrl, or
+    ``None`` if it doesn't point to a local file."""
+
+    if isinstance(path, QtCore.QUrl):
+        if not path.isLocalFile():
+            return None
+        path = path.toLocalFile()
+    return os.path.normpath(path)
+
+
+def is_archive(path):
+    """Check whether the given string or QUrl points to a local archive
+    that we can read images from."""
+
+    path = local_path(path)
+    return bool(path and path.lower().endswith(ARCHIVE_EXTENSIONS))
+
+
+@cache
+def readable_image_formats():
+    """The file extensions of the image formats we can read. Only looked
+    up once, since the image format plugins need the application to be
+    set up first."""
+
+    return frozenset(fmt.data().decode().lower()
+                     for fmt in QtGui.QImageReader.supportedImageFormats())
+
+
+def is_image_entry(name):
+    """Check whether the archive entry with the given name looks like an
+    image we can read."""
+
+    basename = os.path.basename(name)
+    if not basename or basename.startswith('.') or '__MACOSX' in name:
+        return False
+    ext = os.path.splitext(basename)[1][1:].lower()
+    return ext in readable_image_formats()
+
+
+def iter_archive_images(path):
+    """Streams the image entries of the given archive.
+
+    Yields tuples ``(name, data, position)`` where ``data`` is the
+    entry's (still encoded) content and ``position`` is the number of
+    bytes read from the archive file so far.
+    """
+
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            position = 0
+            for info in archive.infolist():
+                position += info.compress_size
+                if info.is_dir() or not is_image_entry(info.filename):
+                    continue
+                yield (info.filename, archive.read(info), position)
+        return
+
+    with open(path, 'rb') as raw:
+        # Stream mode: members are read in order without seeking
+        with tarfile.open(fileobj=raw, mode='r|*') as archive:
+            for member in archive:
+                if not member.isfile() or not is_image_entry(member.name):
+                    continue
+                data = archive.extractfile(member).read()
+                yield (member.name, data, raw.tell())
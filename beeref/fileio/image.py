@@ -15,85 +15,172 @@
 
 import logging
 import os.path
-import tempfile
 from urllib.error import URLError
 from urllib import request
 
-from PyQt6 import QtGui
+from PyQt6 import QtCore, QtGui
 
 import exif
 import plum
 
+from beeref import utils
+
 
 logger = logging.getLogger(__name__)
 
 
-def exif_rotated_image(path=None):
+def exif_rotated_image(path=None, data=None):
     """Returns a QImage that is transformed according to the source's
     orientation EXIF data.
+
+    The source is either the file at ``path`` or the encoded image
+    ``data`` given as bytes.
     """
 
-    img = QtGui.QImage(path)
+    return _exif_rotated_image(path, data)[0]
+
+
+def _exif_rotated_image(path=None, data=None):
+    """Like ``exif_rotated_image``, but returns a tuple of the image and
+    whether it has been transformed."""
+
+    if data is None:
+        img = QtGui.QImage(path)
+    else:
+        img = QtGui.QImage.fromData(data)
     if img.isNull():
-        return img
+        return (img, False)
 
-    with open(path, 'rb') as f:
-        try:
-            exifimg = exif.Image(f)
-        except (plum.exceptions.UnpackError, NotImplementedError):
-            logger.exception(f'Exif parser failed on image: {path}')
-            return img
+    try:
+        if data is None:
+            with open(path, 'rb') as f:
+                exifimg = exif.Image(f)
+        else:
+            exifimg = exif.Image(data)
+    except (plum.exceptions.UnpackError, NotImplementedError):
+        logger.exception(f'Exif parser failed on image: {path}')
+        return (img, False)
 
     if 'orientation' in exifimg.list_all():
         orientation = exifimg.orientation
     else:
-        return img
+        return (img, False)
 
     transform = QtGui.QTransform()
 
     if orientation == exif.Orientation.TOP_RIGHT:
-        return img.mirrored(horizontal=True, vertical=False)
+        return (img.mirrored(horizontal=True, vertical=False), True)
     if orientation == exif.Orientation.BOTTOM_RIGHT:
         transform.rotate(180)
-        return img.transformed(transform)
+        return (img.transformed(transform), True)
     if orientation == exif.Orientation.BOTTOM_LEFT:
-        return img.mirrored(horizontal=False, vertical=True)
+        return (img.mirrored(horizontal=False, vertical=True), True)
     if orientation == exif.Orientation.LEFT_TOP:
         transform.rotate(90)
-        return img.transformed(transform).mirrored(
-            horizontal=True, vertical=False)
+        return (img.transformed(transform).mirrored(
+            horizontal=True, vertical=False), True)
     if orientation == exif.Orientation.RIGHT_TOP:
         transform.rotate(90)
-        return img.transformed(transform)
+        return (img.transformed(transform), True)
     if orientation == exif.Orientation.RIGHT_BOTTOM:
         transform.rotate(270)
-        return img.transformed(transform).mirrored(
-            horizontal=True, vertical=False)
+        return (img.transformed(transform).mirrored(
+            horizontal=True, vertical=False), True)
     if orientation == exif.Orientation.LEFT_BOTTOM:
         transform.rotate(270)
-        return img.transformed(transform)
+        return (img.transformed(transform), True)
 
-    return img
+    return (img, False)
+
+
+def image_with_source(path=None, data=None):
+    """Decodes an image like ``exif_rotated_image`` and returns a tuple
+    of the image and encoded data that decodes to the same pixels.
+
+    This is the source data itself unless the image had to be rotated,
+    in which case the result is encoded as PNG. Encoding large images
+    takes seconds, so this is meant to be called from worker threads.
+    """
+
+    if data is None:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError as e:
+            logger.debug(f'Could not read file {path}: {e}')
+            return (QtGui.QImage(), None)
+
+    img, rotated = _exif_rotated_image(path, data)
+    if img.isNull():
+        return (img, None)
+    if rotated:
+        data = utils.image_to_bytes(img)
+    return (img, data)
 
 
 def load_image(path):
+    """Loads an image from a file path or URL.
+
+    Returns a tuple of the image, its filename and its encoded data as
+    given by ``image_with_source``.
+    """
+
     if isinstance(path, str):
         path = os.path.normpath(path)
-        return (exif_rotated_image(path), path)
+        img, data = image_with_source(path)
+        return (img, path, data)
     if path.isLocalFile():
         path = os.path.normpath(path.toLocalFile())
-        return (exif_rotated_image(path), path)
+        img, data = image_with_source(path)
+        return (img, path, data)
 
-    img = exif_rotated_image()
+    img = QtGui.QImage()
+    data = None
     try:
         imgdata = request.urlopen(path.url()).read()
     except URLError as e:
         logger.debug(f'Downloading image failed: {e.reason}')
     else:
-        with tempfile.TemporaryDirectory() as tmp:
-            fname = os.path.join(tmp, 'img')
-            with open(fname, 'wb') as f:
-                f.write(imgdata)
-                logger.debug(f'Temporarily saved in: {fname}')
-            img = exif_rotated_image(fname)
-    return (img, path.url())
+        img, data = image_with_source(data=imgdata)
+    return (img, path.url(), data)
+
+
+def encoded_image_from_mimedata(mimedata):
+    """Returns the still encoded image data from the given mime data if
+    it contains any in a format we can read, else ``None``.
+
+    Decoding this ourselves avoids ``QMimeData.imageData``, which decodes
+    synchronously.
+    """
+
+    readable = {fmt.data().decode()
+                for fmt in QtGui.QImageReader.supportedMimeTypes()}
+    for fmt in mimedata.formats():
+        if fmt in readable:
+            data = mimedata.data(fmt).data()
+            if data:
+                logger.debug(f'Found encoded image data of type {fmt}')
+                return data
+
+
+def image_size_from_bytes(data):
+    """Returns the size of the encoded image without decoding it.
+
+    The size is invalid if the data can't be read.
+    """
+
+    buffer = QtCore.QBuffer()
+    buffer.setData(data)
+    buffer.open(QtCore.QIODevice.OpenModeFlag.ReadOnly)
+    return QtGui.QImageReader(buffer).size()
+
+
+def image_format_from_bytes(data):
+    """Returns the format of the encoded image as a lowercase file
+    extension, e.g. ``'png'``, or ``None`` if the data can't be read."""
+
+    buffer = QtCore.QBuffer()
+    buffer.setData(data)
+    buffer.open(QtCore.QIODevice.OpenModeFlag.ReadOnly)
+    fmt = QtGui.QImageReader(buffer).format().data().decode()
+    return fmt.lower() or None
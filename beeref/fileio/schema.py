@@ -1,4 +1,4 @@
-USER_VERSION = 2
+USER_VERSION = 3
 APPLICATION_ID = 2060242126
 
 
@@ -30,6 +30,20 @@ SCHEMA = [
              ON UPDATE NO ACTION
     )
     """,
+    """
+    CREATE TABLE tiles (
+        item_id INTEGER NOT NULL,
+        level INTEGER NOT NULL,
+        col INTEGER NOT NULL,
+        row INTEGER NOT NULL,
+        data BLOB,
+        PRIMARY KEY (item_id, level, col, row),
+        FOREIGN KEY (item_id)
+          REFERENCES items (id)
+             ON DELETE CASCADE
+             ON UPDATE NO ACTION
+    )
+    """,
 ]
 
 
@@ -38,4 +52,20 @@ MIGRATIONS = {
         "ALTER TABLE items ADD COLUMN data JSON",
         "UPDATE items SET data = json_object('filename', filename)",
     ],
+    3: [
+        """
+        CREATE TABLE tiles (
+            item_id INTEGER NOT NULL,
+            level INTEGER NOT NULL,
+            col INTEGER NOT NULL,
+            row INTEGER NOT NULL,
+            data BLOB,
+            PRIMARY KEY (item_id, level, col, row),
+            FOREIGN KEY (item_id)
+              REFERENCES items (id)
+                 ON DELETE CASCADE
+                 ON UPDATE NO ACTION
+        )
+        """,
+    ],
 }
@@ -31,11 +31,14 @@ import shutil
 import sqlite3
 import tempfile
 
-from PyQt6 import QtGui
+from PyQt6 import QtCore, QtGui
 
 from beeref import constants
-from beeref.items import BeePixmapItem
+from beeref.geometry import ItemGeometry
+from beeref.items import BeePixmapItem, BeeTiledPixmapItem
+from beeref.tiles import TileStore
 from .errors import BeeFileIOError
+from .image import image_format_from_bytes
 from .schema import SCHEMA, USER_VERSION, MIGRATIONS, APPLICATION_ID
 
 
@@ -107,11 +110,17 @@ class SQLiteIO:
         uri = pathlib.Path(self.filename).resolve().as_uri()
         if self.readonly:
             uri = f'{uri}?mode=rw'
-        self._connection = sqlite3.connect(uri, uri=True)
-        self._cursor = self.connection.cursor()
+        self._connect(uri, uri=True)
         if not self.create_new:
             self._migrate()
 
+    def _connect(self, *args, **kwargs):
+        self._connection = sqlite3.connect(*args, **kwargs)
+        self._cursor = self.connection.cursor()
+        # Foreign keys are off by default and need to be enabled for
+        # each connection, else deleting items leaves orphaned tiles
+        self.ex('PRAGMA foreign_keys=1')
+
     def _migrate(self):
         """Migrate database if necessary."""
 
@@ -132,8 +141,7 @@ class SQLiteIO:
                     prefix=constants.APPNAME)
                 tmpname = os.path.join(self._tmpdir.name, 'mig.bee')
                 shutil.copyfile(self.filename, tmpname)
-                self._connection = sqlite3.connect(tmpname)
-                self._cursor = self.connection.cursor()
+                self._connect(tmpname)
 
         self.ex('BEGIN TRANSACTION')
         for i in range(version, USER_VERSION):
@@ -206,6 +214,9 @@ class SQLiteIO:
             if data['type'] == 'pixmap':
                 data['item'] = BeePixmapItem(QtGui.QImage())
                 data['item'].pixmap_from_bytes(row[9])
+                data['item'].image_changed = False
+            elif data['type'] == 'tiledpixmap':
+                data['item'] = BeeTiledPixmapItem(self.read_tiles(data))
 
             self.scene.add_item_later(data)
 
@@ -220,6 +231,19 @@ class SQLiteIO:
         if self.worker:
             self.worker.finished.emit(self.filename, [])
 
+    def read_tiles(self, data):
+        """Read the tiles of a tiled image item into a new tile store.
+        Tiles are streamed so that they never all need to be in memory."""
+
+        size = QtCore.QSize(data['data']['width'], data['data']['height'])
+        store = TileStore(size, data['data']['tile_size'])
+        cursor = self.connection.execute(
+            'SELECT level, col, row, data FROM tiles WHERE item_id=?',
+            (data['save_id'],))
+        for level, col, row, tile in cursor:
+            store.put(level, col, row, tile)
+        return store
+
     @handle_sqlite_errors
     def write(self):
         if self.readonly:
@@ -239,22 +263,25 @@ class SQLiteIO:
                 self.write()
 
     def write_data(self):
-        to_delete = self.fetchall('SELECT id from ITEMS')
+        to_delete = set(self.fetchall('SELECT id from ITEMS'))
         to_save = list(self.scene.items_for_save())
         if self.worker:
             self.worker.begin_processing.emit(len(to_save))
-        for i, item in enumerate(to_save):
-            logger.debug(f'Saving {item} with id {item.save_id}')
-            if item.save_id:
-                self.update_item(item)
-                to_delete.remove((item.save_id,))
-            else:
+        # Items that have been saved before are updated all at once
+        is_new = [not item.save_id for item in to_save]
+        to_update = [item for item, new in zip(to_save, is_new) if not new]
+        logger.debug(f'Updating {len(to_update)} items')
+        self.update_items(to_update)
+        to_delete -= {(item.save_id,) for item in to_update}
+        for i, (item, new) in enumerate(zip(to_save, is_new)):
+            if new:
+                logger.debug(f'Saving {item} with id {item.save_id}')
                 self.insert_item(item)
             if self.worker:
                 self.worker.progress.emit(i)
                 if self.worker.canceled:
                     break
-        self.delete_items(to_delete)
+        self.delete_items(sorted(to_delete))
         self.connection.commit()
         if self.worker:
             self.worker.finished.emit(self.filename, [])
@@ -275,31 +302,52 @@ class SQLiteIO:
 
         if hasattr(item, 'pixmap_to_bytes'):
             pixmap = item.pixmap_to_bytes()
-
-            if item.filename:
-                basename = os.path.splitext(os.path.basename(item.filename))[0]
-                name = '%04d-%s.png' % (item.save_id, basename)
-            else:
-                name = '%04d.png' % item.save_id
-
             self.ex(
                 'INSERT INTO sqlar (item_id, name, mode, sz, data) '
                 'VALUES (?, ?, ?, ?, ?)',
-                (item.save_id, name, 0o644, len(pixmap), pixmap))
+                (item.save_id, self.sqlar_name(item, pixmap), 0o644,
+                 len(pixmap), pixmap))
+            item.image_changed = False
+
+        if hasattr(item, 'tile_store'):
+            self.exmany(
+                'INSERT INTO tiles (item_id, level, col, row, data) '
+                'VALUES (?, ?, ?, ?, ?)',
+                ((item.save_id, level, col, row, tile)
+                 for level, col, row, tile in item.tile_store))
         self.connection.commit()
 
+    def sqlar_name(self, item, pixmap):
+        # Images are stored in their original format where known
+        ext = image_format_from_bytes(pixmap) or 'png'
+        if item.filename:
+            basename = os.path.splitext(os.path.basename(item.filename))[0]
+            return '%04d-%s.%s' % (item.save_id, basename, ext)
+        return '%04d.%s' % (item.save_id, ext)
+
     def update_item(self, item):
+        self.update_items([item])
+
+    def update_items(self, items):
         """Update item data.
 
-        We only update the item data, not the pixmap data, as pixmap
-        data never changes and is also time-consuming to save.
+        The pixmap data is only updated if the image has changed (e.g.
+        by baking the crop), as it is time-consuming to save.
         """
-        self.ex(
+        geometry = ItemGeometry(items)
+        self.exmany(
             'UPDATE items SET x=?, y=?, z=?, scale=?, rotation=?, flip=?, '
             'data=? '
             'WHERE id=?',
-            (item.pos().x(), item.pos().y(), item.zValue(), item.scale(),
-             item.rotation(), item.flip(),
-             json.dumps(item.get_extra_save_data()),
-             item.save_id))
+            ((*row, json.dumps(item.get_extra_save_data()), item.save_id)
+             for item, row in zip(items, geometry.transform_rows())))
+
+        for item in items:
+            if getattr(item, 'image_changed', False):
+                pixmap = item.pixmap_to_bytes()
+                self.ex(
+                    'UPDATE sqlar SET name=?, sz=?, data=? WHERE item_id=?',
+                    (self.sqlar_name(item, pixmap), len(pixmap), pixmap,
+                     item.save_id))
+                item.image_changed = False
         self.connection.commit()
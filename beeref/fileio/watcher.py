@@ -0,0 +1,151 @@
+# This file is part of BeeRef.
+#
+# BeeRef is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BeeRef is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Watching a folder for new or changed images."""
+
+import logging
+import os
+import os.path
+
+from PyQt6 import QtCore
+
+from beeref.fileio.archive import is_image_entry
+
+
+logger = logging.getLogger(__name__)
+
+
+def file_state(path):
+    """Returns what we compare to detect whether a file has changed."""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class FolderWatcher(QtCore.QObject):
+    """Watches a folder for new and changed image files.
+
+    Only the folder listing is compared on changes; file contents are
+    never read here. Files are reported via ``files_ready`` once they
+    haven't changed for ``debounce_msec``, so that files which are still
+    being written aren't picked up half-way.
+    """
+
+    files_ready = QtCore.pyqtSignal(list)
+
+    DEBOUNCE_MSEC = 1000
+
+    def __init__(self, path, known=None, debounce_msec=None):
+        """
+        :param path: The folder to watch
+        :param known: Files that are already known and only need to be
+            reported once they change
+        """
+
+        super().__init__()
+        self.path = os.path.normpath(path)
+        # Files that we have already reported, with their state:
+        self.known = {}
+        # Files that have changed recently, with their last seen state:
+        self.pending = {}
+        self.watcher = QtCore.QFileSystemWatcher()
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.watcher.fileChanged.connect(self.on_file_changed)
+        self.timer = QtCore.QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(debounce_msec or self.DEBOUNCE_MSEC)
+        self.timer.timeout.connect(self.check_pending)
+
+        known = set(map(os.path.normpath, known or []))
+        for filename in self.list_images():
+            if filename in known:
+                self.add_known(filename)
+            else:
+                self.pending[filename] = None
+        self.watcher.addPath(self.path)
+        logger.info(f'Watching folder {self.path}')
+        self.start_timer()
+
+    def stop(self):
+        self.timer.stop()
+        paths = self.watcher.files() + self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
+        logger.info(f'Stopped watching folder {self.path}')
+
+    def list_images(self):
+        with os.scandir(self.path) as entries:
+            return [os.path.normpath(entry.path) for entry in entries
+                    if entry.is_file() and is_image_entry(entry.name)]
+
+    def add_known(self, filename):
+        try:
+            self.known[filename] = file_state(filename)
+        except OSError:
+            return
+        self.watcher.addPath(filename)
+
+    def on_directory_changed(self, path):
+        new = [f for f in self.list_images()
+               if f not in self.known and f not in self.pending]
+        if new:
+            logger.debug(f'New files in watched folder: {new}')
+        for filename in new:
+            self.pending[filename] = None
+        self.start_timer()
+
+    def on_file_changed(self, path):
+        if not os.path.exists(path):
+            logger.debug(f'Watched file removed: {path}')
+            self.known.pop(path, None)
+            return
+        logger.debug(f'Watched file changed: {path}')
+        self.pending[path] = None
+        # Some editors replace files, which removes them from the watcher
+        self.watcher.addPath(path)
+        self.start_timer()
+
+    def start_timer(self):
+        """Start the timer for checking pending files unless it's already
+        running. Restarting it on every event would postpone the check
+        for as long as files keep changing; instead, files that are
+        still being written are caught by ``check_pending``."""
+
+        if self.pending and not self.timer.isActive():
+            self.timer.start()
+
+    def check_pending(self):
+        """Report pending files whose state hasn't changed since the last
+        check; check again later for all others."""
+
+        ready = []
+        for filename, old_state in list(self.pending.items()):
+            try:
+                state = file_state(filename)
+            except OSError:
+                del self.pending[filename]
+                continue
+            if state == old_state and state[1] > 0:
+                del self.pending[filename]
+                if self.known.get(filename) != state:
+                    ready.append(filename)
+                    self.add_known(filename)
+            else:
+                self.pending[filename] = state
+
+        if self.pending:
+            self.timer.start()
+        if ready:
+            logger.debug(f'Watched files ready: {ready}')
+            self.files_ready.emit(sorted(ready))
@@ -0,0 +1,114 @@
+# This file is part of BeeRef.
+#
+# BeeRef is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BeeRef is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Geometry of many items as columns of floats.
+
+Bulk operations like normalizing, arranging and saving read all values
+they need in one pass over the items and then only work on the columns,
+instead of calling into Qt for every item and value again and again.
+"""
+
+import math
+import operator
+
+from PyQt6 import QtCore
+
+
+class ItemGeometry:
+    """Positions, transformations and (optionally) scene bounding rects
+    of the given items.
+
+    Columns are ``x``, ``y``, ``z``, ``scale``, ``rotation`` and ``flip``,
+    and ``left``, ``top``, ``width`` and ``height`` if ``rects`` are
+    given. The nth entry of each column belongs to the nth item.
+
+    This is a snapshot taken when it's created, not kept in sync with
+    the items: Build a new one for every operation.
+    """
+
+    def __init__(self, items, rects=None):
+        self.items = list(items)
+        self.x, self.y, self.z = [], [], []
+        self.scale, self.rotation, self.flip = [], [], []
+        for item in self.items:
+            pos = item.pos()
+            self.x.append(pos.x())
+            self.y.append(pos.y())
+            self.z.append(item.zValue())
+            self.scale.append(item.scale())
+            self.rotation.append(item.rotation())
+            self.flip.append(item.flip())
+
+        if rects is not None:
+            self.left, self.top, self.width, self.height = [], [], [], []
+            for rect in rects:
+                self.left.append(rect.left())
+                self.top.append(rect.top())
+                self.width.append(rect.width())
+                self.height.append(rect.height())
+
+    def __len__(self):
+        return len(self.items)
+
+    def transform_rows(self):
+        """Yields ``(x, y, z, scale, rotation, flip)`` for each item."""
+
+        return zip(self.x, self.y, self.z,
+                   self.scale, self.rotation, self.flip)
+
+    def bounding_rect(self):
+        if not self.items:
+            return QtCore.QRectF()
+        right = max(map(operator.add, self.left, self.width))
+        bottom = max(map(operator.add, self.top, self.height))
+        return QtCore.QRectF(QtCore.QPointF(min(self.left), min(self.top)),
+                             QtCore.QPointF(right, bottom))
+
+    def normalize_factors(self, mode):
+        """Scale factors that give all items the average width, height
+        or size (area), as specified by ``mode``."""
+
+        if mode == 'size':
+            values = list(map(operator.mul, self.width, self.height))
+            avg = sum(values) / len(values)
+            return [math.sqrt(avg / value) for value in values]
+
+        values = getattr(self, mode)
+        avg = sum(values) / len(values)
+        return [avg / value for value in values]
+
+    def arrange_positions(self, center, vertical=False):
+        """Lines up the items around ``center``, keeping their order
+        along the line. Returns the items in their new order and the new
+        top left corners of their bounding rects."""
+
+        if vertical:
+            starts, lengths, widths = self.top, self.height, self.width
+            middle, cross_middle = center.y(), center.x()
+        else:
+            starts, lengths, widths = self.left, self.width, self.height
+            middle, cross_middle = center.x(), center.y()
+
+        order = sorted(range(len(self)), key=starts.__getitem__)
+        pos = round(middle - sum(lengths) / 2)
+        positions = []
+        for i in order:
+            cross = round(cross_middle - widths[i] / 2)
+            if vertical:
+                positions.append(QtCore.QPointF(cross, pos))
+            else:
+                positions.append(QtCore.QPointF(pos, cross))
+            pos += lengths[i]
+        return ([self.items[i] for i in order], positions)
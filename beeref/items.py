@@ -18,16 +18,22 @@ text).
 """
 
 import logging
+import math
 
 from PyQt6 import QtCore, QtGui, QtWidgets
 from PyQt6.QtCore import Qt
 
 from beeref import commands
 from beeref.constants import COLORS
+from beeref import mipmaps
+from beeref import tiles
+from beeref.pixelcache import get_pixel_cache
 from beeref.selection import SelectableMixin
+from beeref import utils
 
 
 logger = logging.getLogger(__name__)
+PLACEHOLDER_COLOR = QtGui.QColor(*COLORS['Scene:Placeholder'])
 
 item_registry = {}
 
@@ -60,10 +66,43 @@ class BeeItemMixin(SelectableMixin):
 
     def on_selected_change(self, value):
         if (value and self.scene()
-                and not self.scene().has_selection()
-                and not self.scene().rubberband_active):
+                and not self.scene().bulk_selection_active
+                and not self.scene().rubberband_active
+                and not self.scene().has_selection()):
             self.bring_to_front()
 
+    def init_selectable(self):
+        super().init_selectable()
+        # Needed to keep the scene's bounding rects up to date
+        self.setFlag(
+            QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemSendsGeometryChanges)
+
+    def on_geometry_change(self):
+        if self.scene():
+            self.scene().mark_bounds_dirty(self)
+
+    def prepareGeometryChange(self):
+        super().prepareGeometryChange()
+        self.on_geometry_change()
+
+    def itemChange(self, change, value):
+        if change in (self.GraphicsItemChange.ItemPositionHasChanged,
+                      self.GraphicsItemChange.ItemTransformHasChanged,
+                      self.GraphicsItemChange.ItemRotationHasChanged,
+                      self.GraphicsItemChange.ItemScaleHasChanged,
+                      self.GraphicsItemChange.ItemSelectedHasChanged,
+                      self.GraphicsItemChange.ItemSceneChange,
+                      self.GraphicsItemChange.ItemSceneHasChanged):
+            self.on_geometry_change()
+        if change in (self.GraphicsItemChange.ItemSelectedHasChanged,
+                      self.GraphicsItemChange.ItemSceneChange,
+                      self.GraphicsItemChange.ItemSceneHasChanged):
+            # Qt doesn't emit selectionChanged for every change, e.g.
+            # not when clearing the selection before selecting an item
+            if self.scene():
+                self.scene().invalidate_selection_cache()
+        return super().itemChange(change, value)
+
     def update_from_data(self, **kwargs):
         self.save_id = kwargs.get('save_id', self.save_id)
         self.setPos(kwargs.get('x', self.pos().x()),
@@ -83,13 +122,40 @@ class BeePixmapItem(BeeItemMixin, QtWidgets.QGraphicsPixmapItem):
     CROP_HANDLE_SIZE = 15
 
     def __init__(self, image, filename=None):
-        super().__init__(QtGui.QPixmap.fromImage(image))
+        super().__init__()
         self.save_id = None
         self.filename = filename
-        self.reset_crop()
-        logger.debug(f'Initialized {self}')
+        # The image is stored in the most compact format we can paint
+        # (see utils.optimize_pixel_format). It is managed by the pixel
+        # cache and may be demoted to encoded data when memory runs low,
+        # see image()
+        self._image = None
+        self._image_size = QtCore.QSize()
+        self._image_format = None
+        # Whether the image needs to be written on the next save
+        self.image_changed = True
+        # Counts image changes, so that late mip levels can be discarded
+        self.image_serial = 0
+        self._mipmaps = {}
+        self._mipmaps_requested = 0
+        # Encoded image data matching the current pixmap, if known;
+        # saves us from re-encoding the pixmap on save
+        self._source_bytes = None
+        # Location of the encoded data in the pixel cache's spill file
+        self._spilled = None
+        # Image prepared by a worker thread, see apply_pending_image
+        self.pending_image = None
+        self.is_placeholder = False
         self.is_croppable = True
         self.crop_mode = False
+        # Whether the image has no transparent pixels, so that it hides
+        # items below it; see occluder_rect
+        self.is_opaque = False
+        # Scene occlusion serial and result of the last occlusion check,
+        # see reset_occlusion
+        self._occlusion = (None, False)
+        self.set_image(image)
+        logger.debug(f'Initialized {self}')
         self.init_selectable()
 
     @classmethod
@@ -101,8 +167,35 @@ class BeePixmapItem(BeeItemMixin, QtWidgets.QGraphicsPixmapItem):
             item.crop = QtCore.QRectF(*data['crop'])
         return item
 
+    @classmethod
+    def create_placeholder(cls, size, filename=None):
+        """Creates an item without pixel data that already has the
+        dimensions of the image to come. The actual image is set later
+        via ``apply_pending_image``.
+        """
+
+        item = cls(QtGui.QImage(), filename)
+        item.crop = QtCore.QRectF(0, 0, size.width(), size.height())
+        item.is_croppable = False
+        item.is_placeholder = True
+        return item
+
+    def apply_pending_image(self):
+        """Sets the image that has been prepared by a worker thread
+        (see ``fileio.load_image_data``) as this item's pixmap."""
+
+        img, source_bytes = self.pending_image
+        self.pending_image = None
+        logger.debug(f'Applying pending image to {self}')
+        self.set_image(img)
+        self.source_bytes = source_bytes
+        self.is_croppable = True
+        self.is_placeholder = False
+        self.on_occlusion_change()
+        self.update_cache_mode()
+
     def __str__(self):
-        size = self.pixmap().size()
+        size = self._image_size
         return (f'Image "{self.filename}" {size.width()} x {size.height()}')
 
     @property
@@ -114,11 +207,14 @@ class BeePixmapItem(BeeItemMixin, QtWidgets.QGraphicsPixmapItem):
         logger.debug(f'Setting crop for {self} to {value}')
         self.prepareGeometryChange()
         self._crop = value
+        self.on_occlusion_change()
         self.update()
 
     def bounding_rect_unselected(self):
         if self.crop_mode:
-            return QtWidgets.QGraphicsPixmapItem.boundingRect(self)
+            # Same as QGraphicsPixmapItem, which leaves room for
+            # antialiasing at the edges
+            return self.pixmap_rect().adjusted(-0.5, -0.5, 0.5, 0.5)
         else:
             return self.crop
 
@@ -129,28 +225,322 @@ class BeePixmapItem(BeeItemMixin, QtWidgets.QGraphicsPixmapItem):
                          self.crop.width(),
                          self.crop.height()]}
 
+    def pixmap_rect(self):
+        return QtCore.QRectF(QtCore.QPointF(0, 0),
+                             QtCore.QSizeF(self._image_size))
+
     def pixmap_to_bytes(self):
         """Convert the pixmap data to PNG bytestring."""
-        barray = QtCore.QByteArray()
-        buffer = QtCore.QBuffer(barray)
-        buffer.open(QtCore.QIODevice.OpenModeFlag.WriteOnly)
-        img = self.pixmap().toImage()
-        img.save(buffer, 'PNG')
-        return barray.data()
+        if self.source_bytes:
+            return self.source_bytes
+        return utils.image_to_bytes(self.image())
 
-    def setPixmap(self, pixmap):
-        super().setPixmap(pixmap)
+    @property
+    def source_bytes(self):
+        if self._source_bytes is None and self._spilled:
+            spill_file, offset, length = self._spilled
+            return spill_file.read(offset, length)
+        return self._source_bytes
+
+    @source_bytes.setter
+    def source_bytes(self, value):
+        self._source_bytes = value
+        self._spilled = None
+        get_pixel_cache().encoded_loaded(self)
+
+    def image(self):
+        if self._image is None:
+            self.restore_pixmap()
+        else:
+            get_pixel_cache().pixmap_used(self)
+        return self._image
+
+    def set_image(self, img):
+        img = utils.optimize_pixel_format(img)
+        self._image = img
+        self._image_size = img.size()
+        self._image_format = img.format()
+        # The optimized format only has an alpha channel if it's needed
+        self.is_opaque = not img.isNull() and not img.hasAlphaChannel()
+        self.image_changed = True
+        self.image_serial += 1
+        self._mipmaps = {}
+        self._mipmaps_requested = 0
+        self.source_bytes = None
+        get_pixel_cache().pixmap_loaded(self)
+        logger.debug(f'Memory usage of {self}: {self.memory_usage()} bytes')
         self.reset_crop()
+        self.update()
+
+    def pixmap(self):
+        """A pixmap copy of the image, e.g. for the clipboard."""
+        return QtGui.QPixmap.fromImage(self.image())
+
+    def setPixmap(self, pixmap):
+        self.set_image(pixmap.toImage())
+
+    def pixmap_cost(self):
+        """Memory used by the decoded image in bytes."""
+        if self._image is None:
+            return 0
+        return self._image.sizeInBytes()
+
+    def encoded_cost(self):
+        """Memory used by encoded image data in RAM in bytes."""
+        return len(self._source_bytes or b'')
+
+    def memory_usage(self):
+        """Memory currently used by this item's image data in bytes."""
+        mipmaps_cost = sum(m.sizeInBytes() for m in self._mipmaps.values())
+        return self.pixmap_cost() + self.encoded_cost() + mipmaps_cost
+
+    def demote_pixmap(self):
+        """Drop the decoded image to save memory, keeping only the
+        encoded data. Returns whether the image has been dropped.
+
+        Items without encoded data keep their image, since encoding
+        large images takes seconds and would block the main thread.
+        Loaders provide the encoded data along with the image instead.
+        """
+
+        if self.crop_mode or self._image is None or self._image.isNull():
+            return False
+        if self._source_bytes is None and self._spilled is None:
+            return False
+        self._image = None
+        self._mipmaps = {}
+        self._mipmaps_requested = 0
+        return True
+
+    def restore_pixmap(self):
+        """Decode the image again after it has been demoted."""
+
+        logger.debug(f'Restoring pixmap of {self}')
+        img = QtGui.QImage.fromData(self.source_bytes)
+        if img.format() != self._image_format:
+            img = img.convertToFormat(self._image_format)
+        self._image = img
+        get_pixel_cache().pixmap_loaded(self)
+
+    def mipmap(self, level):
+        """Returns the ready mip level closest to ``level`` as a tuple
+        ``(level, image)``, with level 0 being the full image. Generating
+        the requested level is started if needed."""
+
+        if level == 0:
+            return (0, self.image())
+        if level not in self._mipmaps and level > self._mipmaps_requested:
+            # Generate from the closest level we already have
+            source_level = max(
+                (lvl for lvl in self._mipmaps if lvl < level), default=0)
+            if source_level:
+                source = self._mipmaps[source_level]
+            else:
+                source = self.image()
+            mipmaps.get_mipmap_generator().request(
+                self, source, source_level, level, self._image_size)
+            self._mipmaps_requested = level
+        if not self._mipmaps:
+            return (0, self.image())
+        ready = min(self._mipmaps, key=lambda lvl: (abs(lvl - level), lvl))
+        return (ready, self._mipmaps[ready])
+
+    def add_mipmap(self, level, img):
+        logger.trace(f'Adding mip level {level} to {self}')
+        self._mipmaps[level] = img
+        self.update()
+
+    def occluder_rect(self):
+        """The area in scene coordinates that this item fully covers, or
+        ``None``. Only unrotated, opaque items cover anything."""
+
+        if (not self.is_opaque
+                or self.is_placeholder
+                or self.crop_mode
+                or self.opacity() < 1
+                or not self.isVisible()
+                or self.parentItem()):
+            return None
+        transform = self.sceneTransform()
+        if transform.m12() or transform.m21():
+            return None
+        return transform.mapRect(self.crop)
+
+    def on_occlusion_change(self):
+        """Called when anything changes that affects whether this item
+        covers others or is covered itself."""
+
+        self.reset_occlusion()
+        if self.scene():
+            self.scene().update_occluder(self)
+
+    def reset_occlusion(self):
+        self._occlusion = (None, False)
+
+    def is_occluded(self):
+        """Whether the item is hidden by an item above it and doesn't
+        need to be painted. The result is cached until the item or an
+        item covering its area changes, see ``on_occlusion_change``."""
+
+        scene = self.scene()
+        # Items grouped for a gesture aren't notified when the group
+        # is transformed
+        if not scene or self.parentItem():
+            return False
+        if self._occlusion[0] != scene.occlusion_serial:
+            self._occlusion = (scene.occlusion_serial,
+                               scene.is_occluded(self))
+        return self._occlusion[1]
+
+    def update_cache_mode(self):
+        """Cache the rendered item in device coordinates if enabled for
+        the scene. Qt re-renders the cache when the item is updated (e.g.
+        on crop changes) or transformed other than by moving it, so static
+        boards are repainted by blitting.
+
+        Items in crop mode or without image data are never cached."""
+
+        scene = self.scene()
+        if (scene and scene.render_cache
+                and not self.crop_mode and not self.is_placeholder):
+            mode = QtWidgets.QGraphicsItem.CacheMode.DeviceCoordinateCache
+        else:
+            mode = QtWidgets.QGraphicsItem.CacheMode.NoCache
+        if mode != self.cacheMode():
+            logger.trace(f'Setting cache mode for {self} to {mode}')
+            self.setCacheMode(mode)
+
+    def itemChange(self, change, value):
+        if change == self.GraphicsItemChange.ItemSceneHasChanged:
+            self.update_cache_mode()
+        if change == self.GraphicsItemChange.ItemSceneChange:
+            if self.scene():
+                self.scene().update_occluder(self, removed=True)
+        if change in (self.GraphicsItemChange.ItemPositionHasChanged,
+                      self.GraphicsItemChange.ItemTransformHasChanged,
+                      self.GraphicsItemChange.ItemRotationHasChanged,
+                      self.GraphicsItemChange.ItemScaleHasChanged,
+                      self.GraphicsItemChange.ItemZValueHasChanged,
+                      self.GraphicsItemChange.ItemOpacityHasChanged,
+                      self.GraphicsItemChange.ItemVisibleHasChanged,
+                      self.GraphicsItemChange.ItemParentHasChanged,
+                      self.GraphicsItemChange.ItemSceneHasChanged):
+            self.on_occlusion_change()
+        return super().itemChange(change, value)
+
+    def draw_image(self, painter, widget):
+        """Draw the cropped image, using a downscaled version if the
+        painter scales it down anyway."""
+
+        scale = QtWidgets.QStyleOptionGraphicsItem.levelOfDetailFromTransform(
+            painter.worldTransform())
+        if widget:
+            scale *= widget.devicePixelRatioF()
+        level, img = self.mipmap(
+            mipmaps.level_for_scale(scale, self._image_size))
+        if level == 0:
+            painter.drawImage(self.crop, img, self.crop)
+            return
+
+        factor_x = img.width() / self._image_size.width()
+        factor_y = img.height() / self._image_size.height()
+        source = QtCore.QRectF(self.crop.x() * factor_x,
+                               self.crop.y() * factor_y,
+                               self.crop.width() * factor_x,
+                               self.crop.height() * factor_y)
+        painter.drawImage(self.crop, img, source)
+
+    def spill_encoded(self, spill_file):
+        """Move the encoded image data from RAM to the spill file."""
+
+        offset, length = spill_file.write(self._source_bytes)
+        self._spilled = (spill_file, offset, length)
+        self._source_bytes = None
+
+    def spill(self, spill_file):
+        """Drop the decoded image and move the encoded data to the spill
+        file, e.g. while the item is only kept for undoing."""
+
+        if self._image is not None:
+            self.demote_pixmap()
+        if self._source_bytes is not None:
+            self.spill_encoded(spill_file)
+        get_pixel_cache().forget(self)
+
+    def replace_image(self, img, source_bytes=None):
+        """Replace the image, e.g. when the image file has changed. The
+        crop is kept if the image size stays the same."""
+
+        if self.crop_mode:
+            self.exit_crop_mode(confirm=False)
+        crop = self.crop
+        same_size = img.size() == self._image_size
+        self.set_image(img)
+        self.source_bytes = source_bytes
+        if same_size:
+            self.crop = crop
+
+    def bake_crop_rect(self):
+        """The region of the image that is kept when baking the crop."""
+
+        return self.crop.toAlignedRect().intersected(
+            self.pixmap_rect().toAlignedRect())
+
+    def bake_crop(self, img=None, source_bytes=None):
+        """Replace the image with its cropped region to get rid of the
+        hidden pixels. The item stays where it is visually.
+
+        :param img: The cropped region if it has already been copied,
+            e.g. in a worker thread (see ``fileio.crop_images``)
+        """
+
+        rect = self.bake_crop_rect()
+        logger.debug(f'Baking crop {rect} of {self}')
+        pos = self.mapToScene(QtCore.QPointF(rect.topLeft()))
+        if img is None:
+            img = self.image().copy(rect)
+        self.set_image(img)
+        self.source_bytes = source_bytes
+        self.setPos(pos)
+
+    def useful_size(self, oversampling):
+        """The image size beyond which pixels can't be seen any more at
+        100% zoom, with ``oversampling`` image pixels per screen pixel.
+        Returns ``None`` if the image isn't larger than that."""
+
+        factor = self.scale() * oversampling
+        if factor >= 1 or self._image_size.isEmpty():
+            return None
+        return QtCore.QSize(
+            max(1, round(self._image_size.width() * factor)),
+            max(1, round(self._image_size.height() * factor)))
+
+    def resample_image(self, img, source_bytes=None):
+        """Replace the image with a resampled version of it. Scale and
+        crop are adjusted so that the item looks the same."""
+
+        factor_x = img.width() / self._image_size.width()
+        factor_y = img.height() / self._image_size.height()
+        crop = self.crop
+        scale = self.scale()
+        logger.debug(f'Resampling {self} by {factor_x}')
+        self.set_image(img)
+        self.source_bytes = source_bytes
+        self.crop = QtCore.QRectF(crop.x() * factor_x,
+                                  crop.y() * factor_y,
+                                  crop.width() * factor_x,
+                                  crop.height() * factor_y)
+        self.setScale(scale / factor_x)
 
     def pixmap_from_bytes(self, data):
-        """Set image pimap from a bytestring."""
-        pixmap = QtGui.QPixmap()
-        pixmap.loadFromData(data)
-        self.setPixmap(pixmap)
+        """Set image from a bytestring."""
+        self.set_image(QtGui.QImage.fromData(data))
+        self.source_bytes = data
 
     def create_copy(self):
         item = BeePixmapItem(QtGui.QImage(), self.filename)
-        item.setPixmap(self.pixmap())
+        item.set_image(self.image())
+        item.source_bytes = self.source_bytes
         item.setPos(self.pos())
         item.setZValue(self.zValue())
         item.setScale(self.scale())
@@ -164,8 +554,7 @@ class BeePixmapItem(BeeItemMixin, QtWidgets.QGraphicsPixmapItem):
         clipboard.setPixmap(self.pixmap())
 
     def reset_crop(self):
-        self.crop = QtCore.QRectF(
-            0, 0, self.pixmap().size().width(), self.pixmap().size().height())
+        self.crop = self.pixmap_rect()
 
     @property
     def crop_handle_size(self):
@@ -284,8 +673,9 @@ class BeePixmapItem(BeeItemMixin, QtWidgets.QGraphicsPixmapItem):
             self.paint_debug(painter, option, widget)
 
             # Darken image outside of cropped area
-            painter.drawPixmap(0, 0, self.pixmap())
-            path = QtWidgets.QGraphicsPixmapItem.shape(self)
+            painter.drawImage(0, 0, self.image())
+            path = QtGui.QPainterPath()
+            path.addRect(self.pixmap_rect())
             path.addRect(self.crop_temp)
             color = QtGui.QColor(0, 0, 0)
             color.setAlpha(100)
@@ -298,13 +688,25 @@ class BeePixmapItem(BeeItemMixin, QtWidgets.QGraphicsPixmapItem):
                 self.draw_crop_rect(painter, handle())
             self.draw_crop_rect(painter, self.crop_temp)
         else:
-            painter.drawPixmap(self.crop, self.pixmap(), self.crop)
+            # A cached item isn't repainted when its occluder moves away
+            # from it, so it needs to be rendered completely
+            cached = (self.cacheMode()
+                      != QtWidgets.QGraphicsItem.CacheMode.NoCache)
+            if not cached and self.is_occluded():
+                logger.trace(f'Skipping paint of occluded {self}')
+                return
+            if self.is_placeholder:
+                painter.fillRect(self.crop, PLACEHOLDER_COLOR)
+            else:
+                self.draw_image(painter, widget)
             self.paint_selectable(painter, option, widget)
 
     def enter_crop_mode(self):
         logger.debug(f'Entering crop mode on {self}')
         self.prepareGeometryChange()
         self.crop_mode = True
+        self.on_occlusion_change()
+        self.update_cache_mode()
         self.crop_temp = QtCore.QRectF(self.crop)
         self.crop_mode_move = None
         self.crop_mode_event_start = None
@@ -319,6 +721,8 @@ class BeePixmapItem(BeeItemMixin, QtWidgets.QGraphicsPixmapItem):
                 commands.CropItem(self, self.crop_temp))
         self.prepareGeometryChange()
         self.crop_mode = False
+        self.on_occlusion_change()
+        self.update_cache_mode()
         self.crop_temp = None
         self.crop_mode_move = None
         self.crop_mode_event_start = None
@@ -371,8 +775,8 @@ class BeePixmapItem(BeeItemMixin, QtWidgets.QGraphicsPixmapItem):
 
     def ensure_point_within_pixmap_bounds(self, point):
         """Returns the point, or the nearest point within the pixmap."""
-        point.setX(min(self.pixmap().size().width(), max(0, point.x())))
-        point.setY(min(self.pixmap().size().height(), max(0, point.y())))
+        point.setX(min(self._image_size.width(), max(0, point.x())))
+        point.setY(min(self._image_size.height(), max(0, point.y())))
         return point
 
     def mouseMoveEvent(self, event):
@@ -425,6 +829,110 @@ class BeePixmapItem(BeeItemMixin, QtWidgets.QGraphicsPixmapItem):
             super().mouseReleaseEvent(event)
 
 
+@register_item
+class BeeTiledPixmapItem(BeeItemMixin, QtWidgets.QGraphicsItem):
+    """Class for images that are too large to be kept in memory as a
+    whole. Only the tiles that are painted get decoded, see
+    ``tiles.TileStore``."""
+
+    TYPE = 'tiledpixmap'
+
+    def __init__(self, tile_store, filename=None):
+        super().__init__()
+        self.save_id = None
+        self.filename = filename
+        self.tile_store = tile_store
+        self.is_croppable = False
+        self.setFlag(
+            QtWidgets.QGraphicsItem.GraphicsItemFlag
+            .ItemUsesExtendedStyleOption)
+        logger.debug(f'Initialized {self}')
+        self.init_selectable()
+
+    @classmethod
+    def create_from_data(cls, **kwargs):
+        item = kwargs.pop('item')
+        data = kwargs.pop('data', {})
+        item.filename = item.filename or data.get('filename')
+        return item
+
+    def __str__(self):
+        size = self.tile_store.size
+        return (f'Tiled image "{self.filename}" '
+                f'{size.width()} x {size.height()}')
+
+    def bounding_rect_unselected(self):
+        return QtCore.QRectF(QtCore.QPointF(0, 0),
+                             QtCore.QSizeF(self.tile_store.size))
+
+    def get_extra_save_data(self):
+        return {'filename': self.filename,
+                'width': self.tile_store.size.width(),
+                'height': self.tile_store.size.height(),
+                'tile_size': self.tile_store.tile_size}
+
+    def visible_tiles(self, level, rect):
+        """Yields ``(col, row)`` of the tiles of the given level that
+        intersect ``rect`` (in item coordinates)."""
+
+        span = self.tile_store.tile_size * 2**level
+        cols, rows = self.tile_store.grid(level)
+        rect = rect.intersected(self.bounding_rect_unselected())
+        if rect.isEmpty():
+            return
+        for row in range(max(0, math.floor(rect.top() / span)),
+                         min(rows, math.ceil(rect.bottom() / span))):
+            for col in range(max(0, math.floor(rect.left() / span)),
+                             min(cols, math.ceil(rect.right() / span))):
+                yield (col, row)
+
+    def paint(self, painter, option, widget):
+        self.paint_debug(painter, option, widget)
+        scale = QtWidgets.QStyleOptionGraphicsItem.levelOfDetailFromTransform(
+            painter.worldTransform())
+        if widget:
+            scale *= widget.devicePixelRatioF()
+        level = min(mipmaps.level_for_scale(scale, self.tile_store.size),
+                    self.tile_store.levels - 1)
+        factor = 2**level
+        bounds = self.bounding_rect_unselected()
+        exposed = option.exposedRect
+        if painter.hasClipping():
+            exposed = exposed.intersected(painter.clipBoundingRect())
+        cache = tiles.get_tile_cache()
+        for col, row in self.visible_tiles(level, exposed):
+            img = cache.get(self.tile_store, level, col, row)
+            rect = self.tile_store.tile_rect(level, col, row)
+            # Scaled down levels are rounded up, so the last tiles can
+            # reach a bit beyond the image
+            target = QtCore.QRectF(rect.x() * factor,
+                                   rect.y() * factor,
+                                   rect.width() * factor,
+                                   rect.height() * factor).intersected(bounds)
+            source = QtCore.QRectF(0, 0,
+                                   target.width() / factor,
+                                   target.height() / factor)
+            painter.drawImage(target, img, source)
+        self.paint_selectable(painter, option, widget)
+
+    def overview(self):
+        """The whole image at the most scaled down level."""
+        return self.tile_store.decode(self.tile_store.levels - 1, 0, 0)
+
+    def create_copy(self):
+        item = BeeTiledPixmapItem(self.tile_store, self.filename)
+        item.setPos(self.pos())
+        item.setZValue(self.zValue())
+        item.setScale(self.scale())
+        item.setRotation(self.rotation())
+        if self.flip() == -1:
+            item.do_flip()
+        return item
+
+    def copy_to_clipboard(self, clipboard):
+        clipboard.setImage(self.overview())
+
+
 @register_item
 class BeeTextItem(BeeItemMixin, QtWidgets.QGraphicsTextItem):
     """Class for text added by the user."""
@@ -440,6 +948,7 @@ class BeeTextItem(BeeItemMixin, QtWidgets.QGraphicsTextItem):
         self.is_editable = True
         self.edit_mode = False
         self.setDefaultTextColor(QtGui.QColor(*COLORS['Scene:Text']))
+        self.document().contentsChanged.connect(self.on_geometry_change)
 
     @classmethod
     def create_from_data(cls, **kwargs):
@@ -18,8 +18,6 @@ import logging
 from PyQt6 import QtCore, QtGui
 from PyQt6.QtCore import Qt
 
-from beeref import commands
-from beeref.items import BeePixmapItem
 from beeref import fileio
 
 
@@ -69,10 +67,10 @@ class MainControlsMixin:
                     return
             self.control_target.do_insert_images(mimedata.urls(), pos)
         elif mimedata.hasImage():
-            img = QtGui.QImage(mimedata.imageData())
-            item = BeePixmapItem(img)
+            data = fileio.encoded_image_from_mimedata(mimedata)
+            if data is None:
+                data = QtGui.QImage(mimedata.imageData())
             pos = self.control_target.mapToScene(pos)
-            self.control_target.undo_stack.push(
-                commands.InsertItems(self.control_target.scene, [item], pos))
+            self.control_target.do_insert_image_data(data, pos)
         else:
             logger.info('Drop not an image')
@@ -0,0 +1,127 @@
+# This file is part of BeeRef.
+#
+# BeeRef is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BeeRef is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Power-of-two downscaled versions of images (mip levels), so that
+zoomed out items don't need to be downsampled from full resolution on
+every paint.
+
+Level ``n`` is the image scaled down by ``2**n``. Levels are generated
+lazily in a thread pool.
+"""
+
+import itertools
+import logging
+import math
+import weakref
+
+from PyQt6 import QtCore, QtGui
+from PyQt6.QtCore import Qt
+
+
+logger = logging.getLogger(__name__)
+
+# Don't generate levels smaller than this in either dimension
+MIN_SIZE = 8
+
+
+def level_for_scale(scale, size):
+    """The mip level that fits painting an image of ``size`` with the
+    given scale, or 0 if the full image should be used."""
+
+    if scale <= 0 or scale >= 1:
+        return 0
+    level = math.floor(math.log2(1 / scale))
+    max_level = max_level_for_size(size)
+    return min(level, max_level)
+
+
+def max_level_for_size(size):
+    smallest = min(size.width(), size.height())
+    if smallest < MIN_SIZE:
+        return 0
+    return math.floor(math.log2(smallest / MIN_SIZE))
+
+
+def level_size(size, level):
+    return QtCore.QSize(max(1, size.width() >> level),
+                        max(1, size.height() >> level))
+
+
+class MipmapJob(QtCore.QRunnable):
+    """Halves the source image repeatedly until the target level is
+    reached, reporting every level on the way."""
+
+    def __init__(self, generator, request_id, source, source_level, level,
+                 size):
+        super().__init__()
+        self.generator = generator
+        self.request_id = request_id
+        self.source = source
+        self.source_level = source_level
+        self.level = level
+        self.size = size
+
+    def run(self):
+        img = self.source
+        for level in range(self.source_level + 1, self.level + 1):
+            img = img.scaled(level_size(self.size, level),
+                             Qt.AspectRatioMode.IgnoreAspectRatio,
+                             Qt.TransformationMode.SmoothTransformation)
+            self.generator.generated.emit(self.request_id, level, img)
+
+
+class MipmapGenerator(QtCore.QObject):
+    """Generates mip levels for items in a thread pool and hands them
+    back to the items on the main thread."""
+
+    generated = QtCore.pyqtSignal(int, int, QtGui.QImage)
+
+    def __init__(self, pool=None):
+        super().__init__()
+        self.pool = pool or QtCore.QThreadPool.globalInstance()
+        self.requests = {}
+        self.ids = itertools.count()
+        self.generated.connect(self.on_generated)
+
+    def request(self, item, source, source_level, level, size):
+        """Generate levels ``source_level + 1`` up to ``level`` for the
+        item, starting from the given source image. ``size`` is the size
+        of the item's full image."""
+
+        request_id = next(self.ids)
+        self.requests[request_id] = (
+            weakref.ref(item), item.image_serial, level)
+        logger.trace(f'Requesting mip levels {source_level + 1}-{level} '
+                     f'for {item}')
+        self.pool.start(MipmapJob(
+            self, request_id, source, source_level, level, size))
+
+    def on_generated(self, request_id, level, img):
+        ref, serial, target = self.requests[request_id]
+        if level >= target:
+            del self.requests[request_id]
+        item = ref()
+        if item is not None and item.image_serial == serial:
+            item.add_mipmap(level, img)
+
+
+_generator = None
+
+
+def get_mipmap_generator():
+    global _generator
+    if _generator is None:
+        _generator = MipmapGenerator()
+    return _generator
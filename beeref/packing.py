@@ -0,0 +1,244 @@
+# This file is part of BeeRef.
+#
+# BeeRef is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BeeRef is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Packing of rectangles for arranging items optimally.
+
+Several strategies of different speed and quality are tried within a
+time budget, cheapest first, and the most compact result wins. Which
+strategies are tried depends on the number of rectangles, since
+``rpack`` gives the best results but becomes very slow for many of them.
+
+Sizes are given as ``(width, height)`` tuples of integers; results are
+the ``(x, y)`` positions of the top left corners in the same order.
+"""
+
+import logging
+import math
+import time
+
+import rpack
+
+
+logger = logging.getLogger(__name__)
+
+# Default in seconds, can be changed in the settings file
+PACKING_BUDGET = 2
+
+# Maximum number of rectangles to try the respective strategies with
+RPACK_MAX_ITEMS = 100
+SKYLINE_MAX_ITEMS = 3000
+
+# Widths to try, as factors of the square root of the total area
+WIDTH_FACTORS = (1, 1.1, 1.25, 1.4, 1.6)
+
+
+def bbox_size(sizes, positions):
+    """Width and height of the bounding box of the packed rectangles."""
+
+    if not sizes:
+        return (0, 0)
+    return (max(x + w for (w, h), (x, y) in zip(sizes, positions)),
+            max(y + h for (w, h), (x, y) in zip(sizes, positions)))
+
+
+def pack_rows(sizes, width, keep_going=None):
+    """Lay out the rectangles in their given order in rows of the given
+    width. The space left over in each row is distributed between its
+    rectangles, so that the rows are justified."""
+
+    rows = []
+    row = []
+    row_width = 0
+    for i, (w, h) in enumerate(sizes):
+        if row and row_width + w > width:
+            rows.append((row, row_width))
+            row = []
+            row_width = 0
+        row.append(i)
+        row_width += w
+    rows.append((row, row_width))
+
+    positions = [None] * len(sizes)
+    y = 0
+    for n, (row, row_width) in enumerate(rows):
+        if keep_going and not keep_going():
+            return None
+        # Don't stretch out the last row
+        if len(row) > 1 and n < len(rows) - 1:
+            gap = (width - row_width) / (len(row) - 1)
+        else:
+            gap = 0
+        x = 0
+        for i in row:
+            positions[i] = (round(x), y)
+            x += sizes[i][0] + gap
+        y += max(sizes[i][1] for i in row)
+    return positions
+
+
+def pack_shelves(sizes, width, keep_going=None):
+    """Lay out the rectangles in rows of the given width, tallest
+    first, so that the rectangles in each row have similar heights."""
+
+    order = sorted(range(len(sizes)), key=lambda i: -sizes[i][1])
+    positions = [None] * len(sizes)
+    x = y = shelf_height = 0
+    for n, i in enumerate(order):
+        if keep_going and n % 500 == 0 and not keep_going():
+            return None
+        w, h = sizes[i]
+        if x and x + w > width:
+            y += shelf_height
+            x = shelf_height = 0
+        positions[i] = (x, y)
+        x += w
+        shelf_height = max(shelf_height, h)
+    return positions
+
+
+def pack_skyline(sizes, width, keep_going=None):
+    """Place the rectangles one after another, tallest first, at the
+    lowest position along the skyline formed by the rectangles placed
+    so far."""
+
+    width = max(width, max(w for w, h in sizes))
+    order = sorted(range(len(sizes)),
+                   key=lambda i: (-sizes[i][1], -sizes[i][0]))
+    # Segments of the skyline as [x, y, width], left to right
+    skyline = [[0, 0, width]]
+    positions = [None] * len(sizes)
+    for n, i in enumerate(order):
+        if keep_going and n % 50 == 0 and not keep_going():
+            return None
+        w, h = sizes[i]
+        best = None
+        for start in range(len(skyline)):
+            x = skyline[start][0]
+            if x + w > width:
+                break
+            # The rectangle rests on the highest segment it spans
+            y = 0
+            end = start
+            while skyline[end][0] < x + w:
+                y = max(y, skyline[end][1])
+                end += 1
+                if end == len(skyline):
+                    break
+            if best is None or (y, x) < best[:2]:
+                best = (y, x, start, end)
+        y, x, start, end = best
+        positions[i] = (x, y)
+
+        # Replace the covered segments, keeping the uncovered rest
+        # of the last one
+        last_x, last_y, last_w = skyline[end - 1]
+        new = [[x, y + h, w]]
+        if last_x + last_w > x + w:
+            new.append([x + w, last_y, last_x + last_w - x - w])
+        skyline[start:end] = new
+        if start and skyline[start - 1][1] == y + h:
+            skyline[start - 1][2] += w
+            del skyline[start]
+    return positions
+
+
+def pack_rpack(sizes, width, keep_going=None):
+    """Pack the rectangles with ``rpack`` into a square of the given
+    width, growing it until they fit."""
+
+    while True:
+        try:
+            return rpack.pack(sizes, max_width=width, max_height=width)
+        except rpack.PackingImpossibleError:
+            if keep_going and not keep_going():
+                return None
+            width = math.ceil(width * 1.2)
+
+
+def strategies(count):
+    """The strategies worth trying for the given number of rectangles,
+    cheapest first."""
+
+    result = [pack_rows, pack_shelves]
+    if count <= SKYLINE_MAX_ITEMS:
+        result.append(pack_skyline)
+    if count <= RPACK_MAX_ITEMS:
+        result.append(pack_rpack)
+    return result
+
+
+def pack(sizes, budget=PACKING_BUDGET, canceled=None):
+    """Pack the rectangles as compactly as possible within ``budget``
+    seconds, or until ``canceled()`` returns ``True``. Returns the
+    positions of the most compact result found so far.
+
+    The first attempt always runs to completion, so there is always
+    a result.
+    """
+
+    if not sizes:
+        return []
+
+    deadline = time.monotonic() + budget
+
+    def keep_going():
+        return (time.monotonic() < deadline
+                and not (canceled and canceled()))
+
+    # The minimal area the rectangles need if they could be packed
+    # optimally; we use this as a starting shape
+    min_area = sum(w * h for w, h in sizes)
+    base_width = max(math.ceil(math.sqrt(min_area)),
+                     max(w for w, h in sizes))
+
+    best = None
+    best_score = None
+    for strategy in strategies(len(sizes)):
+        factors = (1,) if strategy is pack_rpack else WIDTH_FACTORS
+        for factor in factors:
+            if best and not keep_going():
+                return best
+            positions = strategy(sizes,
+                                 math.ceil(base_width * factor),
+                                 keep_going if best else None)
+            if positions is None:
+                return best
+            # Prefer results that are compact and close to a square
+            width, height = bbox_size(sizes, positions)
+            score = (max(width, height), width * height)
+            if best is None or score < best_score:
+                logger.debug(f'Packed {len(sizes)} items with '
+                             f'{strategy.__name__} to {width} x {height}')
+                best = positions
+                best_score = score
+    return best
+
+
+def pack_job(job, worker=None):
+    """Pack the sizes given in ``job['sizes']`` within ``job['budget']``
+    seconds and store the result in ``job['positions']``.
+
+    When run in a worker thread, the worker's cancel flag stops the
+    packing early.
+    """
+
+    if worker:
+        worker.begin_processing.emit(0)
+    job['positions'] = pack(
+        job['sizes'],
+        job['budget'],
+        canceled=lambda: bool(worker and worker.canceled))
+    if worker:
+        worker.finished.emit('', [])
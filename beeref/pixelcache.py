@@ -0,0 +1,285 @@
+# This file is part of BeeRef.
+#
+# BeeRef is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BeeRef is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Keeps the pixel data of image items within a memory budget.
+
+Image data lives in one of three tiers:
+
+* Decoded pixmaps, ready to be painted
+* Encoded image data (e.g. PNG) in RAM
+* Encoded image data spilled to a memory-mapped temporary file
+
+When a tier goes over its budget, the least recently used items are
+demoted to the next tier. Items decode their pixmap again on demand.
+
+The tiers are only changed on the main thread, which paints the items.
+Items that load or decode their data in worker threads are queued and
+registered on the main thread later, so that workers never demote
+other items.
+"""
+
+from collections import OrderedDict
+import logging
+import mmap
+import tempfile
+import threading
+import weakref
+
+from beeref.config import BeeSettings
+
+
+logger = logging.getLogger(__name__)
+
+# Defaults in MB, can be changed in the settings file
+PIXMAP_BUDGET_MB = 1024
+ENCODED_BUDGET_MB = 256
+
+
+class LRUTier:
+    """Least recently used items with their cost in bytes. Items are
+    referenced weakly so that the cache doesn't keep deleted items
+    alive."""
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, item):
+        return id(item) in self.entries
+
+    def add(self, item, cost):
+        self.remove(item)
+        key = id(item)
+        ref = weakref.ref(item, lambda r: self._on_deleted(key, r))
+        self.entries[key] = (ref, cost)
+        self.size += cost
+
+    def touch(self, item):
+        key = id(item)
+        if key in self.entries:
+            self.entries.move_to_end(key)
+
+    def remove(self, item):
+        self._remove_key(id(item))
+
+    def _remove_key(self, key):
+        ref, cost = self.entries.pop(key, (None, 0))
+        self.size -= cost
+
+    def _on_deleted(self, key, ref):
+        entry = self.entries.get(key)
+        if entry and entry[0] is ref:
+            self._remove_key(key)
+
+    def over_budget(self):
+        return self.size > self.budget
+
+    def pop_oldest(self, keep=None):
+        """Remove and return the least recently used item, skipping
+        ``keep``. Returns ``None`` if there is no such item."""
+
+        for key, (ref, cost) in self.entries.items():
+            item = ref()
+            if item is not None and item is not keep:
+                self._remove_key(key)
+                return item
+        return None
+
+
+class SpillFile:
+    """An append-only temporary file for encoded image data, read back
+    via a memory map so that the OS can page it in and out as needed."""
+
+    def __init__(self):
+        self.file = tempfile.TemporaryFile(prefix='beeref-spill-')
+        self.size = 0
+        self.map = None
+        # Save workers read spilled data while the main thread writes
+        # and remaps the file
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        """Append data and return its location as ``(offset, length)``."""
+
+        with self.lock:
+            offset = self.size
+            self.file.seek(offset)
+            self.file.write(data)
+            self.file.flush()
+            self.size += len(data)
+            return (offset, len(data))
+
+    def read(self, offset, length):
+        with self.lock:
+            if self.map is None or len(self.map) < offset + length:
+                if self.map is not None:
+                    self.map.close()
+                self.map = mmap.mmap(
+                    self.file.fileno(), self.size, access=mmap.ACCESS_READ)
+            return self.map[offset:offset + length]
+
+    def close(self):
+        with self.lock:
+            if self.map is not None:
+                self.map.close()
+                self.map = None
+            self.file.close()
+
+
+class SpilledData:
+    """Encoded data that has been moved to a spill file."""
+
+    def __init__(self, spill_file, data):
+        self.spill_file = spill_file
+        self.offset, self.length = spill_file.write(data)
+
+    def __len__(self):
+        return self.length
+
+    def read(self):
+        return self.spill_file.read(self.offset, self.length)
+
+
+class PixelCache:
+    """Budgets decoded pixmaps and encoded image data of image items.
+
+    Items need to implement ``pixmap_cost``, ``demote_pixmap``,
+    ``encoded_cost`` and ``spill_encoded``.
+    """
+
+    def __init__(self, pixmap_budget=None, encoded_budget=None):
+        settings = BeeSettings()
+        if pixmap_budget is None:
+            pixmap_budget = settings.value(
+                'Memory/pixmap_budget_mb', PIXMAP_BUDGET_MB, type=int) * 2**20
+        if encoded_budget is None:
+            encoded_budget = settings.value(
+                'Memory/encoded_budget_mb',
+                ENCODED_BUDGET_MB,
+                type=int) * 2**20
+        self.pixmaps = LRUTier(pixmap_budget)
+        self.encoded = LRUTier(encoded_budget)
+        self.spill_file = None
+        # Items that changed in worker threads, see register_pending
+        self.pending = {}
+        self.pending_lock = threading.Lock()
+
+    def on_main_thread(self):
+        return threading.current_thread() is threading.main_thread()
+
+    def defer(self, item):
+        with self.pending_lock:
+            self.pending[id(item)] = weakref.ref(item)
+
+    def register_pending(self):
+        """Register items that changed in worker threads since the last
+        call. Needs to be called on the main thread."""
+
+        if not self.pending:
+            return
+        with self.pending_lock:
+            pending = self.pending
+            self.pending = {}
+        logger.debug(f'Registering {len(pending)} items from workers')
+        for ref in pending.values():
+            item = ref()
+            if item is not None:
+                self.pixmap_loaded(item)
+                self.encoded_loaded(item)
+
+    def pixmap_loaded(self, item):
+        """Register an item that now holds a decoded pixmap."""
+
+        if not self.on_main_thread():
+            self.defer(item)
+            return
+        self.register_pending()
+        cost = item.pixmap_cost()
+        if cost:
+            self.pixmaps.add(item, cost)
+            self.evict_pixmaps(keep=item)
+        else:
+            self.pixmaps.remove(item)
+
+    def pixmap_used(self, item):
+        if self.on_main_thread():
+            self.pixmaps.touch(item)
+
+    def encoded_loaded(self, item):
+        """Register an item that now holds encoded image data in RAM."""
+
+        if not self.on_main_thread():
+            self.defer(item)
+            return
+        self.register_pending()
+        cost = item.encoded_cost()
+        if cost:
+            self.encoded.add(item, cost)
+            self.evict_encoded(keep=item)
+        else:
+            self.encoded.remove(item)
+
+    def forget(self, item):
+        if not self.on_main_thread():
+            # Registering again drops whatever the item doesn't hold
+            # any more
+            self.defer(item)
+            return
+        self.pixmaps.remove(item)
+        self.encoded.remove(item)
+
+    def evict_pixmaps(self, keep=None):
+        kept = []
+        kept_cost = 0
+        while self.pixmaps.size + kept_cost > self.pixmaps.budget:
+            item = self.pixmaps.pop_oldest(keep=keep)
+            if item is None:
+                break
+            logger.debug(f'Demoting pixmap of {item}')
+            if not item.demote_pixmap():
+                # Item can't give up its pixmap right now, e.g. because
+                # it's in crop mode or has no encoded data. Try again
+                # later.
+                kept.append(item)
+                kept_cost += item.pixmap_cost()
+        for item in kept:
+            self.pixmaps.add(item, item.pixmap_cost())
+
+    def evict_encoded(self, keep=None):
+        while self.encoded.over_budget():
+            item = self.encoded.pop_oldest(keep=keep)
+            if item is None:
+                break
+            logger.debug(f'Spilling encoded data of {item}')
+            item.spill_encoded(self.get_spill_file())
+
+    def get_spill_file(self):
+        if self.spill_file is None:
+            self.spill_file = SpillFile()
+        return self.spill_file
+
+
+_pixel_cache = None
+
+
+def get_pixel_cache():
+    global _pixel_cache
+    if _pixel_cache is None:
+        _pixel_cache = PixelCache()
+    return _pixel_cache
@@ -13,22 +13,29 @@
 # You should have received a copy of the GNU General Public License
 # along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
 
+from contextlib import contextmanager
 from queue import Queue
 import logging
-import math
 
 from PyQt6 import QtCore, QtWidgets
 from PyQt6.QtCore import Qt
 
-import rpack
-
+from beeref.bounds import BoundsIndex
 from beeref import commands
+from beeref.config import BeeSettings
+from beeref.geometry import ItemGeometry
 from beeref.items import item_registry
+from beeref import packing
+from beeref.pixelcache import get_pixel_cache
 from beeref.selection import MultiSelectItem, RubberbandItem
 
 
 logger = logging.getLogger(__name__)
 
+# Bulk mutations of at least this many items suspend the scene's item
+# index, see BeeGraphicsScene.bulk_mutation
+BULK_MUTATION_THRESHOLD = 100
+
 
 class BeeGraphicsScene(QtWidgets.QGraphicsScene):
 
@@ -36,35 +43,92 @@ class BeeGraphicsScene(QtWidgets.QGraphicsScene):
         super().__init__()
         self.move_active = False
         self.rubberband_active = False
+        self.bulk_selection_active = False
+        self.bulk_mutation_active = False
         self.undo_stack = undo_stack
         self.max_z = 0
         self.min_z = 0
         self.Z_STEP = 0.001
         self.multi_select_item = MultiSelectItem()
         self.rubberband_item = RubberbandItem()
+        # Selected user items, see selectedItems. Needs to be connected
+        # first so that other slots don't see a stale selection.
+        self.selection_cache = None
+        self.selectionChanged.connect(self.invalidate_selection_cache)
         self.selectionChanged.connect(self.on_selection_change)
         self.changed.connect(self.on_change)
         self.items_to_add = Queue()
         self.internal_clipboard = []
         self.edit_item = None
         self.crop_item = None
+        # Scene bounding rects of all user items and of the selected
+        # ones, updated lazily for items marked via mark_bounds_dirty
+        self.bounds = BoundsIndex()
+        self.selection_bounds = BoundsIndex()
+        self.bounds_dirty = set()
+        # Whether image items keep a rendered copy of themselves, see
+        # BeePixmapItem.update_cache_mode
+        self.render_cache = False
+        # Items that can cover others with their covered scene rect and
+        # z value, see update_occluder
+        self.occluders = {}
+        # Invalidates the occlusion checks of all items at once, see
+        # BeePixmapItem.is_occluded
+        self.occlusion_serial = 0
 
     def addItem(self, item):
-        logger.debug(f'Adding item {item}')
+        if not self.bulk_mutation_active:
+            logger.debug(f'Adding item {item}')
         super().addItem(item)
 
     def removeItem(self, item):
-        logger.debug(f'Removing item {item}')
+        if not self.bulk_mutation_active:
+            logger.debug(f'Removing item {item}')
         super().removeItem(item)
 
+    def clear(self):
+        """Re-implemented to also forget the removed items' bounds,
+        since Qt doesn't notify the items when clearing the scene."""
+
+        super().clear()
+        self.bounds = BoundsIndex()
+        self.selection_bounds = BoundsIndex()
+        self.bounds_dirty = set()
+        self.selection_cache = None
+        self.occluders = {}
+        self.occlusion_serial += 1
+
+    def set_render_cache(self, value):
+        logger.debug(f'Setting render cache to {value}')
+        self.render_cache = value
+        for item in self.items():
+            if hasattr(item, 'update_cache_mode'):
+                item.update_cache_mode()
+
     def cancel_crop_mode(self):
         """Cancels an ongoing crop mode, if there is any."""
         if self.crop_item:
             self.crop_item.exit_crop_mode(confirm=False)
 
+    def cancel_gesture(self):
+        """Cancels an ongoing scale or rotate gesture, if there is any.
+        Returns ``True`` if there was one."""
+
+        item = self.mouseGrabberItem()
+        if (item and hasattr(item, 'cancel_gesture')
+                and (item.scale_active or item.rotate_active)):
+            # Cancels the gesture, see SelectableMixin.sceneEvent
+            item.ungrabMouse()
+            return True
+        return False
+
     def copy_selection_to_internal_clipboard(self):
         self.internal_clipboard = []
         for item in self.selectedItems(user_only=True):
+            # A copy wouldn't get the image that is still being loaded
+            if getattr(item, 'is_placeholder', False):
+                logger.debug(f'Not copying placeholder {item}')
+                continue
             self.internal_clipboard.append(item)
 
     def paste_from_internal_clipboard(self, position):
@@ -95,27 +159,18 @@ class BeeGraphicsScene(QtWidgets.QGraphicsScene):
             item.setZValue(item.zValue() + delta)
 
     def normalize_width_or_height(self, mode):
-        """Scale the selected images to have the same width or height, as
-        specified by ``mode``.
+        """Scale the selected images to have the same width, height or
+        size, as specified by ``mode``.
 
-        :param mode: "width" or "height".
+        :param mode: "width", "height" or "size".
         """
 
         self.cancel_crop_mode()
-        values = []
         items = self.selectedItems(user_only=True)
-        for item in items:
-            rect = self.itemsBoundingRect(items=[item])
-            values.append(getattr(rect, mode)())
-        if len(values) < 2:
+        if len(items) < 2:
             return
-        avg = sum(values) / len(values)
-        logger.debug(f'Calculated average {mode} {avg}')
-
-        scale_factors = []
-        for item in items:
-            rect = self.itemsBoundingRect(items=[item])
-            scale_factors.append(avg / getattr(rect, mode)())
+        logger.debug(f'Normalizing {mode} of {len(items)} items')
+        scale_factors = self.item_geometry(items).normalize_factors(mode)
         self.undo_stack.push(
             commands.NormalizeItems(items, scale_factors))
 
@@ -133,25 +188,7 @@ class BeeGraphicsScene(QtWidgets.QGraphicsScene):
         Size meaning the area = widh * height.
         """
 
-        self.cancel_crop_mode()
-        sizes = []
-        items = self.selectedItems(user_only=True)
-        for item in items:
-            rect = self.itemsBoundingRect(items=[item])
-            sizes.append(rect.width() * rect.height())
-
-        if len(sizes) < 2:
-            return
-
-        avg = sum(sizes) / len(sizes)
-        logger.debug(f'Calculated average size {avg}')
-
-        scale_factors = []
-        for item in items:
-            rect = self.itemsBoundingRect(items=[item])
-            scale_factors.append(math.sqrt(avg / rect.width() / rect.height()))
-        self.undo_stack.push(
-            commands.NormalizeItems(items, scale_factors))
+        self.normalize_width_or_height('size')
 
     def arrange(self, vertical=False):
         """Arrange items in a line (horizontally or vertically)."""
@@ -163,72 +200,60 @@ class BeeGraphicsScene(QtWidgets.QGraphicsScene):
             return
 
         center = self.get_selection_center()
-        positions = []
-        rects = []
-        for item in items:
-            rects.append({
-                'rect': self.itemsBoundingRect(items=[item]),
-                'item': item})
-
-        if vertical:
-            rects.sort(key=lambda r: r['rect'].topLeft().y())
-            sum_height = sum(map(lambda r: r['rect'].height(), rects))
-            y = round(center.y() - sum_height/2)
-            for rect in rects:
-                positions.append(
-                    QtCore.QPointF(
-                        round(center.x() - rect['rect'].width()/2), y))
-                y += rect['rect'].height()
-
-        else:
-            rects.sort(key=lambda r: r['rect'].topLeft().x())
-            sum_width = sum(map(lambda r: r['rect'].width(), rects))
-            x = round(center.x() - sum_width/2)
-            for rect in rects:
-                positions.append(
-                    QtCore.QPointF(
-                        x, round(center.y() - rect['rect'].height()/2)))
-                x += rect['rect'].width()
+        items, positions = self.item_geometry(items).arrange_positions(
+            center, vertical)
+        self.undo_stack.push(commands.ArrangeItems(self, items, positions))
 
-        self.undo_stack.push(
-            commands.ArrangeItems(self,
-                                  [r['item'] for r in rects],
-                                  positions))
+    def arrange_optimal_job(self):
+        """Prepare arranging the selected items optimally. Returns the
+        job for ``packing.pack_job``, or ``None`` if there is nothing to
+        arrange."""
 
-    def arrange_optimal(self):
         self.cancel_crop_mode()
 
         items = self.selectedItems(user_only=True)
         if len(items) < 2:
+            return None
+
+        geometry = self.item_geometry(items)
+        sizes = [(round(width), round(height))
+                 for width, height in zip(geometry.width, geometry.height)]
+        budget = BeeSettings().value(
+            'Items/arrange_optimal_budget_s',
+            packing.PACKING_BUDGET,
+            type=float)
+        return {'items': items,
+                'sizes': sizes,
+                'center': self.get_selection_center(),
+                'budget': budget}
+
+    def finish_arrange_optimal(self, job):
+        """Move the items of a packed job to their positions."""
+
+        if not job['positions']:
             return
 
-        sizes = []
-        for item in items:
-            rect = self.itemsBoundingRect(items=[item])
-            sizes.append((round(rect.width()), round(rect.height())))
-
-        center = self.get_selection_center()
-
-        # The minimal area the items need if they could be packed optimally;
-        # we use this as a starting shape for the packing algorithm
-        min_area = sum(map(lambda s: s[0] * s[1], sizes))
-        width = math.ceil(math.sqrt(min_area))
-
-        positions = None
-        while not positions:
-            try:
-                positions = rpack.pack(
-                    sizes, max_width=width, max_height=width)
-            except rpack.PackingImpossibleError:
-                width = math.ceil(width * 1.2)
-
         # We want the items to center around the selection's center,
         # not (0, 0)
-        bounds = rpack.bbox_size(sizes, positions)
-        diff = center - QtCore.QPointF(bounds[0]/2, bounds[1]/2)
-        positions = [QtCore.QPointF(*pos) + diff for pos in positions]
+        bounds = packing.bbox_size(job['sizes'], job['positions'])
+        diff = job['center'] - QtCore.QPointF(bounds[0]/2, bounds[1]/2)
 
-        self.undo_stack.push(commands.ArrangeItems(self, items, positions))
+        # Items may have been deleted while packing in the background
+        items = []
+        positions = []
+        for item, pos in zip(job['items'], job['positions']):
+            if item.scene() is self:
+                items.append(item)
+                positions.append(QtCore.QPointF(*pos) + diff)
+        if items:
+            self.undo_stack.push(
+                commands.ArrangeItems(self, items, positions))
+
+    def arrange_optimal(self):
+        job = self.arrange_optimal_job()
+        if job:
+            packing.pack_job(job)
+            self.finish_arrange_optimal(job)
 
     def flip_items(self, vertical=False):
         """Flip selected items."""
@@ -251,32 +276,104 @@ class BeeGraphicsScene(QtWidgets.QGraphicsScene):
     def set_selected_all_items(self, value):
         """Sets the selection mode of all items to ``value``."""
         self.cancel_crop_mode()
-        for item in self.items():
-            item.setSelected(value)
+        self.select_items(self.items(), value)
+
+    @contextmanager
+    def bulk_selection(self):
+        """Suspends the scene's signals while selecting or adding many
+        items and emits ``selectionChanged`` once at the end."""
+
+        blocked = self.blockSignals(True)
+        bulk_active = self.bulk_selection_active
+        self.bulk_selection_active = True
+        try:
+            yield
+        finally:
+            self.bulk_selection_active = bulk_active
+            self.blockSignals(blocked)
+            self.invalidate_selection_cache()
+            self.selectionChanged.emit()
+
+    @contextmanager
+    def bulk_mutation(self, count):
+        """Suspends per-item bookkeeping while adding or removing
+        ``count`` items: Signals are handled as in ``bulk_selection``,
+        and for large counts the item index is switched off and rebuilt
+        once at the end."""
+
+        if self.bulk_mutation_active:
+            with self.bulk_selection():
+                yield
+            return
+
+        logger.debug(f'Begin bulk mutation of {count} items')
+        index_method = self.itemIndexMethod()
+        if count >= BULK_MUTATION_THRESHOLD:
+            self.setItemIndexMethod(
+                QtWidgets.QGraphicsScene.ItemIndexMethod.NoIndex)
+        self.bulk_mutation_active = True
+        try:
+            with self.bulk_selection():
+                yield
+        finally:
+            self.bulk_mutation_active = False
+            if self.itemIndexMethod() != index_method:
+                self.setItemIndexMethod(index_method)
+            logger.debug('End bulk mutation')
+
+    def select_items(self, items, value=True, clear=False):
+        """Sets the selection mode of the given items to ``value``,
+        emitting ``selectionChanged`` only once. If ``clear`` is set, the
+        current selection is cleared first."""
+
+        logger.debug(f'Setting selection of {len(items)} items to {value}')
+        with self.bulk_selection():
+            if clear:
+                self.clearSelection()
+            had_selection = self.has_selection()
+            for item in items:
+                item.setSelected(value)
+            # Same as when selecting a single item, see
+            # BeeItemMixin.on_selected_change
+            if (value and items and not had_selection
+                    and not self.rubberband_active
+                    and items[0].scene() is self
+                    and hasattr(items[0], 'bring_to_front')):
+                items[0].bring_to_front()
 
     def has_selection(self):
         """Checks whether there are currently items selected."""
 
-        return bool(self.selectedItems(user_only=True))
+        return bool(self.selected_user_items())
 
     def has_single_selection(self):
         """Checks whether there's currently exactly one item selected."""
 
-        return len(self.selectedItems(user_only=True)) == 1
+        return len(self.selected_user_items()) == 1
 
     def has_multi_selection(self):
         """Checks whether there are currently more than one items selected."""
 
-        return len(self.selectedItems(user_only=True)) > 1
+        return len(self.selected_user_items()) > 1
 
     def has_croppable_selection(self):
         """Checks whether the current selection is croppable, i.e. a
         single selection whose item is croppable."""
 
         if self.has_single_selection():
-            return self.selectedItems(user_only=True)[0].is_croppable
+            return self.selected_user_items()[0].is_croppable
         return False
 
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key.Key_Escape and self.cancel_gesture():
+            event.accept()
+            return
+        super().keyPressEvent(event)
+
+    def focusOutEvent(self, event):
+        self.cancel_gesture()
+        super().focusOutEvent(event)
+
     def mousePressEvent(self, event):
         if event.button() == Qt.MouseButton.RightButton:
             # Right-click invokes the context menu on the
@@ -353,6 +450,64 @@ class BeeGraphicsScene(QtWidgets.QGraphicsScene):
         self.move_active = False
         super().mouseReleaseEvent(event)
 
+    def update_occluder(self, item, removed=False):
+        """Keep track of where ``item`` covers other items, see
+        ``BeePixmapItem.occluder_rect``. Called whenever that might have
+        changed. Items below the old and new covered area need to check
+        again whether they are occluded."""
+
+        entry = None
+        if not removed and item.scene() is self:
+            rect = item.occluder_rect()
+            if rect is not None:
+                entry = (rect, item.zValue())
+        old = self.occluders.get(item)
+        if entry == old:
+            return
+        if entry is None:
+            del self.occluders[item]
+        else:
+            self.occluders[item] = entry
+
+        if self.bulk_mutation_active:
+            # The item index may be switched off, so don't query it
+            self.occlusion_serial += 1
+            return
+        region = QtCore.QRectF()
+        for rect, _ in filter(None, (old, entry)):
+            region = region.united(rect)
+        for other in self.items(region):
+            if hasattr(other, 'reset_occlusion'):
+                other.reset_occlusion()
+
+    def is_occluded(self, item):
+        """Whether the item is fully covered by a single item above it.
+        Only items that provide an ``occluder_rect`` can cover others."""
+
+        if not self.occluders:
+            return False
+        rect = item.sceneBoundingRect()
+        for other in self.items(
+                rect,
+                Qt.ItemSelectionMode.IntersectsItemBoundingRect,
+                Qt.SortOrder.DescendingOrder):
+            if other is item:
+                return False
+            entry = self.occluders.get(other)
+            if entry and entry[0].contains(rect):
+                return True
+        return False
+
+    def interaction_active(self):
+        """Whether the user is currently moving or transforming items."""
+
+        if self.move_active or self.multi_select_item.is_action_active():
+            return True
+        # Only a single selected item shows its own transform handles,
+        # so there's no need to look through the whole selection
+        selection = self.selected_user_items()
+        return len(selection) == 1 and selection[0].is_action_active()
+
     def selectedItems(self, user_only=False):
         """If ``user_only`` is set to ``True``, only return items added
         by the user (i.e. no multi select outlines and other UI items).
@@ -360,10 +515,21 @@ class BeeGraphicsScene(QtWidgets.QGraphicsScene):
         User items are items that have a ``save_id`` attribute.
         """
 
-        items = super().selectedItems()
         if user_only:
-            return list(filter(lambda i: hasattr(i, 'save_id'), items))
-        return items
+            return list(self.selected_user_items())
+        return super().selectedItems()
+
+    def selected_user_items(self):
+        """The selected user items, cached until the selection changes.
+        Don't modify the returned list."""
+
+        if self.selection_cache is None:
+            self.selection_cache = list(filter(
+                lambda i: hasattr(i, 'save_id'), super().selectedItems()))
+        return self.selection_cache
+
+    def invalidate_selection_cache(self):
+        self.selection_cache = None
 
     def items_for_save(self):
 
@@ -383,6 +549,49 @@ class BeeGraphicsScene(QtWidgets.QGraphicsScene):
         for item in self.selectedItems():
             item.on_view_scale_change()
 
+    def mark_bounds_dirty(self, item):
+        """Mark a user item whose geometry, selection or scene has
+        changed, so that its bounds are updated on the next query."""
+
+        self.bounds_dirty.add(item)
+
+    def update_bounds(self):
+        if not self.bounds_dirty:
+            return
+        rects = []
+        selected = []
+        unselected = []
+        removed = []
+        for item in self.bounds_dirty:
+            if item.scene() is self:
+                rect = item.mapRectToScene(item.bounding_rect_unselected())
+                rects.append((item, rect))
+                if item.isSelected():
+                    selected.append((item, rect))
+                else:
+                    unselected.append(item)
+            else:
+                removed.append(item)
+        self.bounds.update(rects)
+        self.bounds.remove_many(removed)
+        self.selection_bounds.update(selected)
+        self.selection_bounds.remove_many(unselected + removed)
+        self.bounds_dirty.clear()
+
+    def item_geometry(self, items):
+        """The geometry of the given items as columns, see
+        ``geometry.ItemGeometry``. Scene bounding rects are taken from
+        the bounds index where possible."""
+
+        self.update_bounds()
+        rects = []
+        for item in items:
+            rect = self.bounds.get(item)
+            if rect is None:
+                rect = item.mapRectToScene(item.bounding_rect_unselected())
+            rects.append(rect)
+        return ItemGeometry(items, rects)
+
     def itemsBoundingRect(self, selection_only=False, items=None):
         """Returns the bounding rect of the scene's items; either all of them
         or only selected ones, or the items givin in ``items``.
@@ -390,30 +599,12 @@ class BeeGraphicsScene(QtWidgets.QGraphicsScene):
         Re-implemented to not include the items's selection handles.
         """
 
-        def filter_user_items(ilist):
-            return list(filter(lambda i: hasattr(i, 'save_id'), ilist))
-
+        self.update_bounds()
         if selection_only:
-            base = filter_user_items(self.selectedItems())
-        elif items:
-            base = items
-        else:
-            base = filter_user_items(self.items())
-
-        if not base:
-            return QtCore.QRectF(0, 0, 0, 0)
-
-        x = []
-        y = []
-
-        for item in base:
-            for corner in item.corners_scene_coords:
-                x.append(corner.x())
-                y.append(corner.y())
-
-        return QtCore.QRectF(
-            QtCore.QPointF(min(x), min(y)),
-            QtCore.QPointF(max(x), max(y)))
+            return self.selection_bounds.bounding_rect()
+        if not items:
+            return self.bounds.bounding_rect()
+        return self.item_geometry(items).bounding_rect()
 
     def get_selection_center(self):
         rect = self.itemsBoundingRect(selection_only=True)
@@ -448,20 +639,27 @@ class BeeGraphicsScene(QtWidgets.QGraphicsScene):
     def add_queued_items(self):
         """Adds items added via ``add_items_later``"""
 
-        while not self.items_to_add.empty():
-            data, selected = self.items_to_add.get()
-            typ = data.pop('type')
-            cls = item_registry.get(typ)
-            if not cls:
-                # Just in case we add new item types in future versions
-                logger.warning(f'Encountered item of unknown type: {typ}')
-                cls = item_registry.get('text')
-                data['data'] = {'text': f'Item of unknown type: {typ}'}
-            item = cls.create_from_data(**data)
-            item.update_from_data(**data)
-            self.addItem(item)
-            # Force recalculation of min/max z values:
-            item.setZValue(item.zValue())
-            if selected:
-                item.setSelected(True)
-                item.bring_to_front()
+        if self.items_to_add.empty():
+            return
+
+        with self.bulk_mutation(self.items_to_add.qsize()):
+            while not self.items_to_add.empty():
+                data, selected = self.items_to_add.get()
+                typ = data.pop('type')
+                cls = item_registry.get(typ)
+                if not cls:
+                    # Just in case we add new item types in future versions
+                    logger.warning(
+                        f'Encountered item of unknown type: {typ}')
+                    cls = item_registry.get('text')
+                    data['data'] = {'text': f'Item of unknown type: {typ}'}
+                item = cls.create_from_data(**data)
+                item.update_from_data(**data)
+                self.addItem(item)
+                # Force recalculation of min/max z values:
+                item.setZValue(item.zValue())
+                if selected:
+                    item.setSelected(True)
+                    item.bring_to_front()
+        # Items built by loader threads couldn't be budgeted there
+        get_pixel_cache().register_pending()
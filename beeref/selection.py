@@ -33,6 +33,10 @@ commandline_args = CommandlineArgs()
 logger = logging.getLogger(__name__)
 SELECT_COLOR = QtGui.QColor(*COLORS['Scene:Selection'])
 
+# Scale and rotate gestures on more items than this transform a
+# temporary parent item instead of every single item
+GESTURE_GROUP_THRESHOLD = 20
+
 
 def with_anchor(func):
     """Decorator that adds an anchor parameter to transform operations.
@@ -119,6 +123,42 @@ class BaseItemMixin:
         return self.mapToScene(self.center)
 
 
+class HandleGeometry:
+    """The interactable areas of an item's selection handles, in item
+    coordinates. See ``SelectableMixin.handle_geometry``."""
+
+    def __init__(self, item, key):
+        self.key = key
+        self.free_center = item.select_handle_free_center()
+        resize_size = item.select_resize_size
+        self.shape_margin = resize_size / 2
+        # (corner, scale rect, rect around the rotate area)
+        self.corners = [(corner,
+                         item.get_scale_rect(corner),
+                         item.get_rotate_rect(corner))
+                        for corner in item.corners]
+        self.flip_edges = item.get_flip_bounds()
+        # Built on demand, see SelectableMixin.shape
+        self.shape = None
+
+    def handle_at(self, pos):
+        """The handle at the given position as ``(kind, target)``, where
+        kind is ``'scale'`` or ``'rotate'`` with the corner as target,
+        or ``'flip'`` with the edge as target. ``None`` if there is no
+        handle at that position."""
+
+        for corner, scale_rect, rotate_rect in self.corners:
+            # The rotate area surrounds the scale area, so checking
+            # the scale area first leaves the L shape for rotating
+            if scale_rect.contains(pos):
+                return ('scale', corner)
+            if rotate_rect.contains(pos):
+                return ('rotate', corner)
+        for edge in self.flip_edges:
+            if edge['rect'].contains(pos):
+                return ('flip', edge)
+
+
 class SelectableMixin(BaseItemMixin):
     """Common code for selectable items: Selection outline, handles etc."""
 
@@ -135,6 +175,7 @@ class SelectableMixin(BaseItemMixin):
             | QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable)
 
         self.viewport_scale = 1
+        self.gesture_group = None
         self.reset_actions()
         self.is_editable = False
 
@@ -148,19 +189,35 @@ class SelectableMixin(BaseItemMixin):
                     self.rotate_active,
                     self.flip_active))
 
+    def view_scale(self):
+        if self.scene():
+            self._view_scale = self.scene().views()[0].get_scale()
+
+        # It can happen that the item is already removed from
+        # the scene but its boundingRect is still needed. Keep the
+        # last known scaling factor for that case
+        return getattr(self, '_view_scale', 1)
+
     def fixed_length_for_viewport(self, value):
         """The interactable areas need to stay the same size on the
         screen so we need to adjust the values according to the scale
         factor sof the view and the item."""
 
-        if self.scene():
-            scale = self.scene().views()[0].get_scale()
-            self._view_scale = scale
+        return value / self.view_scale() / self.scale()
 
-        # It can happen that the item is already removed from
-        # the scene but its boundingRect is still needed. Keep the
-        # last known scaling factor for that case
-        return value / getattr(self, '_view_scale', 1) / self.scale()
+    def handle_geometry(self):
+        """The interactable areas of the selection handles. They only
+        depend on the view's and item's scale and the item's size, so
+        they are kept until one of those changes."""
+
+        rect = self.bounding_rect_unselected()
+        key = (self.view_scale(), self.scale(),
+               rect.x(), rect.y(), rect.width(), rect.height())
+        geometry = getattr(self, '_handle_geometry', None)
+        if geometry is None or geometry.key != key:
+            geometry = HandleGeometry(self, key)
+            self._handle_geometry = geometry
+        return geometry
 
     @property
     def select_resize_size(self):
@@ -241,17 +298,30 @@ class SelectableMixin(BaseItemMixin):
 
         return [self.mapToScene(corner) for corner in self.corners]
 
+    def get_scale_rect(self, corner, margin=0):
+        size = self.select_resize_size
+        return QtCore.QRectF(
+            corner.x() - size/2 - margin,
+            corner.y() - size/2 - margin,
+            size + 2 * margin,
+            size + 2 * margin)
+
     def get_scale_bounds(self, corner, margin=0):
         """The interactable shape of the scale handles. The scale handles sit
         centered around the visible handle."""
         path = QtGui.QPainterPath()
-        path.addRect(QtCore.QRectF(
-            corner.x() - self.select_resize_size/2 - margin,
-            corner.y() - self.select_resize_size/2 - margin,
-            self.select_resize_size + 2 * margin,
-            self.select_resize_size + 2 * margin))
+        path.addRect(self.get_scale_rect(corner, margin))
         return path
 
+    def get_rotate_rect(self, corner):
+        """The whole square containing the rotate area of the given
+        corner, including the scale area."""
+
+        d = self.get_corner_direction(corner)
+        p1 = corner - d * self.select_resize_size / 2
+        p2 = p1 + d * (self.select_resize_size + self.select_rotate_size)
+        return utils.get_rect_from_points(p1, p2)
+
     def get_rotate_bounds(self, corner):
         """The interactable shape of the rotation area. It sits around the
         scale area like an L shape, e.g. for the bottom right corner:
@@ -264,12 +334,7 @@ class SelectableMixin(BaseItemMixin):
         """
 
         path = QtGui.QPainterPath()
-
-        # The whole square containing the rotate area:
-        d = self.get_corner_direction(corner)
-        p1 = corner - d * self.select_resize_size / 2
-        p2 = p1 + d * (self.select_resize_size + self.select_rotate_size)
-        path.addRect(utils.get_rect_from_points(p1, p2))
+        path.addRect(self.get_rotate_rect(corner))
 
         # Substract the scale area:
         # We need to make the substracted shape slightly bigger due to:
@@ -337,52 +402,59 @@ class SelectableMixin(BaseItemMixin):
             return self.bounding_rect_unselected()
 
         # Add extra space for the interactive areas
-        margin = self.select_resize_size / 2 + self.select_rotate_size
+        margin = self.fixed_length_for_viewport(
+            self.SELECT_RESIZE_SIZE / 2 + self.SELECT_ROTATE_SIZE)
         return self.bounding_rect_unselected().marginsAdded(
             QtCore.QMarginsF(margin, margin, margin, margin))
 
-    def shape(self):
+    def selection_shape(self):
+        """The shape including the selection handles."""
+
         path = QtGui.QPainterPath()
+        margin = self.select_resize_size / 2
+        rect = self.bounding_rect_unselected().marginsAdded(
+            QtCore.QMarginsF(margin, margin, margin, margin))
+        path.addRect(rect)
+        for corner in self.corners:
+            path.addPath(self.get_rotate_bounds(corner))
+        return path
+
+    def shape(self):
         if self.has_selection_handles():
-            margin = self.select_resize_size / 2
-            rect = self.bounding_rect_unselected().marginsAdded(
-                QtCore.QMarginsF(margin, margin, margin, margin))
-            path.addRect(rect)
-            for corner in self.corners:
-                path.addPath(self.get_rotate_bounds(corner))
-        else:
-            rect = self.bounding_rect_unselected()
-            path.addRect(rect)
+            geometry = self.handle_geometry()
+            if geometry.shape is None:
+                geometry.shape = self.selection_shape()
+            return geometry.shape
+        path = QtGui.QPainterPath()
+        path.addRect(self.bounding_rect_unselected())
         return path
 
     def hoverMoveEvent(self, event):
         if not self.has_selection_handles():
             return
 
-        if event.pos() in self.select_handle_free_center():
+        geometry = self.handle_geometry()
+        if event.pos() in geometry.free_center:
             # This area should always trigger regular move operations,
             # even if it is covered by selection scale/flip/... handles.
             # This ensures that small items can always still be moved/edited.
             self.setCursor(Qt.CursorShape.ArrowCursor)
             return
 
-        for corner in self.corners:
-            # See if we need to change the cursor for interactable areas
-            if self.get_scale_bounds(corner).contains(event.pos()):
-                self.setCursor(self.get_corner_scale_cursor(corner))
-                return
-            elif self.get_rotate_bounds(corner).contains(event.pos()):
-                self.setCursor(BeeAssets().cursor_rotate)
-                return
-        for edge in self.get_flip_bounds():
-            if edge['rect'].contains(event.pos()):
-                if self.get_edge_flips_v(edge):
-                    self.setCursor(BeeAssets().cursor_flip_v)
-                else:
-                    self.setCursor(BeeAssets().cursor_flip_h)
-                return
-
-        self.setCursor(Qt.CursorShape.ArrowCursor)
+        # See if we need to change the cursor for interactable areas
+        handle = geometry.handle_at(event.pos())
+        if handle is None:
+            self.setCursor(Qt.CursorShape.ArrowCursor)
+            return
+        kind, target = handle
+        if kind == 'scale':
+            self.setCursor(self.get_corner_scale_cursor(target))
+        elif kind == 'rotate':
+            self.setCursor(BeeAssets().cursor_rotate)
+        elif self.get_edge_flips_v(target):
+            self.setCursor(BeeAssets().cursor_flip_v)
+        else:
+            self.setCursor(BeeAssets().cursor_flip_h)
 
     def hoverEnterEvent(self, event):
         # Always return regular cursor when there aren't any selection handles
@@ -398,7 +470,8 @@ class SelectableMixin(BaseItemMixin):
             super().mousePressEvent(event)
             return
 
-        if event.pos() in self.select_handle_free_center():
+        geometry = self.handle_geometry()
+        if event.pos() in geometry.free_center:
             # This area should always trigger regular move operations,
             # even if it is covered by selection scale/flip/... handles.
             # This ensures that small items can always still be moved/edited.
@@ -407,41 +480,38 @@ class SelectableMixin(BaseItemMixin):
 
         if (event.button() == Qt.MouseButton.LeftButton
                 and self.has_selection_handles()):
-            for corner in self.corners:
-                # Check if we are in one of the corner's scale areas
-                if self.get_scale_bounds(corner).contains(event.pos()):
-                    # Start scale action for this corner
-                    self.scale_active = True
-                    self.event_direction = self.get_direction_from_center(
-                        event.scenePos())
-                    self.event_anchor = self.mapToScene(
-                        self.get_scale_anchor(corner))
-                    for item in self.selection_action_items():
-                        item.scale_orig_factor = item.scale()
-                    event.accept()
-                    return
-                # Check if we are in one of the corner's rotate areas
-                if self.get_rotate_bounds(corner).contains(event.pos()):
-                    # Start rotate action
-                    self.rotate_active = True
-                    self.event_anchor = self.center_scene_coords
-                    self.rotate_start_angle = self.get_rotate_angle(
-                        event.scenePos())
-                    for item in self.selection_action_items():
-                        item.rotate_orig_degrees = item.rotation()
-                    event.accept()
-                    return
-                # Check if we are in one of the flip edges:
-                for edge in self.get_flip_bounds():
-                    if edge['rect'].contains(event.pos()):
-                        self.flip_active = True
-                        event.accept()
-                        self.scene().undo_stack.push(
-                            commands.FlipItems(
-                                self.selection_action_items(),
-                                self.center_scene_coords,
-                                vertical=self.get_edge_flips_v(edge)))
-                        return
+            handle = geometry.handle_at(event.pos())
+            kind, target = handle or (None, None)
+            if kind == 'scale':
+                # Start scale action for this corner
+                self.scale_active = True
+                self.event_direction = self.get_direction_from_center(
+                    event.scenePos())
+                self.event_anchor = self.mapToScene(
+                    self.get_scale_anchor(target))
+                for item in self.selection_action_items():
+                    item.scale_orig_factor = item.scale()
+                event.accept()
+                return
+            if kind == 'rotate':
+                # Start rotate action
+                self.rotate_active = True
+                self.event_anchor = self.center_scene_coords
+                self.rotate_start_angle = self.get_rotate_angle(
+                    event.scenePos())
+                for item in self.selection_action_items():
+                    item.rotate_orig_degrees = item.rotation()
+                event.accept()
+                return
+            if kind == 'flip':
+                self.flip_active = True
+                event.accept()
+                self.scene().undo_stack.push(
+                    commands.FlipItems(
+                        self.selection_action_items(),
+                        self.center_scene_coords,
+                        vertical=self.get_edge_flips_v(target)))
+                return
 
         super().mousePressEvent(event)
 
@@ -539,19 +609,27 @@ class SelectableMixin(BaseItemMixin):
 
         if self.scale_active:
             factor = self.get_scale_factor(event)
-            for item in self.selection_action_items():
+
+            def apply(item):
                 item.setScale(item.scale_orig_factor * factor,
                               item.mapFromScene(self.event_anchor))
+
+            self.transform_gesture_items(
+                apply, QtGui.QTransform.fromScale(factor, factor))
             event.accept()
             return
         if self.rotate_active:
             snap = (event.modifiers() == Qt.KeyboardModifier.ControlModifier
                     or event.modifiers() == Qt.KeyboardModifier.ShiftModifier)
             delta = self.get_rotate_delta(event.scenePos(), snap)
-            for item in self.selection_action_items():
+
+            def apply(item):
                 item.setRotation(
                     item.rotate_orig_degrees + delta * item.flip(),
                     item.mapFromScene(self.event_anchor))
+
+            self.transform_gesture_items(
+                apply, QtGui.QTransform().rotate(delta))
             event.accept()
             return
         if self.flip_active:
@@ -563,7 +641,120 @@ class SelectableMixin(BaseItemMixin):
 
         super().mouseMoveEvent(event)
 
+    def transform_gesture_items(self, apply, transform):
+        """Applies the current step of a scale or rotate gesture.
+
+        ``apply(item)`` transforms a single item. When there are many
+        items, they are moved into a temporary parent item instead, which
+        gets ``transform`` around the event anchor. ``apply`` is kept to
+        transform the items themselves when the gesture ends, see
+        ``end_gesture_group``.
+        """
+
+        items = self.selection_action_items()
+        if (self.gesture_group is None
+                and len(items) > GESTURE_GROUP_THRESHOLD):
+            self.begin_gesture_group(items)
+        if not self.gesture_group:
+            for item in items:
+                apply(item)
+            return
+
+        if self in items:
+            apply(self)
+        anchor = self.event_anchor
+        self.gesture_group.setTransform(
+            QtGui.QTransform.fromTranslate(-anchor.x(), -anchor.y())
+            * transform
+            * QtGui.QTransform.fromTranslate(anchor.x(), anchor.y()))
+        # The items don't get notified when their parent transforms
+        scene = self.scene()
+        for item in self.gesture_group.childItems():
+            scene.mark_bounds_dirty(item)
+        self.gesture_apply = apply
+
+    def begin_gesture_group(self, items):
+        """Moves the items into a temporary parent item. Sets
+        ``gesture_group`` to ``False`` if that would change how the items
+        are stacked with other items, since the parent item can only
+        have a single place in the stacking order."""
+
+        z_values = [item.zValue() for item in items if item is not self]
+        low = min(z_values)
+        high = max(z_values)
+        selected = set(items)
+        for item in self.scene().items():
+            if (hasattr(item, 'save_id')
+                    and item not in selected
+                    and low <= item.zValue() <= high):
+                logger.debug('Not grouping items for gesture: '
+                             f'{item} is stacked between them')
+                self.gesture_group = False
+                return
+
+        logger.debug(f'Grouping {len(items)} items for gesture')
+        group = QtWidgets.QGraphicsItemGroup()
+        self.scene().addItem(group)
+        # The items keep their z values, so they keep their order
+        # within the group
+        group.setZValue(low)
+        for item in items:
+            if item is not self:
+                # The group has no transform yet, so the items stay in
+                # place without changing their own transforms
+                item.setParentItem(group)
+        self.gesture_group = group
+
+    def end_gesture_group(self):
+        """Moves the items out of the temporary parent item and gives
+        them the gesture's last transform themselves."""
+
+        if not self.gesture_group:
+            self.gesture_group = None
+            return
+        group = self.gesture_group
+        self.gesture_group = None
+        items = group.childItems()
+        logger.debug(f'Ungrouping {len(items)} items after gesture')
+        for item in items:
+            item.setParentItem(None)
+            self.gesture_apply(item)
+        self.scene().removeItem(group)
+        self.gesture_apply = None
+
+    def cancel_gesture(self):
+        """Cancels an ongoing scale or rotate gesture and puts the items
+        back to how they were before."""
+
+        if self.scale_active:
+            def restore(item):
+                item.setScale(item.scale_orig_factor,
+                              item.mapFromScene(self.event_anchor))
+        elif self.rotate_active:
+            def restore(item):
+                item.setRotation(item.rotate_orig_degrees,
+                                 item.mapFromScene(self.event_anchor))
+        else:
+            return
+
+        logger.debug(f'Canceling gesture on {self}')
+        if self.gesture_group:
+            self.gesture_apply = restore
+        self.end_gesture_group()
+        for item in self.selection_action_items():
+            restore(item)
+        self.reset_actions()
+
+    def sceneEvent(self, event):
+        if event.type() == QtCore.QEvent.Type.UngrabMouse:
+            # When the gesture ends normally, the mouse release has
+            # already reset the actions. Otherwise the mouse grab got
+            # lost, e.g. to a popup, or was released to cancel it.
+            self.cancel_gesture()
+        return super().sceneEvent(event)
+
     def mouseReleaseEvent(self, event):
+        self.end_gesture_group()
         if self.scale_active:
             if self.get_scale_factor(event) != 1:
                 self.scene().undo_stack.push(
@@ -588,7 +779,7 @@ class SelectableMixin(BaseItemMixin):
             self.reset_actions()
             return
         elif self.flip_active:
-            for edge in self.get_flip_bounds():
+            for edge in self.handle_geometry().flip_edges:
                 if edge['rect'].contains(event.pos()):
                     # We have already flipped on MousePress, but we
                     # still need to accept the event here as to not
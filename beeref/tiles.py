@@ -0,0 +1,281 @@
+# This file is part of BeeRef.
+#
+# BeeRef is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BeeRef is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Tiled storage for images that are too large to be kept in memory as
+a whole.
+
+The image is split into square tiles, which are kept encoded in a
+temporary file and decoded when they need to be painted. Level 0 holds
+the tiles at full resolution; every further level is scaled down by
+half, up to the level that fits into a single tile.
+"""
+
+from collections import OrderedDict
+import itertools
+import logging
+import math
+
+from PyQt6 import QtCore, QtGui
+from PyQt6.QtCore import Qt
+
+from beeref.config import BeeSettings
+from beeref.pixelcache import SpillFile
+from beeref import utils
+
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 512
+
+# Images with more pixels than this are tiled on import, unless
+# configured otherwise in the settings file
+TILED_THRESHOLD_MP = 64
+
+# Default in MB, can be changed in the settings file
+TILE_CACHE_MB = 256
+
+# Decoded size in MB of the bands that large images are read in, if
+# Qt's allocation limit doesn't ask for less. Each band is decoded
+# from the top of the file, so fewer bands are faster.
+TILE_BAND_MB = 512
+
+# Limit for decoding images in MB, see QImageReader.setAllocationLimit.
+# Images that can't be read in bands need to be decoded in one go, so
+# there is no limit by default. Can be changed in the settings file.
+IMAGE_ALLOCATION_LIMIT_MB = 0
+
+# Tiles of JPEG images are stored as JPEG with this quality
+JPEG_QUALITY = 95
+
+
+def set_allocation_limit():
+    """Set Qt's allocation limit for decoding images. The limit applies
+    to all image readers, so this needs to be done once on startup
+    rather than from the worker threads that read the images."""
+
+    limit = BeeSettings().value(
+        'Items/image_allocation_limit_mb', IMAGE_ALLOCATION_LIMIT_MB,
+        type=int)
+    logger.debug(f'Setting image allocation limit to {limit} MB')
+    QtGui.QImageReader.setAllocationLimit(limit)
+
+
+def is_large_image(path):
+    """Whether the image at ``path`` should be imported as a tiled image.
+    Only reads the image header."""
+
+    size = QtGui.QImageReader(path).size()
+    if not size.isValid():
+        return False
+    threshold = BeeSettings().value(
+        'Items/tiled_threshold_mp', TILED_THRESHOLD_MP, type=int)
+    return size.width() * size.height() > threshold * 10**6
+
+
+class TileStore:
+    """The encoded tiles of one image, kept in a temporary file.
+
+    Stores are never changed once they are filled, so they can be shared
+    between copies of an item.
+    """
+
+    _ids = itertools.count()
+
+    def __init__(self, size, tile_size=TILE_SIZE):
+        self.id = next(self._ids)
+        self.size = size
+        self.tile_size = tile_size
+        self.index = {}
+        self.spill_file = SpillFile()
+        longest = max(size.width(), size.height(), 1)
+        self.levels = 1 + max(0, math.ceil(math.log2(longest / tile_size)))
+
+    def level_size(self, level):
+        return QtCore.QSize(math.ceil(self.size.width() / 2**level),
+                            math.ceil(self.size.height() / 2**level))
+
+    def grid(self, level):
+        """Number of tile columns and rows of the given level."""
+
+        size = self.level_size(level)
+        return (math.ceil(size.width() / self.tile_size),
+                math.ceil(size.height() / self.tile_size))
+
+    def tile_rect(self, level, col, row):
+        """The tile's area in the level's pixel coordinates."""
+
+        size = self.level_size(level)
+        rect = QtCore.QRect(col * self.tile_size, row * self.tile_size,
+                            self.tile_size, self.tile_size)
+        return rect.intersected(QtCore.QRect(QtCore.QPoint(0, 0), size))
+
+    def put(self, level, col, row, data):
+        self.index[(level, col, row)] = self.spill_file.write(data)
+
+    def get(self, level, col, row):
+        location = self.index.get((level, col, row))
+        if location:
+            return self.spill_file.read(*location)
+
+    def decode(self, level, col, row):
+        data = self.get(level, col, row)
+        if data is None:
+            return QtGui.QImage()
+        return utils.optimize_pixel_format(QtGui.QImage.fromData(data))
+
+    def __iter__(self):
+        """Yields ``(level, col, row, data)`` for all tiles."""
+
+        for (level, col, row) in sorted(self.index):
+            yield (level, col, row, self.get(level, col, row))
+
+    def __len__(self):
+        return len(self.index)
+
+    def add_image(self, img, level, top, fmt='PNG'):
+        """Split a band of the given level into tiles. The band starts
+        at tile row ``top`` and covers the full width of the level.
+        It can span several tile rows."""
+
+        cols, rows = self.grid(level)
+        band_rows = math.ceil(img.height() / self.tile_size)
+        for row in range(top, min(rows, top + band_rows)):
+            for col in range(cols):
+                rect = self.tile_rect(level, col, row)
+                rect.translate(0, -top * self.tile_size)
+                self.put(level, col, row, self.encode(img.copy(rect), fmt))
+
+    def build_levels(self, fmt='PNG'):
+        """Generate all scaled down levels from level 0."""
+
+        for level in range(1, self.levels):
+            cols, rows = self.grid(level)
+            for row in range(rows):
+                for col in range(cols):
+                    self.put(level, col, row, self.encode(
+                        self.compose_tile(level, col, row), fmt))
+
+    def encode(self, img, fmt):
+        quality = JPEG_QUALITY if fmt == 'JPG' else -1
+        return utils.image_to_bytes(img, fmt, quality)
+
+    def compose_tile(self, level, col, row):
+        """Scale the (up to) four tiles of the level below into one."""
+
+        rect = self.tile_rect(level, col, row)
+        img = QtGui.QImage(
+            rect.size(), QtGui.QImage.Format.Format_ARGB32_Premultiplied)
+        img.fill(Qt.GlobalColor.transparent)
+        painter = QtGui.QPainter(img)
+        painter.setRenderHint(
+            QtGui.QPainter.RenderHint.SmoothPixmapTransform)
+        half = self.tile_size / 2
+        for dy in (0, 1):
+            for dx in (0, 1):
+                child = self.decode(level - 1, 2 * col + dx, 2 * row + dy)
+                if child.isNull():
+                    continue
+                target = QtCore.QRectF(dx * half, dy * half,
+                                       child.width() / 2, child.height() / 2)
+                painter.drawImage(target, child)
+        painter.end()
+        return img
+
+
+def tile_image_file(path, tile_size=TILE_SIZE, band_mb=None):
+    """Read the image file at ``path`` into a new tile store. Returns
+    ``None`` if the image can't be read.
+
+    If the image format supports it and the image is larger than
+    ``band_mb``, it is read in bands of several tile rows, so that the
+    whole image never needs to be in memory.
+    """
+
+    reader = QtGui.QImageReader(path)
+    size = reader.size()
+    if not size.isValid():
+        return None
+    store = TileStore(size, tile_size)
+    fmt = 'JPG' if reader.format() in (b'jpeg', b'jpg') else 'PNG'
+    logger.debug(f'Tiling {path} ({size.width()} x {size.height()}, '
+                 f'{store.levels} levels)')
+
+    if band_mb is None:
+        band_mb = QtGui.QImageReader.allocationLimit() or TILE_BAND_MB
+    cols, rows = store.grid(0)
+    row_bytes = size.width() * tile_size * 4
+    band_rows = max(1, int(band_mb * 2**20 // row_bytes))
+    clip = QtGui.QImageIOHandler.ImageOption.ClipRect
+
+    if band_rows < rows and reader.supportsOption(clip):
+        for top in range(0, rows, band_rows):
+            band = QtCore.QRect(0, top * tile_size,
+                                size.width(), band_rows * tile_size)
+            band = band.intersected(QtCore.QRect(QtCore.QPoint(), size))
+            # A reader can only read once
+            reader = QtGui.QImageReader(path)
+            reader.setClipRect(band)
+            img = reader.read()
+            if img.isNull():
+                logger.debug(f'Reading band failed: {reader.errorString()}')
+                return None
+            store.add_image(img, 0, top, fmt)
+    else:
+        img = reader.read()
+        if img.isNull():
+            logger.debug(f'Reading image failed: {reader.errorString()}')
+            return None
+        store.add_image(img, 0, 0, fmt)
+
+    store.build_levels(fmt)
+    return store
+
+
+class TileCache:
+    """Decoded tiles of all tile stores, least recently used first."""
+
+    def __init__(self, budget=None):
+        if budget is None:
+            budget = BeeSettings().value(
+                'Memory/tile_cache_mb', TILE_CACHE_MB, type=int) * 2**20
+        self.budget = budget
+        self.tiles = OrderedDict()
+        self.size = 0
+
+    def get(self, store, level, col, row):
+        key = (store.id, level, col, row)
+        img = self.tiles.get(key)
+        if img is not None:
+            self.tiles.move_to_end(key)
+            return img
+
+        logger.trace(f'Decoding tile {key}')
+        img = store.decode(level, col, row)
+        self.tiles[key] = img
+        self.size += img.sizeInBytes()
+        while self.size > self.budget and len(self.tiles) > 1:
+            _, old = self.tiles.popitem(last=False)
+            self.size -= old.sizeInBytes()
+        return img
+
+
+_tile_cache = None
+
+
+def get_tile_cache():
+    global _tile_cache
+    if _tile_cache is None:
+        _tile_cache = TileCache()
+    return _tile_cache
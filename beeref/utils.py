@@ -13,9 +13,14 @@
 # You should have received a copy of the GNU General Public License
 # along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
 
+import logging
+
 from PyQt6 import QtCore, QtGui
 
 
+logger = logging.getLogger(__name__)
+
+
 def create_palette_from_dict(conf):
     """Create a palette from a config dictionary. Keys are a string of
     'ColourGroup:ColorRole' and values are a (r, g, b) tuple. E.g:
@@ -46,6 +51,62 @@ def create_palette_from_dict(conf):
     return palette
 
 
+def image_to_bytes(img, fmt='PNG', quality=-1):
+    """Encode a QImage into a bytestring (PNG by default)."""
+
+    barray = QtCore.QByteArray()
+    buffer = QtCore.QBuffer(barray)
+    buffer.open(QtCore.QIODevice.OpenModeFlag.WriteOnly)
+    img.save(buffer, fmt, quality)
+    return barray.data()
+
+
+def is_opaque(img):
+    """Whether the image has no (partly) transparent pixels, regardless
+    of its format."""
+
+    if not img.hasAlphaChannel():
+        return True
+    alpha = img.convertToFormat(QtGui.QImage.Format.Format_Alpha8)
+    opaque = QtGui.QImage(alpha.size(), QtGui.QImage.Format.Format_Alpha8)
+    opaque.fill(QtGui.QColor(0, 0, 0, 255))
+    return alpha == opaque
+
+
+# Formats that are already as compact as we can paint them
+COMPACT_FORMATS = (
+    QtGui.QImage.Format.Format_Mono,
+    QtGui.QImage.Format.Format_MonoLSB,
+    QtGui.QImage.Format.Format_Indexed8,
+    QtGui.QImage.Format.Format_Grayscale8,
+    QtGui.QImage.Format.Format_Grayscale16,
+)
+
+
+def optimize_pixel_format(img):
+    """Converts the image to the most compact format that still keeps
+    all its information: 8 bit grayscale for opaque grey images, 24 bit
+    RGB for other opaque images. Indexed and grayscale images are kept
+    as they are; images with transparency become premultiplied ARGB.
+    """
+
+    if img.isNull() or img.format() in COMPACT_FORMATS:
+        return img
+
+    if is_opaque(img):
+        if img.allGray():
+            fmt = QtGui.QImage.Format.Format_Grayscale8
+        else:
+            fmt = QtGui.QImage.Format.Format_RGB888
+    else:
+        fmt = QtGui.QImage.Format.Format_ARGB32_Premultiplied
+
+    if img.format() != fmt:
+        logger.debug(f'Converting image from {img.format()} to {fmt}')
+        img = img.convertToFormat(fmt)
+    return img
+
+
 def get_rect_from_points(point1, point2):
     """Constructs a QRectF from the given QPointF. The points can be *any*
     two opposing corners of the rectangle."""
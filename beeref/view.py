@@ -14,6 +14,7 @@
 # along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
 
 from functools import partial
+from queue import Queue
 import logging
 import os
 import os.path
@@ -27,14 +28,43 @@ from beeref.config import CommandlineArgs, BeeSettings
 from beeref import constants
 from beeref import fileio
 from beeref import widgets
-from beeref.items import BeePixmapItem, BeeTextItem
+from beeref.items import BeePixmapItem, BeeTextItem, BeeTiledPixmapItem
 from beeref.main_controls import MainControlsMixin
+from beeref import packing
 from beeref.scene import BeeGraphicsScene
+from beeref.viewcache import ViewportTileCache
 
 
 commandline_args = CommandlineArgs()
 logger = logging.getLogger(__name__)
 
+# Default for how many image pixels to keep per screen pixel when
+# optimizing the board resolution
+OVERSAMPLING = 2.0
+
+# Default for how long to wait after the last pan, zoom or item
+# transformation before repainting with smooth render hints
+SMOOTH_RENDERING_DELAY_MS = 200
+
+# Optimal arrangements of at least this many items are packed in
+# the background
+ARRANGE_IN_BACKGROUND_THRESHOLD = 100
+
+# Pan and zoom input is collected and applied at most once per frame
+INPUT_FRAME_MS = 16
+
+# Values for the View/viewport_update_mode setting
+VIEWPORT_UPDATE_MODES = {
+    'minimal':
+        QtWidgets.QGraphicsView.ViewportUpdateMode.MinimalViewportUpdate,
+    'smart':
+        QtWidgets.QGraphicsView.ViewportUpdateMode.SmartViewportUpdate,
+    'bounding':
+        QtWidgets.QGraphicsView.ViewportUpdateMode.BoundingRectViewportUpdate,
+    'full':
+        QtWidgets.QGraphicsView.ViewportUpdateMode.FullViewportUpdate,
+}
+
 
 class BeeGraphicsView(MainControlsMixin,
                       QtWidgets.QGraphicsView,
@@ -51,13 +81,18 @@ class BeeGraphicsView(MainControlsMixin,
             QtGui.QBrush(QtGui.QColor(*constants.COLORS['Scene:Canvas'])))
         self.setFrameShape(QtWidgets.QFrame.Shape.NoFrame)
 
-        self.undo_stack = QtGui.QUndoStack(self)
+        self.undo_stack = commands.BeeUndoStack(self)
         self.undo_stack.setUndoLimit(100)
         self.undo_stack.canRedoChanged.connect(self.on_can_redo_changed)
         self.undo_stack.canUndoChanged.connect(self.on_can_undo_changed)
         self.undo_stack.cleanChanged.connect(self.on_undo_clean_changed)
 
         self.filename = None
+        self.image_data_workers = []
+        self.folder_watcher = None
+        self.folder_sync_worker = None
+        self.folder_sync_pending = []
+        self.arrange_worker = None
         self.previous_transform = None
         self.pan_active = False
         self.zoom_active = False
@@ -68,11 +103,33 @@ class BeeGraphicsView(MainControlsMixin,
         self.scene.selectionChanged.connect(self.on_selection_changed)
         self.setScene(self.scene)
 
-        # self.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
-        # self.setRenderHint(QPainter.RenderHint.Antialiasing)
-        # self.setRenderHint(QPainter.RenderHint.TextAntialiasing)
-        # self.setRenderHint(QPainter.RenderHint.LosslessImageRendering)
-        # self.setRenderHint(QPainter.RenderHint.VerticalSubpixelPositioning)
+        self.set_viewport_update_mode(self.settings.value(
+            'View/viewport_update_mode', 'minimal'))
+        # Counts paint events for tracing
+        self.paint_count = 0
+
+        # Smooth rendering is switched off while the user pans, zooms or
+        # transforms items and switched back on once they pause, see
+        # begin_fast_rendering
+        self.smooth_rendering = False
+        self.smooth_rendering_timer = QtCore.QTimer(self)
+        self.smooth_rendering_timer.setSingleShot(True)
+        self.smooth_rendering_timer.setInterval(self.settings.value(
+            'View/smooth_rendering_delay_ms',
+            SMOOTH_RENDERING_DELAY_MS,
+            type=int))
+        self.smooth_rendering_timer.timeout.connect(
+            self.on_smooth_rendering_timeout)
+        # Pan and zoom input waiting to be applied, see flush_input
+        self.pending_pan = QtCore.QPointF(0, 0)
+        self.pending_zoom_factor = 1
+        self.pending_zoom_anchor = None
+        self.input_timer = QtCore.QTimer(self)
+        self.input_timer.setSingleShot(True)
+        self.input_timer.setInterval(INPUT_FRAME_MS)
+        self.input_timer.timeout.connect(self.flush_input)
+        # Rendered scene tiles, if enabled; see paintEvent
+        self.viewport_cache = None
 
         # Context menu and actions
         self.build_menu_and_actions()
@@ -113,6 +170,12 @@ class BeeGraphicsView(MainControlsMixin,
             self.welcome_overlay.show()
         else:
             self.welcome_overlay.hide()
+        if self.viewport_cache is not None:
+            transform = self.scale_transform()
+            for rect in region:
+                # Leave room for antialiasing at the edges
+                self.viewport_cache.invalidate(
+                    transform.mapRect(rect).adjusted(-2, -2, 2, 2))
         self.recalc_scene_rect()
 
     def on_can_redo_changed(self, can_redo):
@@ -141,6 +204,7 @@ class BeeGraphicsView(MainControlsMixin,
 
     def clear_scene(self):
         logging.debug('Clearing scene...')
+        self.unlink_folder()
         self.scene.clear()
         self.undo_stack.clear()
         self.filename = None
@@ -219,6 +283,21 @@ class BeeGraphicsView(MainControlsMixin,
         self.parent.create()
         self.parent.show()
 
+    def on_action_smooth_rendering(self, checked):
+        self.smooth_rendering = checked
+        self.smooth_rendering_timer.stop()
+        self.set_render_quality(smooth=checked)
+
+    def on_action_render_cache(self, checked):
+        self.scene.set_render_cache(checked)
+
+    def on_action_viewport_cache(self, checked):
+        if checked:
+            self.viewport_cache = ViewportTileCache()
+        else:
+            self.viewport_cache = None
+        self.viewport().update()
+
     def on_action_undo(self):
         logger.debug('Undo: %s' % self.undo_stack.undoText())
         self.scene.cancel_crop_mode()
@@ -271,7 +350,43 @@ class BeeGraphicsView(MainControlsMixin,
         self.scene.arrange(vertical=True)
 
     def on_action_arrange_optimal(self):
-        self.scene.arrange_optimal()
+        self.arrange_optimal()
+
+    def arrange_optimal(self, callback=None):
+        """Arrange the selected items optimally. Large selections are
+        packed in a worker thread, with a progress dialog for canceling.
+
+        :param callback: Called without arguments once the items have
+            been arranged
+        """
+
+        job = self.scene.arrange_optimal_job()
+        if job and len(job['items']) >= ARRANGE_IN_BACKGROUND_THRESHOLD:
+            logger.debug(f'Arranging {len(job["items"])} items optimally')
+            self.arrange_worker = fileio.ThreadedIO(packing.pack_job, job)
+            self.arrange_worker.finished.connect(
+                partial(self.on_arrange_optimal_finished, job, callback))
+            self.progress = widgets.BeeProgressDialog(
+                'Arranging items',
+                worker=self.arrange_worker,
+                parent=self)
+            self.arrange_worker.start()
+            return
+
+        if job:
+            packing.pack_job(job)
+            self.scene.finish_arrange_optimal(job)
+        if callback:
+            callback()
+
+    def on_arrange_optimal_finished(self, job, callback, filename, errors):
+        """Callback for when items have been packed in the background.
+        If packing has been canceled, the best arrangement found so far
+        is used."""
+
+        self.scene.finish_arrange_optimal(job)
+        if callback:
+            callback()
 
     def on_action_crop(self):
         self.scene.crop_items()
@@ -302,6 +417,100 @@ class BeeGraphicsView(MainControlsMixin,
         self.undo_stack.push(commands.ResetCrop(
             self.scene.selectedItems(user_only=True)))
 
+    def on_action_bake_crop(self):
+        self.scene.cancel_crop_mode()
+        self.bake_crops(self.scene.selectedItems(user_only=True))
+
+    def on_action_bake_all_crops(self):
+        self.scene.cancel_crop_mode()
+        self.bake_crops(self.scene.items_for_save())
+
+    def bake_crops(self, items):
+        """Cut the cropped regions out of the images in the background,
+        see ``on_bake_crops_finished``."""
+
+        jobs = []
+        for item in items:
+            if item.is_croppable and item.crop != item.pixmap_rect():
+                jobs.append({'item': item,
+                             'image': item.image(),
+                             'source_bytes': item.source_bytes,
+                             'rect': item.bake_crop_rect()})
+        if not jobs:
+            logger.debug('No crops to bake')
+            return
+
+        logger.debug(f'Baking crops of {len(jobs)} images')
+        self.worker = fileio.ThreadedIO(fileio.crop_images, jobs)
+        self.worker.finished.connect(
+            partial(self.on_bake_crops_finished, jobs, self.worker))
+        self.progress = widgets.BeeProgressDialog(
+            'Baking crops',
+            worker=self.worker,
+            parent=self)
+        self.worker.start()
+
+    def on_bake_crops_finished(self, jobs, worker, filename, errors):
+        """Callback for when the cropped regions have been cut out."""
+
+        if worker.canceled:
+            logger.debug('Baking crops canceled')
+            return
+        self.undo_stack.push(commands.BakeCrops(
+            [job['item'] for job in jobs],
+            [(job['result'], job['result_data']) for job in jobs],
+            [job['old_data'] for job in jobs]))
+
+    def on_action_optimize_resolution(self):
+        self.scene.cancel_crop_mode()
+        oversampling, ok = QtWidgets.QInputDialog.getDouble(
+            self,
+            'Optimize Resolution',
+            ('Reduce images to the resolution they are shown at with '
+             '100% zoom.\nImage pixels to keep per screen pixel:'),
+            self.settings.value(
+                'Items/oversampling', OVERSAMPLING, type=float),
+            1, 10, 1)
+        if not ok:
+            return
+        self.settings.setValue('Items/oversampling', oversampling)
+
+        jobs = []
+        for item in self.scene.items_for_save():
+            if not isinstance(item, BeePixmapItem):
+                continue
+            size = item.useful_size(oversampling)
+            if size:
+                jobs.append({'item': item,
+                             'image': item.image(),
+                             'source_bytes': item.source_bytes,
+                             'size': size})
+        if not jobs:
+            logger.debug('No images to optimize')
+            return
+
+        logger.debug(f'Optimizing resolution of {len(jobs)} images')
+        self.worker = fileio.ThreadedIO(fileio.resample_images, jobs)
+        self.worker.finished.connect(
+            partial(self.on_resample_finished, jobs, self.worker))
+        self.progress = widgets.BeeProgressDialog(
+            'Optimizing resolution',
+            worker=self.worker,
+            parent=self)
+        self.worker.start()
+
+    def on_resample_finished(self, jobs, worker, filename, errors):
+        """Callback for when images have been resampled for
+        optimizing the board resolution."""
+
+        if worker.canceled:
+            logger.debug('Optimizing resolution canceled')
+            return
+        self.undo_stack.push(commands.ResampleImages(
+            [job['item'] for job in jobs],
+            [(job['result'], job['result_data']) for job in jobs],
+            [job['old_data'] for job in jobs]))
+
     def on_action_reset_transforms(self):
         self.scene.cancel_crop_mode()
         self.undo_stack.push(commands.ResetTransforms(
@@ -359,6 +568,15 @@ class BeeGraphicsView(MainControlsMixin,
             self.undo_stack.setClean()
 
     def do_save(self, filename, create_new):
+        if any(getattr(item, 'is_placeholder', False)
+               for item in self.scene.items_for_save()):
+            logger.debug('Not saving while image data is still loading')
+            QtWidgets.QMessageBox.warning(
+                self,
+                'Problem saving file',
+                ('<p>Images are still being loaded.</p>'
+                 '<p>Please try again once they are done.</p>'))
+            return
         if not filename.endswith('.bee'):
             filename = f'{filename}.bee'
         self.worker = fileio.ThreadedIO(
@@ -427,7 +645,10 @@ class BeeGraphicsView(MainControlsMixin,
                 'Problem loading images',
                 msg + errornames)
         self.scene.add_queued_items()
-        self.scene.arrange_optimal()
+        self.arrange_optimal(
+            callback=partial(self.on_insert_images_arranged, new_scene))
+
+    def on_insert_images_arranged(self, new_scene):
         self.undo_stack.endMacro()
         if new_scene:
             self.on_action_fit_scene()
@@ -437,8 +658,12 @@ class BeeGraphicsView(MainControlsMixin,
             pos = self.get_view_center()
         self.scene.clearSelection()
         self.undo_stack.beginMacro('Insert Images')
+        if filenames and all(map(fileio.is_archive, filenames)):
+            func = fileio.load_images_from_archives
+        else:
+            func = fileio.load_images
         self.worker = fileio.ThreadedIO(
-            fileio.load_images,
+            func,
             filenames,
             self.mapToScene(pos),
             self.scene)
@@ -452,16 +677,168 @@ class BeeGraphicsView(MainControlsMixin,
             parent=self)
         self.worker.start()
 
+    def on_image_data_loaded(self, item, command, filename, errors):
+        """Callback for when raw image data for a placeholder item has
+        been decoded."""
+
+        if errors:
+            logger.info('Could not decode image data; removing placeholder')
+            if item.scene():
+                self.scene.removeItem(item)
+            self.undo_stack.discard(command)
+            QtWidgets.QMessageBox.warning(
+                self,
+                'Problem loading image',
+                'The image data could not be read')
+            return
+        item.apply_pending_image()
+
+    def do_insert_image_data(self, data, pos):
+        """Insert an image from raw image data at the given scene position.
+
+        A placeholder of the image's size is inserted right away, while
+        the data is decoded and converted in a worker thread.
+
+        :param data: A ``QImage`` or encoded image data as bytes
+        """
+
+        if isinstance(data, QtGui.QImage):
+            size = data.size()
+        else:
+            size = fileio.image_size_from_bytes(data)
+        item = BeePixmapItem.create_placeholder(size)
+        command = commands.InsertItems(self.scene, [item], pos)
+        self.undo_stack.push(command)
+
+        worker = fileio.ThreadedIO(fileio.load_image_data, data, item)
+        worker.finished.connect(
+            partial(self.on_image_data_loaded, item, command))
+        # Keep the worker until its thread has exited, which happens
+        # after its finished signal
+        worker.thread_finished.connect(
+            partial(self.image_data_workers.remove, worker))
+        self.image_data_workers.append(worker)
+        worker.start()
+
     def on_action_insert_images(self):
         self.scene.cancel_crop_mode()
         formats = self.get_supported_image_formats(QtGui.QImageReader)
         logger.debug(f'Supported image types for reading: {formats}')
+        archives = ' '.join(f'*{ext}' for ext in fileio.ARCHIVE_EXTENSIONS)
         filenames, f = QtWidgets.QFileDialog.getOpenFileNames(
             parent=self,
             caption='Select one or more images to open',
-            filter=f'Images ({formats})')
+            filter=f'Images ({formats});;Image Archives ({archives})')
         self.do_insert_images(filenames)
 
+    def link_folder(self, dirname):
+        """Keep the scene in sync with the image files in the given
+        folder: New images are inserted, changed images are updated in
+        place. Images that are already in the scene aren't imported
+        again."""
+
+        self.unlink_folder()
+        known = [item.filename for item in self.scene.items_for_save()
+                 if getattr(item, 'filename', None)]
+        self.folder_watcher = fileio.FolderWatcher(dirname, known=known)
+        self.folder_watcher.files_ready.connect(self.on_linked_files_ready)
+        self.actiongroup_set_enabled('active_when_linked_folder', True)
+
+    def unlink_folder(self):
+        if self.folder_watcher:
+            self.folder_watcher.stop()
+            self.folder_watcher = None
+        self.folder_sync_pending = []
+        self.actiongroup_set_enabled('active_when_linked_folder', False)
+
+    def on_action_link_folder(self):
+        self.scene.cancel_crop_mode()
+        dirname = QtWidgets.QFileDialog.getExistingDirectory(
+            parent=self,
+            caption='Select folder to keep in sync with the scene')
+        if dirname:
+            self.link_folder(os.path.normpath(dirname))
+
+    def on_action_unlink_folder(self):
+        self.unlink_folder()
+
+    def on_linked_files_ready(self, filenames):
+        self.folder_sync_pending.extend(filenames)
+        if not self.folder_sync_worker:
+            self.start_folder_sync()
+
+    def start_folder_sync(self):
+        """Decode pending files from the linked folder in the
+        background."""
+
+        filenames = self.folder_sync_pending
+        self.folder_sync_pending = []
+        logger.debug(f'Syncing files from linked folder: {filenames}')
+        queue = Queue()
+        self.folder_sync_worker = fileio.ThreadedIO(
+            fileio.load_images_into_queue, filenames, queue)
+        self.folder_sync_worker.finished.connect(
+            partial(self.on_folder_sync_finished, queue))
+        self.folder_sync_worker.thread_finished.connect(
+            partial(self.on_folder_sync_thread_finished,
+                    self.folder_sync_worker))
+        self.folder_sync_worker.start()
+
+    def on_folder_sync_thread_finished(self, worker):
+        """Callback for when the folder sync thread has exited, which
+        happens after its finished signal. Only now it's safe to drop
+        the worker."""
+
+        if worker is self.folder_sync_worker:
+            self.folder_sync_worker = None
+        if self.folder_sync_pending and self.folder_watcher:
+            self.start_folder_sync()
+
+    def on_folder_sync_finished(self, queue, filename, errors):
+        """Callback for when images from the linked folder have been
+        decoded: Update existing items in place, insert new ones."""
+
+        if not self.folder_watcher:
+            logger.debug('Folder has been unlinked; discarding sync')
+            return
+        if errors:
+            logger.info(f'Could not sync files from linked folder: {errors}')
+        existing = {}
+        for item in self.scene.items_for_save():
+            if getattr(item, 'filename', None):
+                existing[os.path.normpath(item.filename)] = item
+
+        new_items = []
+        updated_items = []
+        updated_images = []
+        while not queue.empty():
+            filename, img, source_bytes = queue.get()
+            item = existing.get(filename)
+            if isinstance(item, BeeTiledPixmapItem):
+                logger.debug(f'Not updating tiled {item} from linked folder')
+            elif item:
+                logger.debug(f'Updating {item} from linked folder')
+                updated_items.append(item)
+                updated_images.append((img, source_bytes))
+            else:
+                item = BeePixmapItem(img, filename)
+                item.source_bytes = source_bytes
+                new_items.append(item)
+
+        if updated_items:
+            self.undo_stack.push(
+                commands.ReplaceImages(updated_items, updated_images))
+
+        if new_items:
+            self.scene.cancel_crop_mode()
+            self.undo_stack.beginMacro('Insert Images')
+            self.undo_stack.push(commands.InsertItems(
+                self.scene,
+                new_items,
+                self.mapToScene(self.get_view_center())))
+            self.scene.arrange_optimal()
+            self.undo_stack.endMacro()
+
     def on_action_insert_text(self):
         self.scene.cancel_crop_mode()
         item = BeeTextItem()
@@ -501,10 +878,12 @@ class BeeGraphicsView(MainControlsMixin,
             self.scene.paste_from_internal_clipboard(pos)
             return
 
-        img = clipboard.image()
-        if not img.isNull():
-            item = BeePixmapItem(img)
-            self.undo_stack.push(commands.InsertItems(self.scene, [item], pos))
+        data = fileio.encoded_image_from_mimedata(clipboard.mimeData())
+        if data is None:
+            img = clipboard.image()
+            data = None if img.isNull() else img
+        if data is not None:
+            self.do_insert_image_data(data, pos)
             if len(self.scene.items()) == 1:
                 # This is the first image in the scene
                 self.on_action_fit_scene()
@@ -529,7 +908,8 @@ class BeeGraphicsView(MainControlsMixin,
                                      self.scene.has_selection())
         self.actiongroup_set_enabled('active_when_croppable',
                                      self.scene.has_croppable_selection())
-        self.viewport().repaint()
+        # No need to repaint here: (de)selected items mark their own
+        # regions as dirty, which Qt repaints in one go
 
     def recalc_scene_rect(self):
         """Resize the scene rectangle so that it is always one view width
@@ -541,13 +921,12 @@ class BeeGraphicsView(MainControlsMixin,
             return
         logger.trace('Recalculating scene rectangle...')
         try:
-            topleft = self.mapFromScene(
-                self.scene.itemsBoundingRect().topLeft())
+            rect = self.scene.itemsBoundingRect()
+            topleft = self.mapFromScene(rect.topLeft())
             topleft = self.mapToScene(QtCore.QPoint(
                 topleft.x() - self.size().width(),
                 topleft.y() - self.size().height()))
-            bottomright = self.mapFromScene(
-                self.scene.itemsBoundingRect().bottomRight())
+            bottomright = self.mapFromScene(rect.bottomRight())
             bottomright = self.mapToScene(QtCore.QPoint(
                 bottomright.x() + self.size().width(),
                 bottomright.y() + self.size().height()))
@@ -568,18 +947,105 @@ class BeeGraphicsView(MainControlsMixin,
             arguments and turns it into a number, for ex. ``min`` or ``max``.
         """
 
-        topleft = self.mapFromScene(
-            self.scene.itemsBoundingRect().topLeft())
-        bottomright = self.mapFromScene(
-            self.scene.itemsBoundingRect().bottomRight())
+        rect = self.scene.itemsBoundingRect()
+        topleft = self.mapFromScene(rect.topLeft())
+        bottomright = self.mapFromScene(rect.bottomRight())
         return func(bottomright.x() - topleft.x(),
                     bottomright.y() - topleft.y())
 
+    def set_render_quality(self, smooth):
+        if self.renderHints() & QtGui.QPainter.RenderHint.Antialiasing:
+            if smooth:
+                return
+        elif not smooth:
+            return
+
+        logger.trace(f'Setting smooth render hints to {smooth}')
+        self.setRenderHint(
+            QtGui.QPainter.RenderHint.SmoothPixmapTransform, smooth)
+        self.setRenderHint(QtGui.QPainter.RenderHint.Antialiasing, smooth)
+        self.viewport().update()
+
+    def begin_fast_rendering(self):
+        """Render with fast hints while the user is interacting. Smooth
+        rendering is restored after a short pause."""
+
+        if not self.smooth_rendering:
+            return
+        self.set_render_quality(smooth=False)
+        self.smooth_rendering_timer.start()
+
+    def on_smooth_rendering_timeout(self):
+        if self.smooth_rendering:
+            self.set_render_quality(smooth=True)
+
     def scale(self, *args, **kwargs):
         super().scale(*args, **kwargs)
         self.scene.on_view_scale_change()
         self.recalc_scene_rect()
 
+    def set_viewport_update_mode(self, name):
+        """Set how Qt determines the regions to repaint, see
+        ``VIEWPORT_UPDATE_MODES``."""
+
+        mode = VIEWPORT_UPDATE_MODES.get(name)
+        if mode is None:
+            logger.warning(f'Unknown viewport update mode: {name}')
+            mode = VIEWPORT_UPDATE_MODES['minimal']
+        logger.debug(f'Setting viewport update mode to {mode}')
+        self.setViewportUpdateMode(mode)
+
+    def scale_transform(self):
+        """The view's transform without translation."""
+
+        t = self.transform()
+        return QtGui.QTransform(t.m11(), t.m12(), t.m21(), t.m22(), 0, 0)
+
+    def render_viewport_tile(self, col, row):
+        """Render the scene for a tile of the viewport cache."""
+
+        rect = self.viewport_cache.tile_rect(col, row)
+        dpr = self.viewport().devicePixelRatioF()
+        img = QtGui.QImage((rect.size() * dpr).toSize(),
+                           QtGui.QImage.Format.Format_ARGB32_Premultiplied)
+        img.setDevicePixelRatio(dpr)
+        painter = QtGui.QPainter(img)
+        painter.setRenderHints(self.renderHints())
+        target = QtCore.QRectF(QtCore.QPointF(0, 0), rect.size())
+        painter.fillRect(target, self.backgroundBrush())
+        painter.setClipRect(target)
+        source = self.scale_transform().inverted()[0].mapRect(rect)
+        self.scene.render(painter, target, source,
+                          Qt.AspectRatioMode.IgnoreAspectRatio)
+        painter.end()
+        return img
+
+    def paintEvent(self, event):
+        self.paint_count += 1
+        logger.trace(
+            f'Paint {self.paint_count}: '
+            f'{event.region().rectCount()} dirty rects, '
+            f'bounding rect {event.region().boundingRect()}')
+        if self.viewport_cache is None:
+            super().paintEvent(event)
+            return
+
+        self.viewport_cache.set_key(self.scale_transform(),
+                                    self.viewport().devicePixelRatioF(),
+                                    self.renderHints())
+        # Tile coordinates are relative to the scene origin
+        vt = self.viewportTransform()
+        offset = QtCore.QPointF(round(vt.dx()), round(vt.dy()))
+        exposed = QtCore.QRectF(event.rect()).translated(-offset)
+        painter = QtGui.QPainter(self.viewport())
+        for col, row in self.viewport_cache.tiles_for_rect(exposed):
+            img = self.viewport_cache.get(
+                col, row, self.render_viewport_tile)
+            painter.drawImage(
+                self.viewport_cache.tile_rect(col, row).topLeft() + offset,
+                img)
+        painter.end()
+
     def get_scale(self):
         return self.transform().m11()
 
@@ -588,12 +1054,26 @@ class BeeGraphicsView(MainControlsMixin,
             logger.debug('No items in scene; ignore pan')
             return
 
+        self.begin_fast_rendering()
         hscroll = self.horizontalScrollBar()
         hscroll.setValue(round(hscroll.value() + delta.x()))
         vscroll = self.verticalScrollBar()
         vscroll.setValue(round(vscroll.value() + delta.y()))
 
+    @staticmethod
+    def zoom_factor(delta):
+        """The scale factor for a zoom by ``delta``, e.g. a wheel
+        event's angle delta."""
+
+        factor = 1 + abs(delta / 1000)
+        return factor if delta > 0 else 1 / factor
+
     def zoom(self, delta, anchor):
+        if delta == 0:
+            return
+        self.zoom_by_factor(self.zoom_factor(delta), anchor)
+
+    def zoom_by_factor(self, factor, anchor):
         if not self.scene.items():
             logger.debug('No items in scene; ignore zoom')
             return
@@ -606,10 +1086,10 @@ class BeeGraphicsView(MainControlsMixin,
         anchor = QtCore.QPoint(round(anchor.x()),
                                round(anchor.y()))
         ref_point = self.mapToScene(anchor)
-        if delta == 0:
+        if factor == 1:
             return
-        factor = 1 + abs(delta / 1000)
-        if delta > 0:
+        self.begin_fast_rendering()
+        if factor > 1:
             if self.get_zoom_size(max) < 10000000:
                 self.scale(factor, factor)
             else:
@@ -617,7 +1097,7 @@ class BeeGraphicsView(MainControlsMixin,
                 return
         else:
             if self.get_zoom_size(min) > 50:
-                self.scale(1/factor, 1/factor)
+                self.scale(factor, factor)
             else:
                 logger.debug('Minimum zoom size reached')
                 return
@@ -625,8 +1105,38 @@ class BeeGraphicsView(MainControlsMixin,
         self.pan(self.mapFromScene(ref_point) - anchor)
         self.reset_previous_transform()
 
+    def queue_pan(self, delta):
+        """Pan with the next frame, together with other pending input."""
+
+        self.pending_pan += delta
+        if not self.input_timer.isActive():
+            self.input_timer.start()
+
+    def queue_zoom(self, delta, anchor):
+        """Zoom with the next frame, together with other pending input."""
+
+        if delta == 0:
+            return
+        self.pending_zoom_factor *= self.zoom_factor(delta)
+        self.pending_zoom_anchor = anchor
+        if not self.input_timer.isActive():
+            self.input_timer.start()
+
+    def flush_input(self):
+        """Apply all pending pan and zoom input at once."""
+
+        self.input_timer.stop()
+        if not self.pending_pan.isNull():
+            delta = self.pending_pan
+            self.pending_pan = QtCore.QPointF(0, 0)
+            self.pan(delta)
+        if self.pending_zoom_factor != 1:
+            factor = self.pending_zoom_factor
+            self.pending_zoom_factor = 1
+            self.zoom_by_factor(factor, self.pending_zoom_anchor)
+
     def wheelEvent(self, event):
-        self.zoom(event.angleDelta().y(), event.position())
+        self.queue_zoom(event.angleDelta().y(), event.position())
         event.accept()
 
     def mousePressEvent(self, event):
@@ -661,7 +1171,7 @@ class BeeGraphicsView(MainControlsMixin,
         if self.pan_active:
             self.reset_previous_transform()
             pos = event.position()
-            self.pan(self.event_start - pos)
+            self.queue_pan(self.event_start - pos)
             self.event_start = pos
             event.accept()
             return
@@ -671,7 +1181,7 @@ class BeeGraphicsView(MainControlsMixin,
             pos = event.position()
             delta = (self.event_start - pos).y()
             self.event_start = pos
-            self.zoom(delta * 20, self.event_anchor)
+            self.queue_zoom(delta * 20, self.event_anchor)
             event.accept()
             return
 
@@ -685,14 +1195,18 @@ class BeeGraphicsView(MainControlsMixin,
             return
 
         super().mouseMoveEvent(event)
+        if self.scene.interaction_active():
+            self.begin_fast_rendering()
 
     def mouseReleaseEvent(self, event):
         if self.pan_active:
+            self.flush_input()
             self.setCursor(Qt.CursorShape.ArrowCursor)
             self.pan_active = False
             event.accept()
             return
         if self.zoom_active:
+            self.flush_input()
             self.zoom_active = False
             event.accept()
             return
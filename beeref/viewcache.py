@@ -0,0 +1,134 @@
+# This file is part of BeeRef.
+#
+# BeeRef is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# BeeRef is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with BeeRef.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Caches the rendered scene as screen-aligned tiles, so that repainting
+parts of the viewport that haven't changed only needs blitting.
+
+Tiles are laid out in device coordinates of the view's transform
+without its translation, so they stay valid while panning. They are
+dropped when the zoom level changes, and invalidated by the regions the
+scene reports as changed. Tiles rendered with different render hints
+are kept apart, so that switching between fast and smooth rendering
+while interacting doesn't throw away the other set.
+"""
+
+from collections import OrderedDict
+import logging
+import math
+
+from PyQt6 import QtCore
+
+from beeref.config import BeeSettings
+
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+
+# Default in MB, can be changed in the settings file
+VIEWPORT_CACHE_MB = 64
+
+
+class ViewportTileCache:
+    """Rendered tiles of the viewport, least recently used first."""
+
+    def __init__(self, budget=None, tile_size=TILE_SIZE):
+        if budget is None:
+            budget = BeeSettings().value(
+                'Memory/viewport_cache_mb',
+                VIEWPORT_CACHE_MB,
+                type=int) * 2**20
+        self.budget = budget
+        self.tile_size = tile_size
+        self.tiles = OrderedDict()
+        self.size = 0
+        self.key = None
+        self.hints = 0
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def clear(self):
+        self.tiles.clear()
+        self.size = 0
+
+    def set_key(self, transform, dpr, hints):
+        """Drop all tiles if the transform (without translation) or
+        device pixel ratio differ from the last call. The render hints
+        select which set of tiles ``get`` uses."""
+
+        key = (transform.m11(), transform.m12(),
+               transform.m21(), transform.m22(),
+               dpr)
+        if key != self.key:
+            if self.tiles:
+                logger.debug('View changed; clearing viewport cache')
+            self.clear()
+            self.key = key
+        self.hints = int(hints.value)
+
+    def tile_rect(self, col, row):
+        return QtCore.QRectF(col * self.tile_size, row * self.tile_size,
+                             self.tile_size, self.tile_size)
+
+    def tiles_for_rect(self, rect):
+        """Yields ``(col, row)`` of all tiles intersecting ``rect``,
+        given in device coordinates."""
+
+        if rect.isEmpty():
+            return
+        left = math.floor(rect.left() / self.tile_size)
+        top = math.floor(rect.top() / self.tile_size)
+        right = math.ceil(rect.right() / self.tile_size)
+        bottom = math.ceil(rect.bottom() / self.tile_size)
+        for row in range(top, bottom):
+            for col in range(left, right):
+                yield (col, row)
+
+    def invalidate(self, rect):
+        """Drop all tiles intersecting ``rect``, given in device
+        coordinates."""
+
+        if rect.isEmpty() or not self.tiles:
+            return
+        # Changed regions can be much larger than the cached area, so
+        # check the cached tiles instead of all tiles in the region
+        left = math.floor(rect.left() / self.tile_size)
+        top = math.floor(rect.top() / self.tile_size)
+        right = math.ceil(rect.right() / self.tile_size)
+        bottom = math.ceil(rect.bottom() / self.tile_size)
+        stale = [key for key in self.tiles
+                 if left <= key[1] < right and top <= key[2] < bottom]
+        for key in stale:
+            self.size -= self.tiles.pop(key).sizeInBytes()
+
+    def get(self, col, row, render):
+        """Returns the tile, calling ``render(col, row)`` to create it if
+        it isn't cached."""
+
+        key = (self.hints, col, row)
+        img = self.tiles.get(key)
+        if img is not None:
+            self.tiles.move_to_end(key)
+            return img
+
+        logger.trace(f'Rendering viewport tile {key}')
+        img = render(col, row)
+        self.tiles[key] = img
+        self.size += img.sizeInBytes()
+        while self.size > self.budget and len(self.tiles) > 1:
+            _, old = self.tiles.popitem(last=False)
+            self.size -= old.sizeInBytes()
+        return img
@@ -0,0 +1,107 @@
+import os.path
+import tarfile
+from unittest.mock import patch
+import zipfile
+
+import pytest
+
+from PyQt6 import QtCore
+
+from beeref.fileio.archive import (
+    is_archive,
+    is_image_entry,
+    iter_archive_images,
+    local_path,
+    readable_image_formats,
+)
+
+
+@pytest.fixture
+def zipfilename(tmpdir, imgfilename3x3):
+    filename = os.path.join(tmpdir, 'images.zip')
+    with zipfile.ZipFile(filename, 'w') as archive:
+        archive.write(imgfilename3x3, 'foo/bar.png')
+        archive.writestr('foo/readme.txt', 'hello')
+        archive.writestr('__MACOSX/foo/._bar.png', 'junk')
+    yield filename
+
+
+@pytest.fixture
+def tarfilename(tmpdir, imgfilename3x3):
+    filename = os.path.join(tmpdir, 'images.tar.gz')
+    with tarfile.open(filename, 'w:gz') as archive:
+        archive.add(imgfilename3x3, 'foo/bar.png')
+        archive.add(imgfilename3x3, 'baz.png')
+    yield filename
+
+
+def test_local_path_str():
+    assert local_path('foo/../bar.zip') == 'bar.zip'
+
+
+def test_local_path_local_url():
+    url = QtCore.QUrl.fromLocalFile('/foo/bar.zip')
+    assert local_path(url) == os.path.normpath('/foo/bar.zip')
+
+
+def test_local_path_remote_url():
+    assert local_path(QtCore.QUrl('http://example.com/bar.zip')) is None
+
+
+@pytest.mark.parametrize('path,expected',
+                         [('foo.zip', True),
+                          ('foo.ZIP', True),
+                          ('foo.tar', True),
+                          ('foo.tar.gz', True),
+                          ('foo.tgz', True),
+                          ('foo.png', False),
+                          ('foo.bee', False)])
+def test_is_archive(path, expected):
+    assert is_archive(path) is expected
+
+
+def test_is_archive_remote_url():
+    assert is_archive(QtCore.QUrl('http://example.com/bar.zip')) is False
+
+
+@pytest.mark.parametrize('name,expected',
+                         [('foo/bar.png', True),
+                          ('bar.JPG', True),
+                          ('foo/bar.txt', False),
+                          ('foo/', False),
+                          ('foo/.bar.png', False),
+                          ('__MACOSX/foo/bar.png', False)])
+def test_is_image_entry(name, expected, qapp):
+    assert is_image_entry(name) is expected
+
+
+def test_readable_image_formats_looked_up_once(qapp):
+    readable_image_formats.cache_clear()
+    with patch('PyQt6.QtGui.QImageReader.supportedImageFormats',
+               return_value=[QtCore.QByteArray(b'PNG')]) as formats_mock:
+        assert is_image_entry('foo.png') is True
+        assert is_image_entry('foo.jpg') is False
+        formats_mock.assert_called_once_with()
+    readable_image_formats.cache_clear()
+
+
+def test_iter_archive_images_zip(zipfilename, imgdata3x3, qapp):
+    entries = list(iter_archive_images(zipfilename))
+    assert len(entries) == 1
+    name, data, position = entries[0]
+    assert name == 'foo/bar.png'
+    assert data == imgdata3x3
+    assert position > 0
+
+
+def test_iter_archive_images_tar(tarfilename, imgdata3x3, qapp):
+    entries = list(iter_archive_images(tarfilename))
+    assert [e[0] for e in entries] == ['foo/bar.png', 'baz.png']
+    assert entries[0][1] == imgdata3x3
+    assert entries[1][1] == imgdata3x3
+    assert 0 < entries[0][2] <= entries[1][2]
+
+
+def test_iter_archive_images_not_an_archive(imgfilename3x3, qapp):
+    with pytest.raises(tarfile.TarError):
+        list(iter_archive_images(imgfilename3x3))
@@ -9,7 +9,15 @@ import plum
 
 from PyQt6 import QtCore, QtGui
 
-from beeref.fileio.image import exif_rotated_image, load_image
+from beeref.fileio.image import (
+    encoded_image_from_mimedata,
+    exif_rotated_image,
+    image_format_from_bytes,
+    image_size_from_bytes,
+    image_with_source,
+    load_image,
+)
+from beeref import utils
 
 
 def test_exif_rotated_image_without_path(qapp):
@@ -59,21 +67,55 @@ def test_exif_rotated_image(path, expected, qapp):
             assert math.sqrt(sum(diff)) < 3
 
 
+def assets_path(name):
+    return os.path.join(os.path.dirname(__file__), '..', 'assets', name)
+
+
+def test_image_with_source_keeps_original_data(qapp):
+    path = assets_path('test3x3_orientation1.jpg')
+    img, data = image_with_source(path)
+    assert img.isNull() is False
+    with open(path, 'rb') as f:
+        assert data == f.read()
+
+
+def test_image_with_source_encodes_rotated_image(qapp):
+    path = assets_path('test3x3_orientation6.jpg')
+    img, data = image_with_source(path)
+    assert data.startswith(b'\x89PNG')
+    assert QtGui.QImage.fromData(data).size() == img.size()
+
+
+def test_image_with_source_from_data(qapp, imgdata3x3):
+    img, data = image_with_source(data=imgdata3x3)
+    assert img.isNull() is False
+    assert data == imgdata3x3
+
+
+def test_image_with_source_when_not_a_file(qapp):
+    img, data = image_with_source('foo')
+    assert img.isNull() is True
+    assert data is None
+
+
 def test_load_image_loads_from_filename(view, imgfilename3x3):
-    img, filename = load_image(imgfilename3x3)
+    img, filename, data = load_image(imgfilename3x3)
     assert img.isNull() is False
     assert filename == imgfilename3x3
+    with open(imgfilename3x3, 'rb') as f:
+        assert data == f.read()
 
 
 def test_load_image_loads_from_nonexisting_filename(view, imgfilename3x3):
-    img, filename = load_image('foo.png')
+    img, filename, data = load_image('foo.png')
     assert img.isNull() is True
     assert filename == 'foo.png'
+    assert data is None
 
 
 def test_load_image_loads_from_existing_local_url(view, imgfilename3x3):
     url = QtCore.QUrl.fromLocalFile(imgfilename3x3)
-    img, filename = load_image(url)
+    img, filename, data = load_image(url)
     assert img.isNull() is False
     assert filename == imgfilename3x3
 
@@ -86,9 +128,10 @@ def test_load_image_loads_from_existing_web_url(view, imgdata3x3):
         url,
         body=imgdata3x3,
     )
-    img, filename = load_image(QtCore.QUrl(url))
+    img, filename, data = load_image(QtCore.QUrl(url))
     assert img.isNull() is False
     assert filename == url
+    assert data == imgdata3x3
 
 
 @httpretty.activate
@@ -99,6 +142,40 @@ def test_load_image_loads_from_web_url_errors(view, imgfilename3x3):
         url,
         status=500,
     )
-    img, filename = load_image(QtCore.QUrl(url))
+    img, filename, data = load_image(QtCore.QUrl(url))
     assert img.isNull() is True
+    assert data is None
     assert filename == url
+
+
+def test_encoded_image_from_mimedata(qapp, imgdata3x3):
+    mimedata = QtCore.QMimeData()
+    mimedata.setData('text/plain', b'foo')
+    mimedata.setData('image/png', imgdata3x3)
+    assert encoded_image_from_mimedata(mimedata) == imgdata3x3
+
+
+def test_encoded_image_from_mimedata_when_no_encoded_data(
+        qapp, imgfilename3x3):
+    mimedata = QtCore.QMimeData()
+    mimedata.setImageData(QtGui.QImage(imgfilename3x3))
+    assert encoded_image_from_mimedata(mimedata) is None
+
+
+def test_image_size_from_bytes(qapp, imgdata3x3):
+    assert image_size_from_bytes(imgdata3x3) == QtCore.QSize(3, 3)
+
+
+def test_image_size_from_bytes_when_invalid(qapp):
+    assert image_size_from_bytes(b'foo').isValid() is False
+
+
+def test_image_format_from_bytes(qapp):
+    img = QtGui.QImage(3, 3, QtGui.QImage.Format.Format_RGB32)
+    assert image_format_from_bytes(utils.image_to_bytes(img)) == 'png'
+    assert image_format_from_bytes(utils.image_to_bytes(img, 'JPG')) == (
+        'jpeg')
+
+
+def test_image_format_from_bytes_when_invalid(qapp):
+    assert image_format_from_bytes(b'foo') is None
@@ -1,11 +1,14 @@
 import os.path
+import queue
 import tempfile
+import zipfile
 from unittest.mock import MagicMock, patch
 
-from PyQt6 import QtCore
+from PyQt6 import QtCore, QtGui
 
 from beeref import fileio
 from beeref import commands
+from beeref.items import BeePixmapItem, BeeTiledPixmapItem
 from ..utils import queue2list
 
 
@@ -43,6 +46,8 @@ def test_load_images_loads(view, imgfilename3x3):
     assert cmd.scene == view.scene
     assert cmd.ignore_first_redo is True
     assert item.pos() == QtCore.QPointF(3.5, 4.5)
+    with open(imgfilename3x3, 'rb') as f:
+        assert item.source_bytes == f.read()
 
 
 def test_load_images_canceled(view, imgfilename3x3):
@@ -84,3 +89,192 @@ def test_load_images_error(view, imgfilename3x3):
     assert cmd.scene == view.scene
     assert cmd.ignore_first_redo is True
     assert item.pos() == QtCore.QPointF(3.5, 4.5)
+
+
+def test_load_image_data_from_image(qapp, imgfilename3x3):
+    item = BeePixmapItem.create_placeholder(QtCore.QSize(3, 3))
+    worker = MagicMock()
+    fileio.load_image_data(QtGui.QImage(imgfilename3x3), item, worker)
+    worker.finished.emit.assert_called_once_with('', [])
+    img, source_bytes = item.pending_image
+    assert img.size() == QtCore.QSize(3, 3)
+    assert source_bytes.startswith(b'\x89PNG')
+
+
+def test_load_image_data_from_png_bytes_keeps_bytes(qapp, imgdata3x3):
+    item = BeePixmapItem.create_placeholder(QtCore.QSize(3, 3))
+    worker = MagicMock()
+    fileio.load_image_data(imgdata3x3, item, worker)
+    worker.finished.emit.assert_called_once_with('', [])
+    img, source_bytes = item.pending_image
+    assert img.size() == QtCore.QSize(3, 3)
+    assert source_bytes == imgdata3x3
+
+
+def test_load_image_data_error(qapp):
+    item = BeePixmapItem.create_placeholder(QtCore.QSize(3, 3))
+    worker = MagicMock()
+    fileio.load_image_data(b'foo', item, worker)
+    worker.finished.emit.assert_called_once_with('', ['Image data'])
+    assert item.pending_image is None
+
+
+def test_load_images_loads_from_archive(view, imgfilename3x3, tmpdir):
+    archive = os.path.join(tmpdir, 'images.zip')
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.write(imgfilename3x3, 'a.png')
+        zf.write(imgfilename3x3, 'b.png')
+    view.scene.undo_stack = MagicMock()
+    worker = MagicMock(canceled=False)
+    fileio.load_images([archive, imgfilename3x3],
+                       QtCore.QPointF(5, 6), view.scene, worker)
+    worker.begin_processing.emit.assert_called_once_with(2)
+    worker.finished.emit.assert_called_once_with('', [])
+    itemdata = queue2list(view.scene.items_to_add)
+    assert len(itemdata) == 3
+    assert itemdata[0][0]['item'].filename == os.path.join(archive, 'a.png')
+    assert itemdata[1][0]['item'].filename == os.path.join(archive, 'b.png')
+    with open(imgfilename3x3, 'rb') as f:
+        assert itemdata[0][0]['item'].source_bytes == f.read()
+    cmd = view.scene.undo_stack.push.call_args_list[0][0][0]
+    assert len(cmd.items) == 3
+
+
+def test_load_images_from_archives(view, imgfilename3x3, tmpdir):
+    archive = os.path.join(tmpdir, 'images.zip')
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.write(imgfilename3x3, 'a.png')
+        zf.writestr('b.png', b'not an image')
+    view.scene.undo_stack = MagicMock()
+    worker = MagicMock(canceled=False)
+    fileio.load_images_from_archives(
+        [QtCore.QUrl.fromLocalFile(archive)],
+        QtCore.QPointF(5, 6), view.scene, worker)
+    worker.begin_processing.emit.assert_called_once_with(
+        os.path.getsize(archive) // 1024)
+    assert worker.progress.emit.call_count == 2
+    worker.finished.emit.assert_called_once_with(
+        '', [os.path.join(archive, 'b.png')])
+    itemdata = queue2list(view.scene.items_to_add)
+    assert len(itemdata) == 1
+    item = itemdata[0][0]['item']
+    assert item.filename == os.path.join(archive, 'a.png')
+    assert item.pos() == QtCore.QPointF(3.5, 4.5)
+    cmd = view.scene.undo_stack.push.call_args_list[0][0][0]
+    assert isinstance(cmd, commands.InsertItems)
+    assert cmd.items == [item]
+    assert cmd.ignore_first_redo is True
+
+
+def test_load_images_from_archives_canceled(view, imgfilename3x3, tmpdir):
+    archive = os.path.join(tmpdir, 'images.zip')
+    with zipfile.ZipFile(archive, 'w') as zf:
+        zf.write(imgfilename3x3, 'a.png')
+        zf.write(imgfilename3x3, 'b.png')
+    view.scene.undo_stack = MagicMock()
+    worker = MagicMock(canceled=True)
+    fileio.load_images_from_archives(
+        [archive, archive], QtCore.QPointF(5, 6), view.scene, worker)
+    worker.finished.emit.assert_called_once_with('', [])
+    assert len(queue2list(view.scene.items_to_add)) == 1
+
+
+def test_load_images_from_archives_when_broken(view, tmpdir):
+    archive = os.path.join(tmpdir, 'images.zip')
+    with open(archive, 'w') as f:
+        f.write('foo')
+    view.scene.undo_stack = MagicMock()
+    worker = MagicMock(canceled=False)
+    fileio.load_images_from_archives(
+        [archive], QtCore.QPointF(5, 6), view.scene, worker)
+    worker.finished.emit.assert_called_once_with('', [archive])
+    assert queue2list(view.scene.items_to_add) == []
+
+
+def test_load_images_into_queue(qapp, imgfilename3x3):
+    q = queue.Queue()
+    worker = MagicMock(canceled=False)
+    fileio.load_images_into_queue(['foo.png', imgfilename3x3], q, worker)
+    worker.begin_processing.emit.assert_called_once_with(2)
+    worker.finished.emit.assert_called_once_with('', ['foo.png'])
+    result = queue2list(q)
+    assert len(result) == 1
+    assert result[0][0] == imgfilename3x3
+    assert result[0][1].size() == QtCore.QSize(3, 3)
+    with open(imgfilename3x3, 'rb') as f:
+        assert result[0][2] == f.read()
+
+
+def test_resample_images(qapp, imgfilename3x3):
+    jobs = [{'image': QtGui.QImage(imgfilename3x3),
+             'size': QtCore.QSize(2, 1)},
+            {'image': QtGui.QImage(imgfilename3x3),
+             'size': QtCore.QSize(1, 1)}]
+    worker = MagicMock(canceled=False)
+    fileio.resample_images(jobs, worker)
+    worker.begin_processing.emit.assert_called_once_with(2)
+    assert worker.progress.emit.call_count == 2
+    worker.finished.emit.assert_called_once_with('', [])
+    assert jobs[0]['result'].size() == QtCore.QSize(2, 1)
+    assert jobs[1]['result'].size() == QtCore.QSize(1, 1)
+    result = QtGui.QImage.fromData(jobs[0]['result_data'])
+    assert result.size() == QtCore.QSize(2, 1)
+    old = QtGui.QImage.fromData(jobs[0]['old_data'])
+    assert old.size() == QtCore.QSize(3, 3)
+
+
+def test_resample_images_keeps_source_bytes(qapp, imgfilename3x3):
+    jobs = [{'image': QtGui.QImage(imgfilename3x3),
+             'source_bytes': b'foo',
+             'size': QtCore.QSize(2, 1)}]
+    worker = MagicMock(canceled=False)
+    fileio.resample_images(jobs, worker)
+    assert jobs[0]['old_data'] == b'foo'
+
+
+def test_resample_images_canceled(qapp, imgfilename3x3):
+    jobs = [{'image': QtGui.QImage(imgfilename3x3),
+             'size': QtCore.QSize(2, 1)}]
+    worker = MagicMock(canceled=True)
+    fileio.resample_images(jobs, worker)
+    worker.finished.emit.assert_called_once_with('', [])
+
+
+def test_crop_images(qapp, imgfilename3x3):
+    jobs = [{'image': QtGui.QImage(imgfilename3x3),
+             'rect': QtCore.QRect(1, 1, 2, 1)},
+            {'image': QtGui.QImage(imgfilename3x3),
+             'source_bytes': b'foo',
+             'rect': QtCore.QRect(0, 0, 1, 1)}]
+    worker = MagicMock(canceled=False)
+    fileio.crop_images(jobs, worker)
+    worker.begin_processing.emit.assert_called_once_with(2)
+    assert worker.progress.emit.call_count == 2
+    worker.finished.emit.assert_called_once_with('', [])
+    assert jobs[0]['result'].size() == QtCore.QSize(2, 1)
+    assert jobs[0]['result'].pixelColor(0, 0) == \
+        jobs[0]['image'].pixelColor(1, 1)
+    result = QtGui.QImage.fromData(jobs[0]['result_data'])
+    assert result.size() == QtCore.QSize(2, 1)
+    old = QtGui.QImage.fromData(jobs[0]['old_data'])
+    assert old.size() == QtCore.QSize(3, 3)
+    assert jobs[1]['old_data'] == b'foo'
+
+
+def test_load_images_loads_large_image_as_tiles(
+        view, imgfilename3x3, settings):
+    settings.setValue('Items/tiled_threshold_mp', 0)
+    view.scene.undo_stack = MagicMock()
+    worker = MagicMock(canceled=False)
+    fileio.load_images([imgfilename3x3],
+                       QtCore.QPointF(5, 6), view.scene, worker)
+    worker.finished.emit.assert_called_once_with('', [])
+    itemdata = queue2list(view.scene.items_to_add)
+    assert len(itemdata) == 1
+    assert itemdata[0][0]['type'] == 'tiledpixmap'
+    item = itemdata[0][0]['item']
+    assert isinstance(item, BeeTiledPixmapItem)
+    assert item.filename == imgfilename3x3
+    assert item.pos() == QtCore.QPointF(3.5, 4.5)
+    cmd = view.scene.undo_stack.push.call_args_list[0][0][0]
+    assert cmd.items == [item]
@@ -10,7 +10,9 @@ import pytest
 from beeref.fileio import schema, is_bee_file
 from beeref.fileio.errors import BeeFileIOError
 from beeref.fileio.sql import SQLiteIO
-from beeref.items import BeePixmapItem, BeeTextItem
+from beeref.items import BeePixmapItem, BeeTextItem, BeeTiledPixmapItem
+from beeref.tiles import TileStore
+from beeref import utils
 
 
 @pytest.mark.parametrize('filename,expected',
@@ -148,7 +150,7 @@ def test_sqliteio_create_schema_on_new_when_create_new(tmpfile):
     result = io.fetchone(
         'SELECT COUNT(*) FROM sqlite_master '
         'WHERE type="table" AND name NOT LIKE "sqlite_%"')
-    assert result[0] == 2
+    assert result[0] == 3
     scene_mock.clear_save_ids.assert_called_once()
 
 
@@ -273,6 +275,21 @@ def test_sqliteio_write_inserts_new_pixmap_item_without_filename(
     assert result[1] == '0001.png'
 
 
+def test_sqliteio_write_inserts_pixmap_item_in_original_format(
+        tmpfile, view):
+    img = QtGui.QImage(3, 3, QtGui.QImage.Format.Format_RGB32)
+    data = utils.image_to_bytes(img, 'JPG')
+    item = BeePixmapItem(img, filename='bee.jpg')
+    item.source_bytes = data
+    view.scene.addItem(item)
+    io = SQLiteIO(tmpfile, view.scene, create_new=True)
+    io.write()
+
+    result = io.fetchone('SELECT sqlar.name, sqlar.data FROM sqlar')
+    assert result[0] == '0001-bee.jpeg'
+    assert result[1] == data
+
+
 def test_sqliteio_write_updates_existing_text_item(tmpfile, view):
     item = BeeTextItem(text='foo bar')
     view.scene.addItem(item)
@@ -348,6 +365,23 @@ def test_sqliteio_write_updates_existing_pixmap_item(tmpfile, view):
     assert result[7] == b'abc'
 
 
+def test_sqliteio_write_updates_changed_pixmap_data(tmpfile, view):
+    item = BeePixmapItem(QtGui.QImage(), filename='bee.png')
+    view.scene.addItem(item)
+    item.pixmap_to_bytes = MagicMock(return_value=b'abc')
+    io = SQLiteIO(tmpfile, view.scene, create_new=True)
+    io.write()
+    assert item.image_changed is False
+    item.image_changed = True
+    item.pixmap_to_bytes.return_value = b'updated'
+    io.create_new = False
+    io.write()
+
+    assert item.image_changed is False
+    result = io.fetchone('SELECT sz, data FROM sqlar')
+    assert result == (7, b'updated')
+
+
 def test_sqliteio_write_removes_nonexisting_text_item(tmpfile, view):
     item = BeeTextItem('foo bar')
     item.setScale(1.3)
@@ -380,6 +414,26 @@ def test_sqliteio_write_removes_nonexisting_pixmap_item(tmpfile, view):
     assert io.fetchone('SELECT COUNT(*) from sqlar') == (0,)
 
 
+def test_sqliteio_write_updates_many_items_and_deletes_others(
+        tmpfile, view):
+    items = []
+    for i in range(3):
+        item = BeeTextItem(text=f'item {i}')
+        view.scene.addItem(item)
+        items.append(item)
+    io = SQLiteIO(tmpfile, view.scene, create_new=True)
+    io.write()
+    view.scene.removeItem(items[1])
+    items[0].setPos(5, 6)
+    items[2].setScale(3)
+    io.create_new = False
+    io.write()
+
+    result = io.fetchall('SELECT id, x, y, scale FROM items ORDER BY id')
+    assert result == [(items[0].save_id, 5, 6, 1),
+                      (items[2].save_id, 0, 0, 3)]
+
+
 def test_sqliteio_write_update_recovers_from_borked_file(view, tmpfile):
     item = BeePixmapItem(QtGui.QImage(), filename='bee.png')
     view.scene.addItem(item)
@@ -477,6 +531,74 @@ def test_sqliteio_read_reads_readonly_pixmap_item(tmpfile, view, imgdata3x3):
     assert view.scene.items_to_add.empty() is True
 
 
+def test_sqliteio_write_and_read_tiled_pixmap_item(tmpfile, view):
+    store = TileStore(QtCore.QSize(20, 10), 16)
+    store.put(0, 0, 0, b'tile1')
+    store.put(0, 1, 0, b'tile2')
+    store.put(1, 0, 0, b'tile3')
+    item = BeeTiledPixmapItem(store, filename='big.png')
+    item.setPos(44, 55)
+    view.scene.addItem(item)
+    io = SQLiteIO(tmpfile, view.scene, create_new=True)
+    io.write()
+    assert io.fetchone('SELECT COUNT(*) from tiles') == (3,)
+    assert io.fetchone('SELECT COUNT(*) from sqlar') == (0,)
+    view.scene.removeItem(item)
+    del io
+
+    io = SQLiteIO(tmpfile, view.scene, readonly=True)
+    io.read()
+    view.scene.add_queued_items()
+    item = view.scene.items()[0]
+    assert isinstance(item, BeeTiledPixmapItem)
+    assert item.filename == 'big.png'
+    assert item.pos() == QtCore.QPointF(44, 55)
+    assert item.tile_store.size == QtCore.QSize(20, 10)
+    assert item.tile_store.tile_size == 16
+    assert list(item.tile_store) == [
+        (0, 0, 0, b'tile1'), (0, 1, 0, b'tile2'), (1, 0, 0, b'tile3')]
+
+
+def test_sqliteio_write_removes_nonexisting_tiled_pixmap_item(
+        tmpfile, view):
+    store = TileStore(QtCore.QSize(20, 10), 16)
+    store.put(0, 0, 0, b'tile1')
+    item = BeeTiledPixmapItem(store, filename='big.png')
+    view.scene.addItem(item)
+    io = SQLiteIO(tmpfile, view.scene, create_new=True)
+    io.write()
+    view.scene.removeItem(item)
+    io.create_new = False
+    io.write()
+    assert io.fetchone('SELECT COUNT(*) from tiles') == (0,)
+
+
+def test_sqliteio_write_removes_tiles_with_new_connection(tmpfile, view):
+    store = TileStore(QtCore.QSize(20, 10), 16)
+    store.put(0, 0, 0, b'tile1')
+    item = BeeTiledPixmapItem(store, filename='big.png')
+    view.scene.addItem(item)
+    io = SQLiteIO(tmpfile, view.scene, create_new=True)
+    io.write()
+    io._close_connection()
+    view.scene.removeItem(item)
+    io = SQLiteIO(tmpfile, view.scene, create_new=False)
+    io.write()
+    assert io.fetchone('SELECT COUNT(*) from tiles') == (0,)
+
+
+def test_sqliteio_migrate_adds_tiles_table(tmpfile):
+    io = SQLiteIO(tmpfile, MagicMock(), create_new=True)
+    io.create_schema_on_new()
+    io.ex('DROP TABLE tiles')
+    io.ex('PRAGMA user_version=2')
+    io.connection.commit()
+    del io
+    io = SQLiteIO(tmpfile, MagicMock())
+    assert io.fetchone('SELECT COUNT(*) FROM tiles') == (0,)
+    assert io.fetchone('PRAGMA user_version') == (3,)
+
+
 def test_sqliteio_read_updates_progress(tmpfile, view):
     worker = MagicMock(canceled=False)
     io = SQLiteIO(tmpfile, view.scene, create_new=True,
@@ -0,0 +1,110 @@
+import os.path
+import shutil
+from unittest.mock import MagicMock
+
+from beeref.fileio.watcher import FolderWatcher
+
+
+def test_folder_watcher_reports_existing_unknown_files(
+        qtbot, tmpdir, imgfilename3x3):
+    shutil.copy(imgfilename3x3, os.path.join(tmpdir, 'a.png'))
+    shutil.copy(imgfilename3x3, os.path.join(tmpdir, 'b.png'))
+    with open(os.path.join(tmpdir, 'c.txt'), 'w') as f:
+        f.write('foo')
+    watcher = FolderWatcher(tmpdir, known=[os.path.join(tmpdir, 'a.png')],
+                            debounce_msec=10)
+    with qtbot.waitSignal(watcher.files_ready) as blocker:
+        pass
+    assert blocker.args == [[os.path.join(tmpdir, 'b.png')]]
+    assert set(watcher.known.keys()) == {
+        os.path.join(tmpdir, 'a.png'), os.path.join(tmpdir, 'b.png')}
+    assert watcher.pending == {}
+    watcher.stop()
+
+
+def test_folder_watcher_reports_new_file(qtbot, tmpdir, imgfilename3x3):
+    watcher = FolderWatcher(tmpdir, debounce_msec=10)
+    shutil.copy(imgfilename3x3, os.path.join(tmpdir, 'a.png'))
+    with qtbot.waitSignal(watcher.files_ready) as blocker:
+        watcher.on_directory_changed(str(tmpdir))
+    assert blocker.args == [[os.path.join(tmpdir, 'a.png')]]
+    watcher.stop()
+
+
+def test_folder_watcher_ignores_unchanged_files(
+        qtbot, tmpdir, imgfilename3x3):
+    filename = os.path.join(tmpdir, 'a.png')
+    shutil.copy(imgfilename3x3, filename)
+    watcher = FolderWatcher(tmpdir, known=[filename], debounce_msec=10)
+    callback = MagicMock()
+    watcher.files_ready.connect(callback)
+    watcher.on_directory_changed(str(tmpdir))
+    assert watcher.pending == {}
+    watcher.on_file_changed(filename)
+    qtbot.waitUntil(lambda: watcher.pending == {})
+    callback.assert_not_called()
+    watcher.stop()
+
+
+def test_folder_watcher_reports_changed_file(qtbot, tmpdir, imgfilename3x3):
+    filename = os.path.join(tmpdir, 'a.png')
+    shutil.copy(imgfilename3x3, filename)
+    watcher = FolderWatcher(tmpdir, known=[filename], debounce_msec=10)
+    with open(filename, 'ab') as f:
+        f.write(b'more')
+    with qtbot.waitSignal(watcher.files_ready) as blocker:
+        watcher.on_file_changed(filename)
+    assert blocker.args == [[filename]]
+    watcher.stop()
+
+
+def test_folder_watcher_waits_while_file_is_written(
+        qtbot, tmpdir, imgfilename3x3):
+    filename = os.path.join(tmpdir, 'a.png')
+    with open(filename, 'wb') as f:
+        f.write(b'x')
+    watcher = FolderWatcher(tmpdir, debounce_msec=10000)
+    watcher.check_pending()
+    with open(filename, 'ab') as f:
+        f.write(b'more')
+    callback = MagicMock()
+    watcher.files_ready.connect(callback)
+    watcher.check_pending()
+    callback.assert_not_called()
+    assert filename in watcher.pending
+    watcher.check_pending()
+    callback.assert_called_once_with([filename])
+    watcher.stop()
+
+
+def test_folder_watcher_doesnt_restart_running_timer(
+        qtbot, tmpdir, imgfilename3x3):
+    watcher = FolderWatcher(tmpdir, debounce_msec=10000)
+    shutil.copy(imgfilename3x3, os.path.join(tmpdir, 'a.png'))
+    watcher.on_directory_changed(str(tmpdir))
+    assert watcher.timer.isActive()
+    remaining = watcher.timer.remainingTime()
+    qtbot.wait(50)
+    shutil.copy(imgfilename3x3, os.path.join(tmpdir, 'b.png'))
+    watcher.on_directory_changed(str(tmpdir))
+    watcher.on_file_changed(os.path.join(tmpdir, 'a.png'))
+    assert watcher.timer.remainingTime() < remaining
+    assert len(watcher.pending) == 2
+    watcher.stop()
+
+
+def test_folder_watcher_doesnt_start_timer_without_pending_files(tmpdir):
+    watcher = FolderWatcher(tmpdir, debounce_msec=10)
+    watcher.on_directory_changed(str(tmpdir))
+    assert watcher.timer.isActive() is False
+    watcher.stop()
+
+
+def test_folder_watcher_forgets_removed_file(qtbot, tmpdir, imgfilename3x3):
+    filename = os.path.join(tmpdir, 'a.png')
+    shutil.copy(imgfilename3x3, filename)
+    watcher = FolderWatcher(tmpdir, known=[filename], debounce_msec=10)
+    os.remove(filename)
+    watcher.on_file_changed(filename)
+    assert watcher.known == {}
+    watcher.stop()
@@ -5,6 +5,7 @@ from PyQt6 import QtCore, QtGui, QtWidgets
 from PyQt6.QtCore import Qt
 
 from beeref.items import BeePixmapItem, item_registry
+from beeref.pixelcache import SpillFile, get_pixel_cache
 
 
 def test_in_item_registry():
@@ -86,6 +87,56 @@ def test_pixmap_to_bytes(qapp, imgfilename3x3):
     assert item.pixmap_to_bytes().startswith(b'\x89PNG')
 
 
+def test_pixmap_to_bytes_when_source_bytes(qapp, imgfilename3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item.source_bytes = b'foo'
+    assert item.pixmap_to_bytes() == b'foo'
+
+
+def test_set_pixmap_clears_source_bytes(qapp, item, imgfilename3x3):
+    item.source_bytes = b'foo'
+    item.setPixmap(QtGui.QPixmap(imgfilename3x3))
+    assert item.source_bytes is None
+
+
+def test_create_placeholder(qapp):
+    item = BeePixmapItem.create_placeholder(QtCore.QSize(30, 40), 'foo.png')
+    assert item.is_placeholder is True
+    assert item.is_croppable is False
+    assert item.pixmap().isNull()
+    assert item.filename == 'foo.png'
+    assert item.crop == QtCore.QRectF(0, 0, 30, 40)
+    assert item.width == 30
+    assert item.height == 40
+
+
+def test_apply_pending_image(qapp, imgfilename3x3):
+    item = BeePixmapItem.create_placeholder(QtCore.QSize(3, 3))
+    item.pending_image = (QtGui.QImage(imgfilename3x3), b'foo')
+    item.apply_pending_image()
+    assert item.is_placeholder is False
+    assert item.is_croppable is True
+    assert item.pending_image is None
+    assert item.source_bytes == b'foo'
+    assert item.pixmap().size() == QtCore.QSize(3, 3)
+    assert item.crop == QtCore.QRectF(0, 0, 3, 3)
+
+
+def test_replace_image_same_size_keeps_crop(qapp, imgfilename3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item.crop = QtCore.QRectF(1, 1, 1, 1)
+    item.replace_image(QtGui.QImage(imgfilename3x3))
+    assert item.crop == QtCore.QRectF(1, 1, 1, 1)
+
+
+def test_replace_image_other_size_resets_crop(qapp, imgfilename3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item.crop = QtCore.QRectF(1, 1, 1, 1)
+    item.replace_image(QtGui.QImage(
+        10, 20, QtGui.QImage.Format.Format_RGB32))
+    assert item.crop == QtCore.QRectF(0, 0, 10, 20)
+
+
 def test_pixmap_from_bytes(qapp, item, imgfilename3x3):
     with open(imgfilename3x3, 'rb') as f:
         imgdata = f.read()
@@ -217,6 +268,65 @@ def test_reset_crop(qapp, imgfilename3x3):
     assert item.crop == QtCore.QRectF(0, 0, 3, 3)
 
 
+def test_bake_crop(qapp, imgfilename3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    expected = item.image().pixelColor(1, 2)
+    item.setPos(10, 20)
+    item.setRotation(90)
+    item.setScale(2)
+    item.crop = QtCore.QRectF(1, 1, 2, 2)
+    topleft = item.mapToScene(QtCore.QPointF(1, 1))
+    item.bake_crop()
+    assert item.image().size() == QtCore.QSize(2, 2)
+    assert item.image().pixelColor(0, 1) == expected
+    assert item.crop == QtCore.QRectF(0, 0, 2, 2)
+    assert item.mapToScene(QtCore.QPointF(0, 0)) == topleft
+    assert item.image_changed is True
+
+
+def test_bake_crop_then_reset_crop(qapp, imgfilename3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item.crop = QtCore.QRectF(1, 1, 2, 2)
+    item.bake_crop()
+    item.reset_crop()
+    assert item.crop == QtCore.QRectF(0, 0, 2, 2)
+
+
+def test_useful_size(qapp):
+    item = BeePixmapItem(QtGui.QImage(
+        100, 50, QtGui.QImage.Format.Format_RGB32))
+    item.setScale(0.2)
+    assert item.useful_size(2) == QtCore.QSize(40, 20)
+
+
+def test_useful_size_when_not_reducible(qapp):
+    item = BeePixmapItem(QtGui.QImage(
+        100, 50, QtGui.QImage.Format.Format_RGB32))
+    item.setScale(0.5)
+    assert item.useful_size(2) is None
+
+
+def test_useful_size_when_null(qapp, item):
+    item.setScale(0.1)
+    assert item.useful_size(2) is None
+
+
+def test_resample_image(qapp):
+    item = BeePixmapItem(QtGui.QImage(
+        100, 50, QtGui.QImage.Format.Format_RGB32))
+    item.setScale(0.2)
+    item.crop = QtCore.QRectF(10, 20, 50, 30)
+    topleft = item.mapToScene(item.crop.topLeft())
+    bottomright = item.mapToScene(item.crop.bottomRight())
+    item.resample_image(QtGui.QImage(
+        40, 20, QtGui.QImage.Format.Format_RGB32))
+    assert item.image().size() == QtCore.QSize(40, 20)
+    assert item.crop == QtCore.QRectF(4, 8, 20, 12)
+    assert item.scale() == 0.5
+    assert item.mapToScene(item.crop.topLeft()) == topleft
+    assert item.mapToScene(item.crop.bottomRight()) == bottomright
+
+
 def test_crop_handle_topleft(qapp, item):
     item.crop_temp = QtCore.QRectF(100, 200, 300, 400)
     assert item.crop_handle_topleft() == QtCore.QRectF(100, 200, 15, 15)
@@ -261,28 +371,198 @@ def test_get_crop_edge_cursor(edge, rotation, expected, qapp, item):
 
 
 def test_paint(qapp, item):
-    item.pixmap = MagicMock()
+    item.image = MagicMock()
     item.paint_selectable = MagicMock()
     item.crop = QtCore.QRectF(10, 20, 30, 40)
     painter = MagicMock()
+    painter.worldTransform.return_value = QtGui.QTransform()
     item.paint(painter, None, None)
     item.paint_selectable.assert_called_once()
-    painter.drawPixmap.assert_called_with(
+    painter.drawImage.assert_called_with(
         QtCore.QRectF(10, 20, 30, 40),
-        item.pixmap(),
+        item.image(),
         QtCore.QRectF(10, 20, 30, 40))
 
 
+def test_paint_when_placeholder(qapp):
+    item = BeePixmapItem.create_placeholder(QtCore.QSize(30, 40))
+    item.paint_selectable = MagicMock()
+    painter = MagicMock()
+    painter.worldTransform.return_value = QtGui.QTransform()
+    item.paint(painter, None, None)
+    item.paint_selectable.assert_called_once()
+    painter.drawImage.assert_not_called()
+    painter.fillRect.assert_called_once()
+    assert painter.fillRect.call_args[0][0] == QtCore.QRectF(0, 0, 30, 40)
+
+
 def test_paint_when_crop_mode(qapp, item):
-    item.pixmap = MagicMock()
+    item.image = MagicMock()
     item.paint_selectable = MagicMock()
     item.crop = QtCore.QRectF(10, 20, 30, 40)
     item.crop_mode = True
     item.crop_temp = QtCore.QRectF(11, 22, 29, 39)
     painter = MagicMock()
+    painter.worldTransform.return_value = QtGui.QTransform()
     item.paint(painter, None, None)
     item.paint_selectable.assert_not_called()
-    painter.drawPixmap.assert_called_with(0, 0, item.pixmap())
+    painter.drawImage.assert_called_with(0, 0, item.image())
+
+
+def test_is_opaque(qapp):
+    img = QtGui.QImage(3, 3, QtGui.QImage.Format.Format_ARGB32)
+    img.fill(QtGui.QColor(255, 0, 0))
+    assert BeePixmapItem(img).is_opaque is True
+    img.setPixelColor(0, 0, QtGui.QColor(255, 0, 0, 100))
+    assert BeePixmapItem(img).is_opaque is False
+
+
+def test_occluder_rect(qapp):
+    img = QtGui.QImage(30, 20, QtGui.QImage.Format.Format_RGB32)
+    item = BeePixmapItem(img)
+    item.setPos(5, 6)
+    item.setScale(2)
+    item.crop = QtCore.QRectF(10, 0, 20, 20)
+    assert item.occluder_rect() == QtCore.QRectF(25, 6, 40, 40)
+
+
+def test_occluder_rect_when_flipped(qapp):
+    img = QtGui.QImage(30, 20, QtGui.QImage.Format.Format_RGB32)
+    item = BeePixmapItem(img)
+    item.do_flip()
+    assert item.occluder_rect() == QtCore.QRectF(-30, 0, 30, 20)
+
+
+def test_occluder_rect_when_rotated(qapp):
+    img = QtGui.QImage(30, 20, QtGui.QImage.Format.Format_RGB32)
+    item = BeePixmapItem(img)
+    item.setRotation(45)
+    assert item.occluder_rect() is None
+
+
+def test_occluder_rect_when_transparent(qapp):
+    img = QtGui.QImage(30, 20, QtGui.QImage.Format.Format_ARGB32)
+    img.fill(QtGui.QColor(0, 0, 0, 0))
+    assert BeePixmapItem(img).occluder_rect() is None
+
+
+def test_occluder_rect_when_placeholder(qapp):
+    item = BeePixmapItem.create_placeholder(QtCore.QSize(3, 3))
+    assert item.occluder_rect() is None
+
+
+def test_is_occluded_caches_until_item_changes(view, item):
+    view.scene.addItem(item)
+    view.scene.is_occluded = MagicMock(return_value=True)
+    assert item.is_occluded() is True
+    view.scene.on_change([])
+    assert item.is_occluded() is True
+    view.scene.is_occluded.assert_called_once_with(item)
+    item.setPos(5, 5)
+    view.scene.is_occluded.return_value = False
+    assert item.is_occluded() is False
+    assert view.scene.is_occluded.call_count == 2
+
+
+def test_is_occluded_caches_until_occluder_above_changes(
+        view, imgfilename3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    view.scene.addItem(item)
+    view.scene.is_occluded = MagicMock(return_value=False)
+    assert item.is_occluded() is False
+    img = QtGui.QImage(100, 100, QtGui.QImage.Format.Format_RGB32)
+    other = BeePixmapItem(img)
+    other.setPos(500, 500)
+    view.scene.addItem(other)
+    assert item.is_occluded() is False
+    view.scene.is_occluded.assert_called_once_with(item)
+    other.setPos(0, 0)
+    view.scene.is_occluded.return_value = True
+    assert item.is_occluded() is True
+    assert view.scene.is_occluded.call_count == 2
+
+
+def test_is_occluded_when_in_gesture_group(view, item):
+    view.scene.addItem(item)
+    group = QtWidgets.QGraphicsItemGroup()
+    view.scene.addItem(group)
+    item.setParentItem(group)
+    view.scene.is_occluded = MagicMock(return_value=True)
+    assert item.is_occluded() is False
+    view.scene.is_occluded.assert_not_called()
+
+
+def test_occluder_rect_when_in_gesture_group(view):
+    img = QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32)
+    item = BeePixmapItem(img)
+    view.scene.addItem(item)
+    group = QtWidgets.QGraphicsItemGroup()
+    view.scene.addItem(group)
+    item.setParentItem(group)
+    assert item.occluder_rect() is None
+    assert item not in view.scene.occluders
+
+
+def test_is_occluded_when_not_in_scene(item):
+    assert item.is_occluded() is False
+
+
+def test_paint_skips_occluded_item(view, item):
+    view.scene.addItem(item)
+    item.is_occluded = MagicMock(return_value=True)
+    item.paint_selectable = MagicMock()
+    painter = MagicMock()
+    item.paint(painter, None, None)
+    painter.drawImage.assert_not_called()
+    item.paint_selectable.assert_not_called()
+
+
+def test_paint_doesnt_skip_occluded_item_when_cached(view, item):
+    view.scene.render_cache = True
+    view.scene.addItem(item)
+    item.is_occluded = MagicMock(return_value=True)
+    item.draw_image = MagicMock()
+    item.paint(MagicMock(), None, None)
+    item.draw_image.assert_called_once()
+
+
+def test_update_cache_mode_when_render_cache(view, item):
+    view.scene.render_cache = True
+    view.scene.addItem(item)
+    assert item.cacheMode() == (
+        QtWidgets.QGraphicsItem.CacheMode.DeviceCoordinateCache)
+
+
+def test_update_cache_mode_when_no_render_cache(view, item):
+    view.scene.addItem(item)
+    assert item.cacheMode() == QtWidgets.QGraphicsItem.CacheMode.NoCache
+
+
+def test_update_cache_mode_when_not_in_scene(item):
+    item.update_cache_mode()
+    assert item.cacheMode() == QtWidgets.QGraphicsItem.CacheMode.NoCache
+
+
+def test_update_cache_mode_when_placeholder(view):
+    view.scene.render_cache = True
+    item = BeePixmapItem.create_placeholder(QtCore.QSize(3, 3))
+    view.scene.addItem(item)
+    assert item.cacheMode() == QtWidgets.QGraphicsItem.CacheMode.NoCache
+    item.pending_image = (QtGui.QImage(3, 3, QtGui.QImage.Format.Format_RGB32),
+                          None)
+    item.apply_pending_image()
+    assert item.cacheMode() == (
+        QtWidgets.QGraphicsItem.CacheMode.DeviceCoordinateCache)
+
+
+def test_update_cache_mode_disabled_during_crop_mode(view, item):
+    view.scene.render_cache = True
+    view.scene.addItem(item)
+    item.enter_crop_mode()
+    assert item.cacheMode() == QtWidgets.QGraphicsItem.CacheMode.NoCache
+    item.exit_crop_mode(confirm=False)
+    assert item.cacheMode() == (
+        QtWidgets.QGraphicsItem.CacheMode.DeviceCoordinateCache)
 
 
 def test_enter_crop_mode(view, item):
@@ -527,9 +807,7 @@ def test_mouse_press_event_crop_mode_outside_handle_outside_crop(
                           ((100, 80), (100, 80)),
                           ((105, 85), (100, 80))])
 def test_ensure_point_within_pixmap_bounds_inside(point, expected, qapp, item):
-    pixmap = MagicMock()
-    pixmap.size.return_value = QtCore.QRectF(0, 0, 100, 80)
-    item.pixmap = MagicMock(return_value=pixmap)
+    item._image_size = QtCore.QSize(100, 80)
     result = item.ensure_point_within_pixmap_bounds(QtCore.QPointF(*point))
     assert result == QtCore.QPointF(*expected)
 
@@ -547,10 +825,8 @@ def test_ensure_point_within_pixmap_bounds_inside(point, expected, qapp, item):
 @patch('beeref.selection.SelectableMixin.mouseMoveEvent')
 def test_mouse_move_when_crop_mode_inside_handle(
         mouse_mock, start, pos, handle, expected, qapp, item):
-    pixmap = MagicMock()
-    pixmap.size.return_value = QtCore.QRectF(0, 0, 100, 80)
+    item._image_size = QtCore.QSize(100, 80)
     item.crop_mode = True
-    item.pixmap = MagicMock(return_value=pixmap)
     item.crop_temp = QtCore.QRectF(10, 20, 30, 40)
     item.crop_mode_event_start = QtCore.QPointF(*start)
     item.crop_mode_move = getattr(item, handle)
@@ -597,3 +873,92 @@ def test_mouse_release_event_when_not_crop_mode(mouse_mock, qapp, item):
     assert item.crop_mode is False
     event.accept.assert_not_called()
     mouse_mock.assert_called_once_with(event)
+
+
+def test_pixmap_cost(qapp, imgfilename3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    assert item.pixmap_cost() == 36
+
+
+def test_demote_pixmap(qapp, imgfilename3x3, imgdata3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item.source_bytes = imgdata3x3
+    assert item.demote_pixmap() is True
+    assert item._image is None
+    assert item.pixmap_cost() == 0
+    assert item.encoded_cost() == len(item.source_bytes)
+    assert item.crop == QtCore.QRectF(0, 0, 3, 3)
+    assert item.pixmap().size() == QtCore.QSize(3, 3)
+
+
+def test_demote_pixmap_without_source_bytes(qapp, imgfilename3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    with patch('beeref.utils.image_to_bytes') as encode_mock:
+        assert item.demote_pixmap() is False
+        encode_mock.assert_not_called()
+    assert item._image is not None
+    assert item.source_bytes is None
+
+
+def test_demote_pixmap_keeps_existing_source_bytes(qapp, imgdata3x3):
+    item = BeePixmapItem(QtGui.QImage())
+    item.pixmap_from_bytes(imgdata3x3)
+    assert item.demote_pixmap() is True
+    assert item.source_bytes is imgdata3x3
+
+
+def test_demote_pixmap_when_crop_mode(qapp, imgfilename3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item.crop_mode = True
+    assert item.demote_pixmap() is False
+    assert item._image is not None
+
+
+def test_demote_pixmap_when_null(qapp, item):
+    assert item.demote_pixmap() is False
+
+
+def test_spill(qapp, imgfilename3x3, imgdata3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item.source_bytes = imgdata3x3
+    spill = SpillFile()
+    item.spill(spill)
+    assert item.memory_usage() == 0
+    assert item._spilled[0] is spill
+    assert item not in get_pixel_cache().encoded
+    assert item.pixmap().size() == QtCore.QSize(3, 3)
+    spill.close()
+
+
+def test_spill_when_already_demoted(qapp, imgdata3x3):
+    item = BeePixmapItem(QtGui.QImage())
+    item.pixmap_from_bytes(imgdata3x3)
+    item.demote_pixmap()
+    spill = SpillFile()
+    item.spill(spill)
+    assert item.memory_usage() == 0
+    assert item.source_bytes == imgdata3x3
+    spill.close()
+
+
+def test_init_stores_compact_image(qapp):
+    img = QtGui.QImage(10, 10, QtGui.QImage.Format.Format_ARGB32)
+    img.fill(QtGui.QColor(50, 50, 50))
+    item = BeePixmapItem(img)
+    assert item.image().format() == QtGui.QImage.Format.Format_Grayscale8
+    assert item.pixmap().size() == QtCore.QSize(10, 10)
+    assert item.memory_usage() == 120
+
+
+def test_memory_usage_includes_encoded_data(qapp, imgdata3x3):
+    item = BeePixmapItem(QtGui.QImage())
+    item.pixmap_from_bytes(imgdata3x3)
+    assert item.memory_usage() == 36 + len(imgdata3x3)
+
+
+def test_restore_pixmap_keeps_compact_format(qapp):
+    img = QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32)
+    img.fill(QtGui.QColor(50, 50, 50))
+    item = BeePixmapItem(img)
+    item.demote_pixmap()
+    assert item.image().format() == QtGui.QImage.Format.Format_Grayscale8
@@ -0,0 +1,119 @@
+import os.path
+from unittest.mock import MagicMock
+
+from PyQt6 import QtCore, QtGui
+
+from beeref.items import BeeTiledPixmapItem
+from beeref import tiles
+
+
+def make_item(tmpdir, width=40, height=20):
+    img = QtGui.QImage(width, height, QtGui.QImage.Format.Format_RGB32)
+    img.fill(QtGui.QColor(0, 0, 255))
+    path = os.path.join(tmpdir, 'big.png')
+    img.save(path)
+    return BeeTiledPixmapItem(
+        tiles.tile_image_file(path, tile_size=16), path)
+
+
+def test_init(qapp, tmpdir):
+    item = make_item(tmpdir)
+    assert item.is_croppable is False
+    assert item.width == 40
+    assert item.height == 20
+    assert item.filename == os.path.join(tmpdir, 'big.png')
+
+
+def test_get_extra_save_data(qapp, tmpdir):
+    item = make_item(tmpdir)
+    assert item.get_extra_save_data() == {
+        'filename': os.path.join(tmpdir, 'big.png'),
+        'width': 40,
+        'height': 20,
+        'tile_size': 16,
+    }
+
+
+def test_visible_tiles(qapp, tmpdir):
+    item = make_item(tmpdir)
+    assert list(item.visible_tiles(0, QtCore.QRectF(20, 0, 5, 5))) == [
+        (1, 0)]
+    assert list(item.visible_tiles(0, QtCore.QRectF(10, 10, 30, 30))) == [
+        (0, 0), (1, 0), (2, 0), (0, 1), (1, 1), (2, 1)]
+    assert list(item.visible_tiles(1, QtCore.QRectF(0, 0, 40, 20))) == [
+        (0, 0), (1, 0)]
+    assert list(item.visible_tiles(0, QtCore.QRectF(50, 0, 5, 5))) == []
+
+
+def test_paint_draws_exposed_tiles(qapp, tmpdir):
+    item = make_item(tmpdir)
+    item.paint_selectable = MagicMock()
+    painter = MagicMock()
+    painter.hasClipping.return_value = False
+    painter.worldTransform.return_value = QtGui.QTransform()
+    option = MagicMock()
+    option.exposedRect = QtCore.QRectF(20, 10, 5, 5)
+    item.paint(painter, option, None)
+    painter.drawImage.assert_called_once()
+    target, img, source = painter.drawImage.call_args[0]
+    assert target == QtCore.QRectF(16, 0, 16, 16)
+    assert img.size() == QtCore.QSize(16, 16)
+    assert source == QtCore.QRectF(0, 0, 16, 16)
+    item.paint_selectable.assert_called_once()
+
+
+def test_paint_restricts_to_clip_rect(qapp, tmpdir):
+    item = make_item(tmpdir)
+    item.paint_selectable = MagicMock()
+    painter = MagicMock()
+    painter.hasClipping.return_value = True
+    painter.clipBoundingRect.return_value = QtCore.QRectF(0, 0, 5, 5)
+    painter.worldTransform.return_value = QtGui.QTransform()
+    option = MagicMock()
+    option.exposedRect = QtCore.QRectF(0, 0, 40, 20)
+    item.paint(painter, option, None)
+    painter.drawImage.assert_called_once()
+    target = painter.drawImage.call_args[0][0]
+    assert target == QtCore.QRectF(0, 0, 16, 16)
+
+
+def test_paint_uses_scaled_down_level(qapp, tmpdir):
+    item = make_item(tmpdir)
+    item.paint_selectable = MagicMock()
+    painter = MagicMock()
+    painter.hasClipping.return_value = False
+    painter.worldTransform.return_value = QtGui.QTransform.fromScale(
+        0.3, 0.3)
+    option = MagicMock()
+    option.exposedRect = QtCore.QRectF(0, 0, 40, 20)
+    item.paint(painter, option, None)
+    assert painter.drawImage.call_count == 2
+    target, img, source = painter.drawImage.call_args_list[1][0]
+    assert target == QtCore.QRectF(32, 0, 8, 20)
+    assert img.size() == QtCore.QSize(4, 10)
+    assert source == QtCore.QRectF(0, 0, 4, 10)
+
+
+def test_create_copy(qapp, tmpdir):
+    item = make_item(tmpdir)
+    item.setPos(20, 30)
+    item.setRotation(33)
+    item.do_flip()
+    item.setZValue(0.5)
+    item.setScale(2.2)
+    copy = item.create_copy()
+    assert copy.tile_store is item.tile_store
+    assert copy.filename == item.filename
+    assert copy.pos() == QtCore.QPointF(20, 30)
+    assert copy.rotation() == 33
+    assert copy.flip() == -1
+    assert copy.zValue() == 0.5
+    assert copy.scale() == 2.2
+
+
+def test_copy_to_clipboard(qapp, tmpdir):
+    item = make_item(tmpdir)
+    clipboard = MagicMock()
+    item.copy_to_clipboard(clipboard)
+    img = clipboard.setImage.call_args[0][0]
+    assert img.size() == QtCore.QSize(10, 5)
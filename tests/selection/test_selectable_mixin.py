@@ -87,6 +87,7 @@ def test_select_handle_free_center(view, item):
 def test_draw_debug_shape_rect(view, item):
     view.scene.addItem(item)
     painter = MagicMock()
+    painter.worldTransform.return_value = QtGui.QTransform()
     item.draw_debug_shape(
         painter,
         QtCore.QRectF(5, 6, 20, 30),
@@ -98,6 +99,7 @@ def test_draw_debug_shape_rect(view, item):
 def test_draw_debug_shape_path(view, item):
     view.scene.addItem(item)
     painter = MagicMock()
+    painter.worldTransform.return_value = QtGui.QTransform()
     path = QtGui.QPainterPath()
     path.addRect(QtCore.QRectF(5, 6, 20, 30))
     item.draw_debug_shape(
@@ -112,9 +114,10 @@ def test_draw_debug_shape_path(view, item):
 def test_paint_when_not_selected(debug_mock, view, item):
     view.scene.addItem(item)
     painter = MagicMock()
+    painter.worldTransform.return_value = QtGui.QTransform()
     item.setSelected(False)
     item.paint(painter, None, None)
-    painter.drawPixmap.assert_called_once()
+    painter.drawImage.assert_called_once()
     painter.drawRect.assert_not_called()
     painter.drawPoint.assert_not_called()
     debug_mock.assert_not_called()
@@ -123,9 +126,10 @@ def test_paint_when_not_selected(debug_mock, view, item):
 def test_paint_when_selected_single_selection(view, item):
     view.scene.addItem(item)
     painter = MagicMock()
+    painter.worldTransform.return_value = QtGui.QTransform()
     item.setSelected(True)
     item.paint(painter, None, None)
-    painter.drawPixmap.assert_called_once()
+    painter.drawImage.assert_called_once()
     painter.drawRect.assert_called_once()
     assert painter.drawPoint.call_count == 4
 
@@ -136,9 +140,10 @@ def test_paint_when_selected_multi_selection(view, item):
     item2.setSelected(True)
     view.scene.addItem(item2)
     painter = MagicMock()
+    painter.worldTransform.return_value = QtGui.QTransform()
     item.setSelected(True)
     item.paint(painter, None, None)
-    painter.drawPixmap.assert_called_once()
+    painter.drawImage.assert_called_once()
     painter.drawRect.assert_called_once()
     painter.drawPoint.assert_not_called()
 
@@ -150,7 +155,9 @@ def test_paint_when_debug_shapes(view):
             args_mock.debug_boundingrects = False
             args_mock.debug_handles = False
             item = BeePixmapItem(QtGui.QImage())
-            item.paint(MagicMock(), None, None)
+            painter = MagicMock()
+            painter.worldTransform.return_value = QtGui.QTransform()
+            item.paint(painter, None, None)
             m.assert_called_once()
 
 
@@ -161,7 +168,9 @@ def test_paint_when_debug_boundingrects(view):
             args_mock.debug_boundingrects = True
             args_mock.debug_handles = False
             item = BeePixmapItem(QtGui.QImage())
-            item.paint(MagicMock(), None, None)
+            painter = MagicMock()
+            painter.worldTransform.return_value = QtGui.QTransform()
+            item.paint(painter, None, None)
             m.assert_called_once()
 
 
@@ -174,7 +183,9 @@ def test_paint_when_debug_handles(view):
             item = BeePixmapItem(QtGui.QImage())
             view.scene.addItem(item)
             item.setSelected(True)
-            item.paint(MagicMock(), None, None)
+            painter = MagicMock()
+            painter.worldTransform.return_value = QtGui.QTransform()
+            item.paint(painter, None, None)
             m.assert_called()
 
 
@@ -254,6 +265,75 @@ def test_rotate_bounds_topleft(view, item):
     assert path.contains(QtCore.QPointF(-4, -4)) is False
 
 
+def test_handle_geometry_is_cached(view, item):
+    view.scene.addItem(item)
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        geometry = item.handle_geometry()
+        assert item.handle_geometry() is geometry
+
+
+def test_handle_geometry_when_view_scale_changes(view, item):
+    view.scene.addItem(item)
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        geometry = item.handle_geometry()
+        view.scale(2, 2)
+        assert item.handle_geometry() is not geometry
+        assert item.handle_geometry().shape_margin == 5
+
+
+def test_handle_geometry_when_item_size_changes(view, item):
+    view.scene.addItem(item)
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        geometry = item.handle_geometry()
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 50, 80)):
+        assert item.handle_geometry() is not geometry
+        assert item.handle_geometry().flip_edges[3]['rect'].left() == 40
+
+
+def test_bounding_rect_does_not_build_handle_geometry(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        with patch('beeref.selection.HandleGeometry') as geometry_mock:
+            rect = item.boundingRect()
+    geometry_mock.assert_not_called()
+    assert rect == QtCore.QRectF(-20, -20, 140, 120)
+
+
+@mark.parametrize('pos,kind,target',
+                  [((2, 2), 'scale', (0, 0)),
+                   ((99, 79), 'scale', (100, 80)),
+                   ((-12, -12), 'rotate', (0, 0)),
+                   ((111, 91), 'rotate', (100, 80)),
+                   ((50, 0), 'flip', 0),
+                   ((0, 40), 'flip', 2)])
+def test_handle_geometry_handle_at(pos, kind, target, view, item):
+    view.scene.addItem(item)
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        geometry = item.handle_geometry()
+        result = geometry.handle_at(QtCore.QPointF(*pos))
+        assert result[0] == kind
+        if kind == 'flip':
+            assert result[1] is geometry.flip_edges[target]
+        else:
+            assert result[1] == QtCore.QPointF(*target)
+
+
+def test_handle_geometry_handle_at_when_no_handle(view, item):
+    view.scene.addItem(item)
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        geometry = item.handle_geometry()
+        assert geometry.handle_at(QtCore.QPointF(50, 40)) is None
+        assert geometry.handle_at(QtCore.QPointF(200, 40)) is None
+
+
 def test_get_flip_bounds(view, item):
     item.SELECT_RESIZE_SIZE = 10
     item.SELECT_ROTATE_SIZE = 10
@@ -347,6 +427,18 @@ def test_shape_when_selected_single(view, item):
         assert shape.bottomRight().y() == 95
 
 
+def test_shape_when_selected_single_is_cached(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    with patch.object(item, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        with patch.object(item, 'selection_shape',
+                          return_value=QtGui.QPainterPath()) as shape_mock:
+            shape = item.shape()
+            assert item.shape() is shape
+            shape_mock.assert_called_once_with()
+
+
 def test_shape_when_selected_multi(view, item):
     view.scene.addItem(item)
     item2 = BeePixmapItem(QtGui.QImage())
@@ -969,6 +1061,208 @@ def test_mouse_move_event_when_flip_action(view, item):
         event.accept.assert_called_once_with()
 
 
+def start_multi_rotate(view, count):
+    items = []
+    for i in range(count):
+        item = BeePixmapItem(
+            QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+        item.setPos(i * 20, i * 5)
+        view.scene.addItem(item)
+        items.append(item)
+    view.scene.select_items(items)
+    multi = view.scene.multi_select_item
+    multi.event_start = QtCore.QPointF(10, 10)
+    multi.rotate_active = True
+    multi.rotate_start_angle = -3
+    multi.event_anchor = QtCore.QPointF(10, 20)
+    for item in multi.selection_action_items():
+        item.rotate_orig_degrees = item.rotation()
+    event = MagicMock()
+    event.scenePos.return_value = QtCore.QPointF(15, 25)
+    event.modifiers.return_value = Qt.KeyboardModifier.NoModifier
+    return multi, items, event
+
+
+def test_mouse_move_event_when_rotate_action_many_items(view):
+    multi, items, event = start_multi_rotate(view, 30)
+    multi.mouseMoveEvent(event)
+    group = multi.gesture_group
+    assert group is not None
+    assert group.scene() == view.scene
+    assert items[0].parentItem() is group
+    assert items[0].rotation() == 0
+    assert multi.rotation() == approx(318)
+    assert multi.parentItem() is None
+    pos = items[5].scenePos()
+    multi.mouseMoveEvent(event)
+    assert multi.gesture_group is group
+    assert items[5].scenePos() == pos
+
+
+def test_mouse_move_event_when_rotate_action_few_items(view):
+    multi, items, event = start_multi_rotate(view, 3)
+    multi.mouseMoveEvent(event)
+    assert multi.gesture_group is None
+    assert items[0].parentItem() is None
+    assert items[0].rotation() == approx(318)
+
+
+def test_mouse_release_event_when_rotate_action_many_items(view):
+    multi, items, event = start_multi_rotate(view, 30)
+    view.scene.undo_stack = MagicMock(push=MagicMock())
+    multi.mouseMoveEvent(event)
+    group = multi.gesture_group
+    positions = [item.scenePos() for item in items]
+    multi.mouseReleaseEvent(event)
+    assert multi.gesture_group is None
+    assert group.scene() is None
+    for item, pos in zip(items, positions):
+        assert item.parentItem() is None
+        assert item.rotation() == approx(318)
+        assert item.scenePos().x() == approx(pos.x())
+        assert item.scenePos().y() == approx(pos.y())
+    cmd = view.scene.undo_stack.push.call_args_list[0][0][0]
+    assert isinstance(cmd, commands.RotateItemsBy)
+    assert set(cmd.items) == set(items + [multi])
+    assert cmd.delta == -42
+    assert cmd.anchor == QtCore.QPointF(10, 20)
+    assert cmd.ignore_first_redo is True
+
+
+def test_mouse_release_event_when_scale_action_many_items(view):
+    items = []
+    for i in range(30):
+        item = BeePixmapItem(
+            QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+        item.setPos(i * 20, i * 5)
+        view.scene.addItem(item)
+        items.append(item)
+    view.scene.select_items(items)
+    view.scene.undo_stack = MagicMock(push=MagicMock())
+    multi = view.scene.multi_select_item
+    multi.scale_active = True
+    multi.event_direction = QtCore.QPointF(1, 1) / math.sqrt(2)
+    multi.event_anchor = QtCore.QPointF(0, 0)
+    multi.event_start = QtCore.QPointF(10, 10)
+    for item in multi.selection_action_items():
+        item.scale_orig_factor = item.scale()
+    event = MagicMock()
+    event.scenePos.return_value = QtCore.QPointF(200, 200)
+    multi.mouseMoveEvent(event)
+    assert multi.gesture_group is not None
+    assert items[0].scale() == 1
+    multi.mouseReleaseEvent(event)
+    factor = multi.scale()
+    assert factor > 1
+    for i, item in enumerate(items):
+        assert item.parentItem() is None
+        assert item.scale() == approx(factor)
+        assert item.pos().x() == approx(i * 20 * factor)
+        assert item.pos().y() == approx(i * 5 * factor)
+    cmd = view.scene.undo_stack.push.call_args_list[0][0][0]
+    assert isinstance(cmd, commands.ScaleItemsBy)
+    assert cmd.factor == approx(factor)
+
+
+def test_mouse_move_event_rotate_many_items_keeps_stacking_order(view):
+    multi, items, event = start_multi_rotate(view, 30)
+    for i, item in enumerate(items):
+        item.setZValue(i + 1)
+    below = BeePixmapItem(
+        QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+    below.setZValue(0)
+    view.scene.addItem(below)
+    above = BeePixmapItem(
+        QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+    above.setZValue(100)
+    view.scene.addItem(above)
+    multi.mouseMoveEvent(event)
+    group = multi.gesture_group
+    assert group.zValue() == 1
+    assert items[3].zValue() == 4
+    assert view.scene.items(order=Qt.SortOrder.AscendingOrder).index(
+        items[3]) < view.scene.items(
+            order=Qt.SortOrder.AscendingOrder).index(items[4])
+    assert above.zValue() > group.zValue()
+    assert below.zValue() < group.zValue()
+
+
+def test_mouse_move_event_rotate_many_items_with_item_stacked_between(view):
+    multi, items, event = start_multi_rotate(view, 30)
+    for i, item in enumerate(items):
+        item.setZValue(i)
+    between = BeePixmapItem(
+        QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+    between.setZValue(10.5)
+    view.scene.addItem(between)
+    multi.mouseMoveEvent(event)
+    assert multi.gesture_group is False
+    assert items[0].parentItem() is None
+    assert items[0].rotation() == approx(318)
+    view.scene.undo_stack = MagicMock(push=MagicMock())
+    multi.mouseReleaseEvent(event)
+    assert multi.gesture_group is None
+
+
+def test_mouse_move_event_rotate_many_items_marks_bounds_dirty(view):
+    multi, items, event = start_multi_rotate(view, 30)
+    multi.mouseMoveEvent(event)
+    view.scene.update_bounds()
+    event.scenePos.return_value = QtCore.QPointF(30, 25)
+    multi.mouseMoveEvent(event)
+    assert set(items) <= view.scene.bounds_dirty
+    rect = items[5].mapRectToScene(items[5].bounding_rect_unselected())
+    assert view.scene.itemsBoundingRect(items=[items[5]]) == rect
+
+
+def test_cancel_gesture_when_rotate_action_many_items(view):
+    multi, items, event = start_multi_rotate(view, 30)
+    view.scene.undo_stack = MagicMock(push=MagicMock())
+    positions = [item.scenePos() for item in items]
+    multi.mouseMoveEvent(event)
+    group = multi.gesture_group
+    multi.cancel_gesture()
+    assert multi.gesture_group is None
+    assert group.scene() is None
+    assert multi.rotate_active is False
+    assert multi.rotation() == approx(0)
+    for item, pos in zip(items, positions):
+        assert item.parentItem() is None
+        assert item.rotation() == approx(0)
+        assert item.scenePos().x() == approx(pos.x())
+        assert item.scenePos().y() == approx(pos.y())
+    view.scene.undo_stack.push.assert_not_called()
+
+
+def test_cancel_gesture_when_scale_action(view, item):
+    view.scene.addItem(item)
+    item.setScale(2)
+    item.scale_active = True
+    item.scale_orig_factor = 2
+    item.event_anchor = QtCore.QPointF(0, 0)
+    item.setScale(3)
+    item.cancel_gesture()
+    assert item.scale() == 2
+    assert item.scale_active is False
+
+
+def test_cancel_gesture_when_no_action(view, item):
+    view.scene.addItem(item)
+    item.setScale(3)
+    item.cancel_gesture()
+    assert item.scale() == 3
+
+
+def test_scene_event_ungrab_mouse_cancels_gesture(view):
+    multi, items, event = start_multi_rotate(view, 30)
+    multi.mouseMoveEvent(event)
+    multi.sceneEvent(QtCore.QEvent(QtCore.QEvent.Type.UngrabMouse))
+    assert multi.gesture_group is None
+    assert multi.rotate_active is False
+    assert items[0].parentItem() is None
+    assert items[0].rotation() == approx(0)
+
+
 def test_mouse_release_event_when_no_action(view, item):
     view.scene.addItem(item)
     event = MagicMock()
@@ -0,0 +1,72 @@
+from PyQt6 import QtCore
+
+from beeref.bounds import BoundsIndex
+
+
+def test_bounding_rect_when_empty():
+    assert BoundsIndex().bounding_rect() == QtCore.QRectF(0, 0, 0, 0)
+
+
+def test_bounding_rect():
+    index = BoundsIndex()
+    index.set('a', QtCore.QRectF(0, 0, 10, 10))
+    index.set('b', QtCore.QRectF(-5, 5, 10, 20))
+    assert index.bounding_rect() == QtCore.QRectF(-5, 0, 15, 25)
+    assert len(index) == 2
+    assert 'a' in index
+    assert index.get('b') == QtCore.QRectF(-5, 5, 10, 20)
+
+
+def test_bounding_rect_after_set_shrinks():
+    index = BoundsIndex()
+    index.set('a', QtCore.QRectF(0, 0, 10, 10))
+    index.set('b', QtCore.QRectF(-5, 5, 10, 20))
+    index.set('b', QtCore.QRectF(2, 2, 1, 1))
+    assert index.bounding_rect() == QtCore.QRectF(0, 0, 10, 10)
+
+
+def test_bounding_rect_after_remove():
+    index = BoundsIndex()
+    index.set('a', QtCore.QRectF(0, 0, 10, 10))
+    index.set('b', QtCore.QRectF(-5, 5, 10, 20))
+    index.remove('b')
+    index.remove('c')
+    assert index.bounding_rect() == QtCore.QRectF(0, 0, 10, 10)
+    assert index.get('b') is None
+    index.remove('a')
+    assert index.bounding_rect() == QtCore.QRectF(0, 0, 0, 0)
+
+
+def test_compacts_stale_entries():
+    index = BoundsIndex()
+    for i in range(100):
+        index.set('a', QtCore.QRectF(i, 0, 10, 10))
+    assert len(index.heaps[0]) <= 18
+    assert index.bounding_rect() == QtCore.QRectF(99, 0, 10, 10)
+
+
+def test_update_many():
+    index = BoundsIndex()
+    index.set('a', QtCore.QRectF(0, 0, 10, 10))
+    index.update([('b', QtCore.QRectF(-5, 5, 10, 20)),
+                  ('c', QtCore.QRectF(20, 0, 10, 10))])
+    assert len(index) == 3
+    assert index.get('c') == QtCore.QRectF(20, 0, 10, 10)
+    assert index.bounding_rect() == QtCore.QRectF(-5, 0, 35, 25)
+
+
+def test_update_many_replaces_existing():
+    index = BoundsIndex()
+    index.update([(i, QtCore.QRectF(i, 0, 1, 1)) for i in range(10)])
+    index.update([(i, QtCore.QRectF(0, 0, 1, 1)) for i in range(10)])
+    assert index.bounding_rect() == QtCore.QRectF(0, 0, 1, 1)
+
+
+def test_remove_many():
+    index = BoundsIndex()
+    index.update([('a', QtCore.QRectF(0, 0, 10, 10)),
+                  ('b', QtCore.QRectF(-5, 5, 10, 20)),
+                  ('c', QtCore.QRectF(20, 0, 10, 10))])
+    index.remove_many(['b', 'c', 'd'])
+    assert len(index) == 1
+    assert index.bounding_rect() == QtCore.QRectF(0, 0, 10, 10)
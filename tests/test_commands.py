@@ -1,9 +1,11 @@
 from unittest.mock import MagicMock, patch
 
-from PyQt6 import QtCore, QtGui
+from PyQt6 import QtCore, QtGui, QtWidgets
 
 from beeref import commands
+from beeref import utils
 from beeref.items import BeePixmapItem, BeeTextItem
+from beeref.pixelcache import SpillFile
 
 
 def test_insert_items(view):
@@ -85,6 +87,38 @@ def test_delete_items(view):
     assert item2.isSelected() is True
 
 
+def test_delete_items_undo_emits_selection_changed_in_bulk(view):
+    items = [BeePixmapItem(QtGui.QImage()) for i in range(3)]
+    for item in items:
+        view.scene.addItem(item)
+    command = commands.DeleteItems(view.scene, items)
+    command.redo()
+    handler = MagicMock()
+    view.scene.selectionChanged.connect(handler)
+    command.undo()
+    # Once for the items, once for the multi select outline
+    assert handler.call_count == 2
+    assert len(view.scene.selected_user_items()) == 3
+
+
+def test_delete_items_many_restores_index(view):
+    items = []
+    for i in range(200):
+        item = BeePixmapItem(
+            QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+        item.setPos(i * 20, 0)
+        view.scene.addItem(item)
+        items.append(item)
+    command = commands.DeleteItems(view.scene, items[:150])
+    command.redo()
+    assert view.scene.items(QtCore.QRectF(0, 0, 5, 5)) == []
+    command.undo()
+    assert view.scene.itemIndexMethod() == (
+        QtWidgets.QGraphicsScene.ItemIndexMethod.BspTreeIndex)
+    assert items[0] in view.scene.items(QtCore.QRectF(0, 0, 5, 5))
+    assert len(view.scene.selected_user_items()) == 150
+
+
 def test_move_items_by(qapp):
     item1 = BeePixmapItem(QtGui.QImage())
     item1.setPos(0, 0)
@@ -226,6 +260,79 @@ def test_rotate_items_by_ignore_first_redo(qapp):
     assert item2.pos().y() == 100
 
 
+def test_move_items_by_merges_consecutive(qapp):
+    stack = commands.BeeUndoStack()
+    item = BeePixmapItem(QtGui.QImage())
+    stack.push(commands.MoveItemsBy([item], QtCore.QPointF(1, 0)))
+    stack.push(commands.MoveItemsBy([item], QtCore.QPointF(0, 2)))
+    assert stack.count() == 1
+    assert stack.command(0).delta == QtCore.QPointF(1, 2)
+    assert item.pos() == QtCore.QPointF(1, 2)
+    stack.undo()
+    assert item.pos() == QtCore.QPointF(0, 0)
+
+
+def test_move_items_by_doesnt_merge_other_items(qapp):
+    stack = commands.BeeUndoStack()
+    item1 = BeePixmapItem(QtGui.QImage())
+    item2 = BeePixmapItem(QtGui.QImage())
+    stack.push(commands.MoveItemsBy([item1], QtCore.QPointF(1, 0)))
+    stack.push(commands.MoveItemsBy([item1, item2], QtCore.QPointF(0, 2)))
+    assert stack.count() == 2
+
+
+def test_move_items_by_doesnt_merge_after_interval(qapp):
+    stack = commands.BeeUndoStack()
+    item = BeePixmapItem(QtGui.QImage())
+    stack.push(commands.MoveItemsBy([item], QtCore.QPointF(1, 0)))
+    stack.command(0).timestamp -= commands.MERGE_INTERVAL + 1
+    stack.push(commands.MoveItemsBy([item], QtCore.QPointF(0, 2)))
+    assert stack.count() == 2
+
+
+def test_move_items_by_merge_drops_null_move(qapp):
+    stack = commands.BeeUndoStack()
+    item = BeePixmapItem(QtGui.QImage())
+    stack.push(commands.MoveItemsBy([item], QtCore.QPointF(1, 0)))
+    stack.push(commands.MoveItemsBy([item], QtCore.QPointF(-1, 0)))
+    assert stack.count() == 0
+
+
+def test_scale_items_by_merges_consecutive(qapp):
+    stack = commands.BeeUndoStack()
+    item = BeePixmapItem(QtGui.QImage())
+    anchor = QtCore.QPointF(10, 10)
+    stack.push(commands.ScaleItemsBy([item], 2, anchor))
+    stack.push(commands.ScaleItemsBy([item], 1.5, anchor))
+    assert stack.count() == 1
+    assert stack.command(0).factor == 3
+    assert item.scale() == 3
+    stack.undo()
+    assert item.scale() == 1
+    assert item.pos() == QtCore.QPointF(0, 0)
+
+
+def test_scale_items_by_doesnt_merge_other_anchor(qapp):
+    stack = commands.BeeUndoStack()
+    item = BeePixmapItem(QtGui.QImage())
+    stack.push(commands.ScaleItemsBy([item], 2, QtCore.QPointF(0, 0)))
+    stack.push(commands.ScaleItemsBy([item], 2, QtCore.QPointF(5, 0)))
+    assert stack.count() == 2
+
+
+def test_rotate_items_by_merges_consecutive(qapp):
+    stack = commands.BeeUndoStack()
+    item = BeePixmapItem(QtGui.QImage())
+    anchor = QtCore.QPointF(10, 10)
+    stack.push(commands.RotateItemsBy([item], 30, anchor))
+    stack.push(commands.RotateItemsBy([item], 15, anchor))
+    assert stack.count() == 1
+    assert stack.command(0).delta == 45
+    assert item.rotation() == 45
+    stack.undo()
+    assert item.rotation() == 0
+
+
 def test_normalize_items(qapp):
     item1 = BeePixmapItem(QtGui.QImage())
     item1.setScale(1)
@@ -390,6 +497,292 @@ def test_reset_crop_ignores_uncroppable(qapp):
     assert item.boundingRect() == brect
 
 
+def test_bake_crops(qapp):
+    img = QtGui.QImage(10, 20, QtGui.QImage.Format.Format_RGB32)
+    img.fill(QtGui.QColor(255, 0, 0))
+    item1 = BeePixmapItem(img)
+    item1.crop = QtCore.QRectF(2, 4, 5, 6)
+    item1.setPos(100, 200)
+    command = commands.BakeCrops(
+        [item1],
+        [(img.copy(item1.bake_crop_rect()), b'foo')],
+        [utils.image_to_bytes(img)])
+    with patch('beeref.utils.image_to_bytes') as encode_mock:
+        command.redo()
+        encode_mock.assert_not_called()
+    assert item1.image().size() == QtCore.QSize(5, 6)
+    assert item1.crop == QtCore.QRectF(0, 0, 5, 6)
+    assert item1.pos() == QtCore.QPointF(102, 204)
+    assert item1.source_bytes == b'foo'
+
+    command.undo()
+    assert item1.image().size() == QtCore.QSize(10, 20)
+    assert item1.crop == QtCore.QRectF(2, 4, 5, 6)
+    assert item1.pos() == QtCore.QPointF(100, 200)
+
+
+def test_resample_images(qapp):
+    item = BeePixmapItem(QtGui.QImage(
+        100, 50, QtGui.QImage.Format.Format_RGB32))
+    item.setScale(0.2)
+    item.crop = QtCore.QRectF(10, 20, 50, 30)
+    old_data = utils.image_to_bytes(item.image())
+    command = commands.ResampleImages(
+        [item],
+        [(QtGui.QImage(40, 20, QtGui.QImage.Format.Format_RGB32), b'foo')],
+        [old_data])
+    with patch('beeref.utils.image_to_bytes') as encode_mock:
+        command.redo()
+        encode_mock.assert_not_called()
+    assert item.image().size() == QtCore.QSize(40, 20)
+    assert item.scale() == 0.5
+    assert item.crop == QtCore.QRectF(4, 8, 20, 12)
+    assert item.source_bytes == b'foo'
+
+    command.undo()
+    assert item.image().size() == QtCore.QSize(100, 50)
+    assert item.scale() == 0.2
+    assert item.crop == QtCore.QRectF(10, 20, 50, 30)
+
+
+def test_replace_images(qapp):
+    item = BeePixmapItem(QtGui.QImage(
+        100, 50, QtGui.QImage.Format.Format_RGB32))
+    item.crop = QtCore.QRectF(10, 20, 50, 30)
+    img = QtGui.QImage(40, 20, QtGui.QImage.Format.Format_RGB32)
+    command = commands.ReplaceImages([item], [(img, b'foo')])
+    command.redo()
+    assert item.image().size() == QtCore.QSize(40, 20)
+    assert item.crop == QtCore.QRectF(0, 0, 40, 20)
+    assert item.source_bytes == b'foo'
+    assert command.cost() > 0
+
+    command.undo()
+    assert item.image().size() == QtCore.QSize(100, 50)
+    assert item.crop == QtCore.QRectF(10, 20, 50, 30)
+
+
+def test_delete_items_cost_and_spill(view, imgfilename3x3, imgdata3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item.source_bytes = imgdata3x3
+    view.scene.addItem(item)
+    command = commands.DeleteItems(view.scene, [item])
+    assert command.cost() == 0
+    command.redo()
+    assert command.cost() == item.memory_usage()
+    assert command.cost() > 0
+    spill = SpillFile()
+    command.spill(spill)
+    assert command.cost() == 0
+    command.undo()
+    assert item.image().size() == QtCore.QSize(3, 3)
+    spill.close()
+
+
+def test_insert_items_cost(view, imgfilename3x3):
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    command = commands.InsertItems(view.scene, [item])
+    command.redo()
+    assert command.cost() == 0
+    command.undo()
+    assert command.cost() == item.memory_usage()
+
+
+def test_resample_images_cost_and_spill(qapp):
+    item = BeePixmapItem(QtGui.QImage(
+        100, 50, QtGui.QImage.Format.Format_RGB32))
+    data = utils.image_to_bytes(item.image())
+    command = commands.ResampleImages(
+        [item],
+        [(QtGui.QImage(40, 20, QtGui.QImage.Format.Format_RGB32), None)],
+        [data])
+    command.redo()
+    assert command.cost() == len(data)
+    spill = SpillFile()
+    command.spill(spill)
+    assert command.cost() == 0
+    command.undo()
+    assert item.image().size() == QtCore.QSize(100, 50)
+    assert item.source_bytes == data
+    spill.close()
+
+
+def test_bake_crops_cost_and_spill(qapp):
+    img = QtGui.QImage(10, 20, QtGui.QImage.Format.Format_RGB32)
+    item = BeePixmapItem(img)
+    item.crop = QtCore.QRectF(2, 4, 5, 6)
+    data = utils.image_to_bytes(img)
+    command = commands.BakeCrops(
+        [item], [(img.copy(item.bake_crop_rect()), None)], [data])
+    command.redo()
+    assert command.cost() == len(data)
+    spill = SpillFile()
+    command.spill(spill)
+    assert command.cost() == 0
+    command.undo()
+    assert item.image().size() == QtCore.QSize(10, 20)
+    spill.close()
+
+
+def test_undo_stack_reads_budget_from_settings(settings):
+    settings.setValue('Memory/undo_budget_mb', 3)
+    stack = commands.BeeUndoStack()
+    assert stack.budget == 3 * 2**20
+
+
+def make_spillable_item():
+    img = QtGui.QImage(5, 5, QtGui.QImage.Format.Format_RGB32)
+    img.fill(QtGui.QColor(10, 20, 30))
+    item = BeePixmapItem(img)
+    item.source_bytes = utils.image_to_bytes(img)
+    return item
+
+
+def test_undo_stack_spills_commands_furthest_away_first(view):
+    stack = commands.BeeUndoStack(budget=250)
+    cmds = []
+    for i in range(3):
+        item = make_spillable_item()
+        view.scene.addItem(item)
+        cmd = commands.DeleteItems(view.scene, [item])
+        cmds.append(cmd)
+        stack.push(cmd)
+    cost = cmds[2].items[0].memory_usage()
+    assert 125 < cost < 250
+    assert cmds[0].cost() == 0
+    assert cmds[1].cost() == 0
+    assert cmds[2].cost() == cost
+    assert stack.memory_usage() == cost
+    stack.undo()
+    assert cmds[2].cost() == 0
+    assert stack.memory_usage() == 0
+
+
+def test_undo_stack_spills_commands_in_macros(view):
+    stack = commands.BeeUndoStack(budget=250)
+    cmds = []
+    stack.beginMacro('Delete')
+    for i in range(3):
+        item = make_spillable_item()
+        view.scene.addItem(item)
+        cmd = commands.DeleteItems(view.scene, [item])
+        cmds.append(cmd)
+        stack.push(cmd)
+    stack.endMacro()
+    cost = cmds[2].items[0].memory_usage()
+    assert 125 < cost < 250
+    assert stack.count() == 1
+    assert cmds[0].cost() == 0
+    assert cmds[1].cost() == 0
+    assert cmds[2].cost() == cost
+    assert stack.memory_usage() == cost
+    stack.undo()
+    assert stack.memory_usage() == 0
+    assert len(view.scene.items()) == 3
+
+
+def test_undo_stack_only_recomputes_costs_of_changed_commands(view):
+    stack = commands.BeeUndoStack(budget=10000)
+    cmds = []
+    for i in range(3):
+        item = make_spillable_item()
+        view.scene.addItem(item)
+        cmd = commands.DeleteItems(view.scene, [item])
+        cmds.append(cmd)
+        stack.push(cmd)
+    total = stack.memory_usage()
+    assert total == sum(cmd.cost() for cmd in cmds)
+    with patch.object(cmds[0], 'cost') as cost0_mock, \
+            patch.object(cmds[1], 'cost') as cost1_mock:
+        stack.undo()
+        cost0_mock.assert_not_called()
+        cost1_mock.assert_not_called()
+    assert stack.memory_usage() == total - cmds[2].items[0].memory_usage()
+    stack.redo()
+    assert stack.memory_usage() == total
+
+
+def test_undo_stack_forgets_costs_of_dropped_commands(view):
+    stack = commands.BeeUndoStack(budget=10000)
+    item = make_spillable_item()
+    view.scene.addItem(item)
+    cmd = commands.DeleteItems(view.scene, [item])
+    stack.push(cmd)
+    stack.undo()
+    cmd.cost = MagicMock(return_value=1000)
+    stack.redo()
+    assert stack.memory_usage() == 1000
+    stack.undo()
+    stack.push(commands.InsertItems(view.scene, [BeeTextItem('foo')]))
+    assert stack.count() == 1
+    assert stack.memory_usage() == 0
+    assert cmd not in stack.costs
+
+
+def test_undo_stack_forgets_costs_of_commands_beyond_undo_limit(view):
+    stack = commands.BeeUndoStack(budget=10000)
+    stack.setUndoLimit(2)
+    cmds = []
+    for i in range(3):
+        item = make_spillable_item()
+        view.scene.addItem(item)
+        cmd = commands.DeleteItems(view.scene, [item])
+        cmds.append(cmd)
+        stack.push(cmd)
+    assert stack.count() == 2
+    assert stack.memory_usage() == cmds[1].cost() + cmds[2].cost()
+    assert cmds[0] not in stack.costs
+
+
+def test_undo_stack_clear_resets_costs(view):
+    stack = commands.BeeUndoStack(budget=10000)
+    item = make_spillable_item()
+    view.scene.addItem(item)
+    stack.push(commands.DeleteItems(view.scene, [item]))
+    assert stack.memory_usage() > 0
+    stack.clear()
+    assert stack.memory_usage() == 0
+    assert stack.costs == {}
+
+
+def test_undo_stack_when_within_budget(view):
+    stack = commands.BeeUndoStack(budget=10000)
+    item = BeePixmapItem(QtGui.QImage(5, 5, QtGui.QImage.Format.Format_RGB32))
+    view.scene.addItem(item)
+    cmd = commands.DeleteItems(view.scene, [item])
+    with patch.object(cmd, 'spill') as spill_mock:
+        stack.push(cmd)
+        spill_mock.assert_not_called()
+    assert stack.memory_usage() == item.memory_usage()
+
+
+def test_undo_stack_discard_most_recent(view):
+    stack = commands.BeeUndoStack()
+    item = BeeTextItem('foo')
+    cmd = commands.InsertItems(view.scene, [item])
+    stack.push(cmd)
+    view.scene.removeItem(item)
+    stack.discard(cmd)
+    assert stack.count() == 0
+    assert stack.canRedo() is False
+
+
+def test_undo_stack_discard_older(view):
+    stack = commands.BeeUndoStack()
+    item1 = BeeTextItem('foo')
+    cmd = commands.InsertItems(view.scene, [item1])
+    stack.push(cmd)
+    item2 = BeeTextItem('bar')
+    stack.push(commands.InsertItems(view.scene, [item2]))
+    view.scene.removeItem(item1)
+    stack.discard(cmd)
+    assert stack.count() == 2
+    stack.undo()
+    stack.undo()
+    assert stack.count() == 1
+    assert view.scene.items() == []
+
+
 def test_reset_transforms(qapp):
     item1 = BeePixmapItem(QtGui.QImage())
     item1.setScale(2)
@@ -0,0 +1,89 @@
+import math
+
+from pytest import approx
+
+from PyQt6 import QtCore, QtGui
+
+from beeref.geometry import ItemGeometry
+from beeref.items import BeePixmapItem, BeeTextItem
+
+
+def make_geometry(rects):
+    items = [BeePixmapItem(QtGui.QImage()) for rect in rects]
+    return ItemGeometry(items, [QtCore.QRectF(*rect) for rect in rects])
+
+
+def test_columns(qapp):
+    item1 = BeePixmapItem(QtGui.QImage())
+    item1.setPos(10, 20)
+    item1.setZValue(0.3)
+    item1.setScale(2)
+    item1.setRotation(45)
+    item2 = BeeTextItem('foo')
+    item2.do_flip()
+    geometry = ItemGeometry([item1, item2])
+    assert len(geometry) == 2
+    assert list(geometry.x) == [10, item2.pos().x()]
+    assert list(geometry.y) == [20, item2.pos().y()]
+    assert list(geometry.z) == approx([0.3, 0])
+    assert list(geometry.scale) == [2, 1]
+    assert list(geometry.rotation) == [45, 0]
+    assert list(geometry.flip) == [1, -1]
+    assert not hasattr(geometry, 'left')
+
+
+def test_transform_rows(qapp):
+    item = BeePixmapItem(QtGui.QImage())
+    item.setPos(10, 20)
+    item.setScale(2)
+    geometry = ItemGeometry([item])
+    assert list(geometry.transform_rows()) == [(10, 20, 0, 2, 0, 1)]
+
+
+def test_bounds_columns(qapp):
+    geometry = make_geometry([(1, 2, 3, 4), (5, 6, 7, 8)])
+    assert list(geometry.left) == [1, 5]
+    assert list(geometry.top) == [2, 6]
+    assert list(geometry.width) == [3, 7]
+    assert list(geometry.height) == [4, 8]
+
+
+def test_bounding_rect(qapp):
+    geometry = make_geometry([(0, 0, 10, 10), (-5, 5, 10, 20)])
+    assert geometry.bounding_rect() == QtCore.QRectF(-5, 0, 15, 25)
+
+
+def test_bounding_rect_when_empty(qapp):
+    assert ItemGeometry([], []).bounding_rect() == QtCore.QRectF()
+
+
+def test_normalize_factors_width(qapp):
+    geometry = make_geometry([(0, 0, 10, 5), (0, 0, 30, 5)])
+    assert geometry.normalize_factors('width') == [2, 2/3]
+
+
+def test_normalize_factors_height(qapp):
+    geometry = make_geometry([(0, 0, 10, 10), (0, 0, 30, 30)])
+    assert geometry.normalize_factors('height') == [2, 2/3]
+
+
+def test_normalize_factors_size(qapp):
+    geometry = make_geometry([(0, 0, 10, 10), (0, 0, 20, 20)])
+    avg = (100 + 400) / 2
+    assert geometry.normalize_factors('size') == approx(
+        [math.sqrt(avg / 100), math.sqrt(avg / 400)])
+
+
+def test_arrange_positions_horizontal(qapp):
+    geometry = make_geometry([(50, 0, 20, 10), (0, 0, 10, 30)])
+    items, positions = geometry.arrange_positions(QtCore.QPointF(100, 100))
+    assert items == [geometry.items[1], geometry.items[0]]
+    assert positions == [QtCore.QPointF(85, 85), QtCore.QPointF(95, 95)]
+
+
+def test_arrange_positions_vertical(qapp):
+    geometry = make_geometry([(0, 50, 10, 20), (0, 0, 30, 10)])
+    items, positions = geometry.arrange_positions(
+        QtCore.QPointF(100, 100), vertical=True)
+    assert items == [geometry.items[1], geometry.items[0]]
+    assert positions == [QtCore.QPointF(85, 85), QtCore.QPointF(95, 95)]
@@ -33,7 +33,9 @@ def test_main(args_mock, app_mock, qapp):
     app_mock.return_value = qapp
     args_mock.return_value.filename = None
     args_mock.return_value.loglevel = 'WARN'
-    with patch.object(qapp, 'exec') as exec_mock:
+    with patch.object(qapp, 'exec') as exec_mock, \
+            patch('beeref.tiles.set_allocation_limit') as limit_mock:
         main()
         args_mock.assert_called_once_with(with_check=True)
         exec_mock.assert_called_once_with()
+        limit_mock.assert_called_once_with()
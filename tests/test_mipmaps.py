@@ -0,0 +1,105 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from PyQt6 import QtCore, QtGui
+
+from beeref.items import BeePixmapItem
+from beeref import mipmaps
+from beeref import utils
+
+
+@pytest.mark.parametrize('scale,expected',
+                         [(2, 0),
+                          (1, 0),
+                          (0.6, 0),
+                          (0.5, 1),
+                          (0.3, 1),
+                          (0.25, 2),
+                          (0.01, 5),
+                          (0, 0)])
+def test_level_for_scale(scale, expected):
+    assert mipmaps.level_for_scale(scale, QtCore.QSize(256, 512)) == expected
+
+
+def test_level_for_scale_when_small_image():
+    assert mipmaps.level_for_scale(0.1, QtCore.QSize(20, 100)) == 1
+    assert mipmaps.level_for_scale(0.1, QtCore.QSize(5, 100)) == 0
+
+
+def test_level_size():
+    size = QtCore.QSize(100, 3)
+    assert mipmaps.level_size(size, 1) == QtCore.QSize(50, 1)
+    assert mipmaps.level_size(size, 2) == QtCore.QSize(25, 1)
+
+
+def make_item(width=64, height=32):
+    img = QtGui.QImage(width, height, QtGui.QImage.Format.Format_RGB32)
+    img.fill(QtGui.QColor(200, 100, 50))
+    return BeePixmapItem(img)
+
+
+def test_mipmap_generates_levels(qapp, qtbot):
+    item = make_item()
+    level, img = item.mipmap(2)
+    assert level == 0
+    assert img.size() == QtCore.QSize(64, 32)
+    qtbot.waitUntil(lambda: 2 in item._mipmaps)
+    assert item._mipmaps[1].size() == QtCore.QSize(32, 16)
+    assert item._mipmaps[2].size() == QtCore.QSize(16, 8)
+    level, img = item.mipmap(2)
+    assert level == 2
+    assert img.size() == QtCore.QSize(16, 8)
+    assert mipmaps.get_mipmap_generator().requests == {}
+
+
+def test_mipmap_returns_nearest_ready_level(qapp, qtbot):
+    item = make_item()
+    item.mipmap(1)
+    qtbot.waitUntil(lambda: 1 in item._mipmaps)
+    level, img = item.mipmap(2)
+    assert level == 1
+    qtbot.waitUntil(lambda: 2 in item._mipmaps)
+
+
+def test_mipmap_discarded_when_image_changed(qapp, qtbot):
+    item = make_item()
+    item.mipmap(1)
+    item.set_image(QtGui.QImage(8, 8, QtGui.QImage.Format.Format_RGB32))
+    qtbot.waitUntil(lambda: mipmaps.get_mipmap_generator().requests == {})
+    assert item._mipmaps == {}
+
+
+def test_draw_image_uses_mipmap(qapp, qtbot):
+    item = make_item()
+    item.crop = QtCore.QRectF(8, 4, 32, 16)
+    painter = MagicMock()
+    painter.worldTransform.return_value = QtGui.QTransform.fromScale(
+        0.5, 0.5)
+    item.draw_image(painter, None)
+    painter.drawImage.assert_called_once_with(
+        item.crop, item.image(), item.crop)
+    qtbot.waitUntil(lambda: 1 in item._mipmaps)
+    painter.reset_mock()
+    item.draw_image(painter, None)
+    painter.drawImage.assert_called_once_with(
+        item.crop, item._mipmaps[1], QtCore.QRectF(4, 2, 16, 8))
+
+
+def test_draw_image_when_zoomed_in(qapp):
+    item = make_item()
+    painter = MagicMock()
+    painter.worldTransform.return_value = QtGui.QTransform.fromScale(2, 2)
+    item.draw_image(painter, None)
+    painter.drawImage.assert_called_once_with(
+        item.crop, item.image(), item.crop)
+    assert item._mipmaps_requested == 0
+
+
+def test_demote_pixmap_drops_mipmaps(qapp, qtbot):
+    item = make_item()
+    item.source_bytes = utils.image_to_bytes(item.image())
+    item.mipmap(1)
+    qtbot.waitUntil(lambda: 1 in item._mipmaps)
+    item.demote_pixmap()
+    assert item._mipmaps == {}
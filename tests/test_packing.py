@@ -0,0 +1,102 @@
+from unittest.mock import MagicMock, patch
+
+import rpack
+
+from beeref import packing
+
+
+SIZES = [(30, 20), (10, 40), (25, 25), (40, 10), (15, 15), (20, 30)]
+
+
+def test_bbox_size():
+    assert packing.bbox_size(
+        [(10, 20), (30, 5)], [(0, 0), (10, 3)]) == (40, 20)
+
+
+def test_bbox_size_when_empty():
+    assert packing.bbox_size([], []) == (0, 0)
+
+
+def test_pack_rows_keeps_order_and_justifies():
+    positions = packing.pack_rows([(10, 5), (20, 8), (10, 5), (5, 5)], 40)
+    assert positions == [(0, 0), (10, 0), (30, 0), (0, 8)]
+
+
+def test_pack_rows_justifies_rows():
+    positions = packing.pack_rows([(10, 5), (10, 5), (30, 5)], 25)
+    assert positions == [(0, 0), (15, 0), (0, 5)]
+
+
+def test_pack_shelves_sorts_by_height():
+    positions = packing.pack_shelves([(10, 5), (20, 8), (10, 5), (5, 5)], 30)
+    assert positions == [(20, 0), (0, 0), (0, 8), (10, 8)]
+
+
+def test_pack_skyline_fills_gaps():
+    positions = packing.pack_skyline([(20, 20), (10, 10), (10, 10)], 30)
+    assert positions == [(0, 0), (20, 0), (20, 10)]
+
+
+def test_strategies_pack_without_overlap():
+    for strategy in (packing.pack_rows, packing.pack_shelves,
+                     packing.pack_skyline, packing.pack_rpack):
+        positions = strategy(SIZES, 50)
+        assert len(positions) == len(SIZES)
+        assert rpack.overlapping(SIZES, positions) is None
+
+
+def test_strategies_aborted():
+    for strategy in (packing.pack_rows, packing.pack_shelves,
+                     packing.pack_skyline):
+        assert strategy(SIZES, 50, lambda: False) is None
+
+
+def test_pack_rpack_aborted_when_impossible():
+    assert packing.pack_rpack(SIZES, 10, lambda: False) is None
+
+
+def test_strategies_depend_on_count():
+    assert packing.pack_rpack in packing.strategies(10)
+    assert packing.pack_rpack not in packing.strategies(1000)
+    assert packing.pack_skyline in packing.strategies(1000)
+    assert packing.strategies(10000) == [
+        packing.pack_rows, packing.pack_shelves]
+
+
+def test_pack_when_empty():
+    assert packing.pack([]) == []
+
+
+def test_pack_finds_compact_result():
+    sizes = [(100, 80)] * 4
+    positions = packing.pack(sizes)
+    assert packing.bbox_size(sizes, positions) == (200, 160)
+
+
+def test_pack_when_canceled_returns_first_result():
+    with patch('beeref.packing.pack_shelves') as shelves_mock:
+        positions = packing.pack(SIZES, canceled=lambda: True)
+    shelves_mock.assert_not_called()
+    assert rpack.overlapping(SIZES, positions) is None
+
+
+def test_pack_when_out_of_time_returns_first_result():
+    with patch('beeref.packing.pack_shelves') as shelves_mock:
+        positions = packing.pack(SIZES, budget=0)
+    shelves_mock.assert_not_called()
+    assert rpack.overlapping(SIZES, positions) is None
+
+
+def test_pack_job():
+    job = {'sizes': [(100, 80)] * 4, 'budget': 1}
+    worker = MagicMock(canceled=False)
+    packing.pack_job(job, worker)
+    assert packing.bbox_size(job['sizes'], job['positions']) == (200, 160)
+    worker.begin_processing.emit.assert_called_once_with(0)
+    worker.finished.emit.assert_called_once_with('', [])
+
+
+def test_pack_job_without_worker():
+    job = {'sizes': [(100, 80)] * 2, 'budget': 1}
+    packing.pack_job(job)
+    assert len(job['positions']) == 2
@@ -0,0 +1,201 @@
+import threading
+from unittest.mock import patch
+
+from PyQt6 import QtCore, QtGui
+
+from beeref.items import BeePixmapItem
+from beeref.pixelcache import LRUTier, PixelCache, SpilledData, SpillFile
+
+
+class Thing:
+    pass
+
+
+def test_lru_tier_add():
+    tier = LRUTier(100)
+    thing = Thing()
+    tier.add(thing, 30)
+    tier.add(thing, 40)
+    assert len(tier) == 1
+    assert thing in tier
+    assert tier.size == 40
+
+
+def test_lru_tier_pop_oldest():
+    tier = LRUTier(100)
+    things = [Thing(), Thing(), Thing()]
+    for thing in things:
+        tier.add(thing, 10)
+    tier.touch(things[0])
+    assert tier.pop_oldest() is things[1]
+    assert tier.pop_oldest(keep=things[2]) is things[0]
+    assert tier.pop_oldest(keep=things[2]) is None
+    assert tier.size == 10
+
+
+def test_lru_tier_over_budget():
+    tier = LRUTier(100)
+    things = [Thing(), Thing()]
+    tier.add(things[0], 100)
+    assert tier.over_budget() is False
+    tier.add(things[1], 1)
+    assert tier.over_budget() is True
+
+
+def test_lru_tier_forgets_deleted_items():
+    tier = LRUTier(100)
+    thing = Thing()
+    tier.add(thing, 30)
+    del thing
+    assert len(tier) == 0
+    assert tier.size == 0
+
+
+def test_spill_file_write_and_read():
+    spill = SpillFile()
+    assert spill.write(b'foo') == (0, 3)
+    assert spill.read(0, 3) == b'foo'
+    assert spill.write(b'barbaz') == (3, 6)
+    assert spill.read(3, 6) == b'barbaz'
+    assert spill.read(0, 3) == b'foo'
+    spill.close()
+
+
+def test_spilled_data():
+    spill = SpillFile()
+    spill.write(b'foo')
+    data = SpilledData(spill, b'barbaz')
+    assert len(data) == 6
+    assert data.read() == b'barbaz'
+    spill.close()
+
+
+def test_pixel_cache_get_spill_file():
+    cache = PixelCache(pixmap_budget=1, encoded_budget=1)
+    assert cache.spill_file is None
+    spill = cache.get_spill_file()
+    assert isinstance(spill, SpillFile)
+    assert cache.get_spill_file() is spill
+
+
+def test_pixel_cache_reads_budget_from_settings(settings):
+    settings.setValue('Memory/pixmap_budget_mb', 3)
+    settings.setValue('Memory/encoded_budget_mb', 2)
+    cache = PixelCache()
+    assert cache.pixmaps.budget == 3 * 2**20
+    assert cache.encoded.budget == 2 * 2**20
+
+
+def make_item(data):
+    item = BeePixmapItem(QtGui.QImage())
+    item.pixmap_from_bytes(data)
+    return item
+
+
+def test_pixel_cache_demotes_least_recently_used(qapp, imgdata3x3):
+    cache = PixelCache(pixmap_budget=80, encoded_budget=10000)
+    with patch('beeref.items.get_pixel_cache', return_value=cache):
+        item1 = make_item(imgdata3x3)
+        item2 = make_item(imgdata3x3)
+        assert item1._image is not None
+        assert item2._image is not None
+        item1.pixmap()
+        item3 = make_item(imgdata3x3)
+        assert item1._image is not None
+        assert item2._image is None
+        assert item3._image is not None
+        assert item2.source_bytes.startswith(b'\x89PNG')
+        assert cache.pixmaps.size == 72
+
+
+def test_pixel_cache_defers_items_from_worker_threads(qapp, imgdata3x3):
+    cache = PixelCache(pixmap_budget=40, encoded_budget=10000)
+    with patch('beeref.items.get_pixel_cache', return_value=cache):
+        item1 = make_item(imgdata3x3)
+        items = []
+        thread = threading.Thread(target=lambda: items.append(
+            make_item(imgdata3x3)))
+        thread.start()
+        thread.join()
+        item2 = items[0]
+        assert item1._image is not None
+        assert item2 not in cache.pixmaps
+        assert len(cache.pending) == 1
+
+        cache.register_pending()
+        assert cache.pending == {}
+        assert item1._image is None
+        assert item2._image is not None
+        assert item2 in cache.pixmaps
+
+
+def test_pixel_cache_register_pending_skips_deleted_items(
+        qapp, imgfilename3x3):
+    cache = PixelCache(pixmap_budget=40, encoded_budget=10000)
+    cache.pending[1] = lambda: None
+    cache.register_pending()
+    assert cache.pending == {}
+    assert len(cache.pixmaps) == 0
+
+
+def test_pixel_cache_restores_demoted_pixmap(
+        qapp, imgfilename3x3, imgdata3x3):
+    cache = PixelCache(pixmap_budget=40, encoded_budget=10000)
+    with patch('beeref.items.get_pixel_cache', return_value=cache):
+        item1 = make_item(imgdata3x3)
+        item2 = make_item(imgdata3x3)
+        assert item1._image is None
+        pixmap = item1.pixmap()
+        assert pixmap.size() == QtCore.QSize(3, 3)
+        assert pixmap.toImage().pixelColor(0, 0) == QtGui.QColor(
+            QtGui.QImage(imgfilename3x3).pixelColor(0, 0))
+        assert item2._image is None
+
+
+def test_pixel_cache_skips_items_without_encoded_data(
+        qapp, imgfilename3x3, imgdata3x3):
+    cache = PixelCache(pixmap_budget=80, encoded_budget=10000)
+    with patch('beeref.items.get_pixel_cache', return_value=cache):
+        item1 = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+        item2 = make_item(imgdata3x3)
+        make_item(imgdata3x3)
+        assert item1._image is not None
+        assert item1 in cache.pixmaps
+        assert item2._image is None
+
+
+def test_pixel_cache_keeps_pixmap_in_crop_mode(qapp, imgfilename3x3):
+    cache = PixelCache(pixmap_budget=40, encoded_budget=10000)
+    with patch('beeref.items.get_pixel_cache', return_value=cache):
+        item1 = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+        item1.crop_mode = True
+        BeePixmapItem(QtGui.QImage(imgfilename3x3))
+        assert item1._image is not None
+
+
+def test_pixel_cache_spills_encoded_data(qapp, imgfilename3x3, imgdata3x3):
+    cache = PixelCache(pixmap_budget=10000,
+                       encoded_budget=len(imgdata3x3) + 1)
+    with patch('beeref.items.get_pixel_cache', return_value=cache):
+        item1 = BeePixmapItem(QtGui.QImage())
+        item1.pixmap_from_bytes(imgdata3x3)
+        item2 = BeePixmapItem(QtGui.QImage())
+        item2.pixmap_from_bytes(imgdata3x3)
+        assert item1._source_bytes is None
+        assert item1._spilled[0] is cache.spill_file
+        assert item1.source_bytes == imgdata3x3
+        assert item1.pixmap_to_bytes() == imgdata3x3
+        assert item2._source_bytes == imgdata3x3
+        assert cache.encoded.size == len(imgdata3x3)
+
+
+def test_pixel_cache_restores_from_spill_file(qapp, imgdata3x3):
+    cache = PixelCache(pixmap_budget=40, encoded_budget=1)
+    with patch('beeref.items.get_pixel_cache', return_value=cache):
+        item1 = BeePixmapItem(QtGui.QImage())
+        item1.pixmap_from_bytes(imgdata3x3)
+        item2 = BeePixmapItem(QtGui.QImage())
+        item2.pixmap_from_bytes(imgdata3x3)
+        assert item1._image is None
+        assert item1._source_bytes is None
+        assert item1.pixmap().size() == QtCore.QSize(3, 3)
@@ -17,6 +17,265 @@ def test_add_remove_item(view, item):
     assert view.scene.items() == []
 
 
+def test_set_render_cache(view, item):
+    view.scene.addItem(item)
+    view.scene.set_render_cache(True)
+    assert view.scene.render_cache is True
+    assert item.cacheMode() == (
+        QtWidgets.QGraphicsItem.CacheMode.DeviceCoordinateCache)
+    view.scene.set_render_cache(False)
+    assert view.scene.render_cache is False
+    assert item.cacheMode() == QtWidgets.QGraphicsItem.CacheMode.NoCache
+
+
+def make_opaque_item(width, height):
+    img = QtGui.QImage(width, height, QtGui.QImage.Format.Format_RGB32)
+    img.fill(QtGui.QColor(255, 0, 0))
+    return BeePixmapItem(img)
+
+
+def test_is_occluded_when_covered(view):
+    below = make_opaque_item(10, 10)
+    below.setPos(5, 5)
+    view.scene.addItem(below)
+    above = make_opaque_item(20, 20)
+    above.setZValue(1)
+    view.scene.addItem(above)
+    assert view.scene.is_occluded(below) is True
+    assert view.scene.is_occluded(above) is False
+
+
+def test_is_occluded_when_partly_covered(view):
+    below = make_opaque_item(10, 10)
+    below.setPos(15, 15)
+    view.scene.addItem(below)
+    above = make_opaque_item(20, 20)
+    above.setZValue(1)
+    view.scene.addItem(above)
+    assert view.scene.is_occluded(below) is False
+
+
+def test_is_occluded_when_covering_item_is_below(view):
+    below = make_opaque_item(10, 10)
+    below.setPos(5, 5)
+    below.setZValue(1)
+    view.scene.addItem(below)
+    above = make_opaque_item(20, 20)
+    view.scene.addItem(above)
+    assert view.scene.is_occluded(below) is False
+
+
+def test_is_occluded_when_covering_item_is_transparent(view):
+    below = make_opaque_item(10, 10)
+    below.setPos(5, 5)
+    view.scene.addItem(below)
+    img = QtGui.QImage(20, 20, QtGui.QImage.Format.Format_ARGB32)
+    img.fill(QtGui.QColor(255, 0, 0, 100))
+    above = BeePixmapItem(img)
+    above.setZValue(1)
+    view.scene.addItem(above)
+    assert view.scene.is_occluded(below) is False
+
+
+def test_is_occluded_when_covering_item_is_rotated(view):
+    below = make_opaque_item(2, 2)
+    below.setPos(5, 5)
+    view.scene.addItem(below)
+    above = make_opaque_item(20, 20)
+    above.setRotation(30)
+    above.setZValue(1)
+    view.scene.addItem(above)
+    assert view.scene.is_occluded(below) is False
+
+
+def test_is_occluded_without_occluders_skips_query(view):
+    img = QtGui.QImage(10, 10, QtGui.QImage.Format.Format_ARGB32)
+    img.fill(QtGui.QColor(255, 0, 0, 100))
+    item = BeePixmapItem(img)
+    view.scene.addItem(item)
+    assert view.scene.occluders == {}
+    with patch.object(view.scene, 'items') as items_mock:
+        assert view.scene.is_occluded(item) is False
+        items_mock.assert_not_called()
+
+
+def test_update_occluder_tracks_opaque_items(view):
+    item = make_opaque_item(10, 10)
+    view.scene.addItem(item)
+    assert view.scene.occluders == {item: (QtCore.QRectF(0, 0, 10, 10), 0)}
+    item.setPos(5, 5)
+    item.setZValue(2)
+    assert view.scene.occluders == {item: (QtCore.QRectF(5, 5, 10, 10), 2)}
+    item.setRotation(30)
+    assert view.scene.occluders == {}
+    item.setRotation(0)
+    view.scene.removeItem(item)
+    assert view.scene.occluders == {}
+
+
+def test_update_occluder_resets_items_below(view):
+    below = make_opaque_item(10, 10)
+    view.scene.addItem(below)
+    far = make_opaque_item(10, 10)
+    far.setPos(100, 100)
+    view.scene.addItem(far)
+    above = make_opaque_item(20, 20)
+    above.setPos(-50, -50)
+    above.setZValue(1)
+    view.scene.addItem(above)
+    assert below.is_occluded() is False
+    assert far.is_occluded() is False
+    below.reset_occlusion = MagicMock(wraps=below.reset_occlusion)
+    far.reset_occlusion = MagicMock()
+    above.setPos(-5, -5)
+    below.reset_occlusion.assert_called()
+    far.reset_occlusion.assert_not_called()
+    assert below.is_occluded() is True
+
+
+def test_update_occluder_during_bulk_mutation(view):
+    serial = view.scene.occlusion_serial
+    with view.scene.bulk_mutation(1):
+        view.scene.addItem(make_opaque_item(10, 10))
+    assert view.scene.occlusion_serial > serial
+    assert len(view.scene.occluders) == 1
+
+
+def test_clear_forgets_occluders(view):
+    view.scene.addItem(make_opaque_item(10, 10))
+    serial = view.scene.occlusion_serial
+    view.scene.clear()
+    assert view.scene.occluders == {}
+    assert view.scene.occlusion_serial > serial
+
+
+def test_selected_user_items_is_cached(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    assert view.scene.selected_user_items() == [item]
+    with patch('PyQt6.QtWidgets.QGraphicsScene.selectedItems') as sel_mock:
+        assert view.scene.has_selection() is True
+        assert view.scene.has_single_selection() is True
+        assert view.scene.has_multi_selection() is False
+        assert view.scene.selectedItems(user_only=True) == [item]
+        sel_mock.assert_not_called()
+
+
+def test_selected_user_items_excludes_ui_items(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    view.scene.addItem(view.scene.rubberband_item)
+    view.scene.rubberband_item.setFlag(
+        QtWidgets.QGraphicsItem.GraphicsItemFlag.ItemIsSelectable)
+    view.scene.rubberband_item.setSelected(True)
+    assert view.scene.selected_user_items() == [item]
+
+
+def test_selection_cache_follows_item_selection(view, item):
+    view.scene.addItem(item)
+    assert view.scene.has_selection() is False
+    item.setSelected(True)
+    assert view.scene.has_selection() is True
+    item.setSelected(False)
+    assert view.scene.has_selection() is False
+
+
+def test_selection_cache_when_selection_cleared_without_signal(view):
+    item1 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item1)
+    item2 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item2)
+    item1.setSelected(True)
+    assert view.scene.selected_user_items() == [item1]
+    view.scene.blockSignals(True)
+    view.scene.clearSelection()
+    view.scene.blockSignals(False)
+    assert view.scene.has_selection() is False
+
+
+def test_selection_cache_when_selected_item_removed(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    assert view.scene.has_selection() is True
+    view.scene.removeItem(item)
+    assert view.scene.has_selection() is False
+
+
+def test_interaction_active_when_moving(view):
+    view.scene.move_active = True
+    assert view.scene.interaction_active() is True
+
+
+def test_interaction_active_when_transforming_item(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    item.rotate_active = True
+    assert view.scene.interaction_active() is True
+
+
+def test_interaction_active_when_transforming_multi_selection(view):
+    view.scene.multi_select_item.scale_active = True
+    assert view.scene.interaction_active() is True
+
+
+def test_interaction_active_doesnt_query_selected_items(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    view.scene.selected_user_items()
+    with patch('PyQt6.QtWidgets.QGraphicsScene.selectedItems') \
+            as selected_mock:
+        assert view.scene.interaction_active() is False
+        selected_mock.assert_not_called()
+
+
+def test_interaction_active_when_idle(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    assert view.scene.interaction_active() is False
+
+
+def start_rotate_with_grab(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    item.grabMouse()
+    item.rotate_active = True
+    item.rotate_orig_degrees = 0
+    item.event_anchor = QtCore.QPointF(0, 0)
+    item.setRotation(30)
+
+
+def test_cancel_gesture_when_rotating(view, item):
+    start_rotate_with_grab(view, item)
+    assert view.scene.cancel_gesture() is True
+    assert view.scene.mouseGrabberItem() is None
+    assert item.rotate_active is False
+    assert item.rotation() == 0
+
+
+def test_cancel_gesture_when_no_gesture(view, item):
+    view.scene.addItem(item)
+    item.grabMouse()
+    assert view.scene.cancel_gesture() is False
+    assert view.scene.mouseGrabberItem() is item
+
+
+def test_key_press_event_escape_cancels_gesture(view, item):
+    start_rotate_with_grab(view, item)
+    event = QtGui.QKeyEvent(QtCore.QEvent.Type.KeyPress,
+                            Qt.Key.Key_Escape,
+                            Qt.KeyboardModifier.NoModifier)
+    view.scene.keyPressEvent(event)
+    assert event.isAccepted() is True
+    assert item.rotation() == 0
+
+
+def test_focus_out_event_cancels_gesture(view, item):
+    start_rotate_with_grab(view, item)
+    view.scene.focusOutEvent(QtGui.QFocusEvent(QtCore.QEvent.Type.FocusOut))
+    assert item.rotate_active is False
+    assert item.rotation() == 0
+
+
 def test_cancel_crop_mode_when_crop(view, item):
     view.scene.crop_item = item
     item.exit_crop_mode = MagicMock()
@@ -43,6 +302,18 @@ def test_copy_selection_to_internal_clipboard(view):
     assert set(view.scene.items_for_save()) == {item1, item2, item3}
 
 
+def test_copy_selection_to_internal_clipboard_skips_placeholders(view):
+    item1 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item1)
+    item1.setSelected(True)
+    item2 = BeePixmapItem.create_placeholder(QtCore.QSize(3, 3))
+    view.scene.addItem(item2)
+    item2.setSelected(True)
+
+    view.scene.copy_selection_to_internal_clipboard()
+    assert view.scene.internal_clipboard == [item1]
+
+
 def test_paste_from_internal_clipboard(view):
     item1 = BeePixmapItem(QtGui.QImage())
     view.scene.addItem(item1)
@@ -101,6 +372,24 @@ def test_lower_to_bottom(view):
     view.scene.cancel_crop_mode.assert_called_once_with()
 
 
+def test_item_geometry(view):
+    item1 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item1)
+    item1.setPos(10, 20)
+    item2 = BeePixmapItem(QtGui.QImage())
+    with patch.object(item1, 'bounding_rect_unselected',
+                      return_value=QtCore.QRectF(0, 0, 100, 80)):
+        with patch.object(item2, 'bounding_rect_unselected',
+                          return_value=QtCore.QRectF(0, 0, 30, 40)):
+            view.scene.mark_bounds_dirty(item1)
+            geometry = view.scene.item_geometry([item1, item2])
+    assert list(geometry.x) == [10, 0]
+    assert list(geometry.left) == [10, 0]
+    assert list(geometry.top) == [20, 0]
+    assert list(geometry.width) == [100, 30]
+    assert list(geometry.height) == [80, 40]
+
+
 def test_normalize_height(view):
     item1 = BeePixmapItem(QtGui.QImage())
     view.scene.addItem(item1)
@@ -115,6 +404,8 @@ def test_normalize_height(view):
                       return_value=QtCore.QRectF(0, 0, 100, 80)):
         with patch.object(item2, 'bounding_rect_unselected',
                           return_value=QtCore.QRectF(0, 0, 100, 80)):
+            view.scene.mark_bounds_dirty(item1)
+            view.scene.mark_bounds_dirty(item2)
             view.scene.normalize_height()
 
     assert item1.scale() == 2
@@ -138,6 +429,8 @@ def test_normalize_height_with_rotation(view):
                       return_value=QtCore.QRectF(0, 0, 100, 200)):
         with patch.object(item2, 'bounding_rect_unselected',
                           return_value=QtCore.QRectF(0, 0, 100, 200)):
+            view.scene.mark_bounds_dirty(item1)
+            view.scene.mark_bounds_dirty(item2)
             view.scene.normalize_height()
 
     assert item1.scale() == 0.75
@@ -165,6 +458,8 @@ def test_normalize_width(view):
                       return_value=QtCore.QRectF(0, 0, 80, 100)):
         with patch.object(item2, 'bounding_rect_unselected',
                           return_value=QtCore.QRectF(0, 0, 80, 100)):
+            view.scene.mark_bounds_dirty(item1)
+            view.scene.mark_bounds_dirty(item2)
             view.scene.normalize_width()
 
     assert item1.scale() == 2
@@ -188,6 +483,8 @@ def test_normalize_width_with_rotation(view):
                       return_value=QtCore.QRectF(0, 0, 200, 100)):
         with patch.object(item2, 'bounding_rect_unselected',
                           return_value=QtCore.QRectF(0, 0, 200, 100)):
+            view.scene.mark_bounds_dirty(item1)
+            view.scene.mark_bounds_dirty(item2)
             view.scene.normalize_height()
 
     assert item1.scale() == 1.5
@@ -215,6 +512,8 @@ def test_normalize_size(view):
                       return_value=QtCore.QRectF(0, 0, 100, 100)):
         with patch.object(item2, 'bounding_rect_unselected',
                           return_value=QtCore.QRectF(0, 0, 100, 100)):
+            view.scene.mark_bounds_dirty(item1)
+            view.scene.mark_bounds_dirty(item2)
             view.scene.normalize_size()
 
     assert item1.scale() == approx(math.sqrt(2.5))
@@ -236,6 +535,8 @@ def test_normalize_size_with_rotation(view):
                       return_value=QtCore.QRectF(0, 0, 100, 200)):
         with patch.object(item2, 'bounding_rect_unselected',
                           return_value=QtCore.QRectF(0, 0, 100, 200)):
+            view.scene.mark_bounds_dirty(item1)
+            view.scene.mark_bounds_dirty(item2)
             view.scene.normalize_size()
 
     assert item1.scale() == 1
@@ -264,6 +565,8 @@ def test_arrange_horizontal(view):
                       return_value=QtCore.QRectF(0, 0, 100, 80)):
         with patch.object(item2, 'bounding_rect_unselected',
                           return_value=QtCore.QRectF(0, 0, 100, 80)):
+            view.scene.mark_bounds_dirty(item1)
+            view.scene.mark_bounds_dirty(item2)
             view.scene.arrange()
 
     assert item2.pos() == QtCore.QPointF(-50, -30)
@@ -286,6 +589,8 @@ def test_arrange_vertical(view):
                       return_value=QtCore.QRectF(0, 0, 100, 80)):
         with patch.object(item2, 'bounding_rect_unselected',
                           return_value=QtCore.QRectF(0, 0, 100, 80)):
+            view.scene.mark_bounds_dirty(item1)
+            view.scene.mark_bounds_dirty(item2)
             view.scene.arrange(vertical=True)
 
     assert item1.pos() == QtCore.QPointF(0, -70)
@@ -310,6 +615,8 @@ def test_arrange_when_rotated(view):
                       return_value=QtCore.QRectF(0, 0, 100, 80)):
         with patch.object(item2, 'bounding_rect_unselected',
                           return_value=QtCore.QRectF(0, 0, 100, 80)):
+            view.scene.mark_bounds_dirty(item1)
+            view.scene.mark_bounds_dirty(item2)
             view.scene.arrange()
 
     assert item2.pos() == QtCore.QPointF(-40, -30)
@@ -365,6 +672,47 @@ def test_arrange_optimal_when_no_items(view):
     view.scene.cancel_crop_mode.assert_called_once_with()
 
 
+def test_arrange_optimal_job(view, settings):
+    settings.setValue('Items/arrange_optimal_budget_s', 0.5)
+    for i in range(2):
+        item = BeePixmapItem(QtGui.QImage())
+        view.scene.addItem(item)
+        item.setSelected(True)
+        item.crop = QtCore.QRectF(0, 0, 100, 80)
+    job = view.scene.arrange_optimal_job()
+    assert set(job['items']) == set(view.scene.selectedItems(user_only=True))
+    assert job['sizes'] == [(100, 80), (100, 80)]
+    assert job['center'] == QtCore.QPointF(50, 40)
+    assert job['budget'] == 0.5
+
+
+def test_arrange_optimal_job_when_one_item(view, item):
+    view.scene.addItem(item)
+    item.setSelected(True)
+    assert view.scene.arrange_optimal_job() is None
+
+
+def test_finish_arrange_optimal_skips_removed_items(view):
+    item1 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item1)
+    item2 = BeePixmapItem(QtGui.QImage())
+    job = {'items': [item1, item2],
+           'sizes': [(10, 10), (10, 10)],
+           'positions': [(0, 0), (10, 0)],
+           'center': QtCore.QPointF(100, 100)}
+    view.scene.finish_arrange_optimal(job)
+    assert item1.pos() == QtCore.QPointF(90, 95)
+    assert item2.pos() == QtCore.QPointF(0, 0)
+    assert view.scene.undo_stack.count() == 1
+
+
+def test_finish_arrange_optimal_without_positions(view, item):
+    view.scene.addItem(item)
+    job = {'items': [item], 'sizes': [(10, 10)], 'positions': None}
+    view.scene.finish_arrange_optimal(job)
+    assert view.scene.undo_stack.count() == 0
+
+
 def test_flip_items(view, item):
     view.scene.addItem(item)
     item.setSelected(True)
@@ -446,6 +794,118 @@ def test_set_selected_all_items_when_true(view):
     view.scene.cancel_crop_mode.assert_called_once_with()
 
 
+def test_set_selected_all_items_emits_selection_changed_in_bulk(view):
+    for i in range(5):
+        view.scene.addItem(BeePixmapItem(QtGui.QImage()))
+    handler = MagicMock()
+    view.scene.selectionChanged.connect(handler)
+    view.scene.set_selected_all_items(True)
+    # Once for the items, once for the multi select outline
+    assert handler.call_count == 2
+    assert len(view.scene.selected_user_items()) == 5
+
+
+def test_select_items(view):
+    item1 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item1)
+    item1.setSelected(True)
+    item2 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item2)
+    item3 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item3)
+    handler = MagicMock()
+    view.scene.selectionChanged.connect(handler)
+    view.scene.select_items([item2, item3])
+    # Once for the items, once for the multi select outline
+    assert handler.call_count == 2
+    assert set(view.scene.selected_user_items()) == {item1, item2, item3}
+    assert view.scene.bulk_selection_active is False
+
+
+def test_select_items_clear(view):
+    item1 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item1)
+    item1.setSelected(True)
+    item2 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item2)
+    view.scene.select_items([item2], clear=True)
+    assert item1.isSelected() is False
+    assert item2.isSelected() is True
+
+
+def test_select_items_brings_first_item_to_front(view):
+    item1 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item1)
+    item1.bring_to_front = MagicMock()
+    item2 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item2)
+    item2.bring_to_front = MagicMock()
+    view.scene.select_items([item1, item2])
+    item1.bring_to_front.assert_called_once_with()
+    item2.bring_to_front.assert_not_called()
+
+
+def test_select_items_when_selection_doesnt_bring_to_front(view):
+    item1 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item1)
+    item1.setSelected(True)
+    item2 = BeePixmapItem(QtGui.QImage())
+    view.scene.addItem(item2)
+    item2.bring_to_front = MagicMock()
+    view.scene.select_items([item2])
+    item2.bring_to_front.assert_not_called()
+
+
+def test_bulk_selection_nested(view):
+    handler = MagicMock()
+    view.scene.selectionChanged.connect(handler)
+    with view.scene.bulk_selection():
+        with view.scene.bulk_selection():
+            view.scene.addItem(BeePixmapItem(QtGui.QImage()))
+        assert view.scene.bulk_selection_active is True
+        assert view.scene.signalsBlocked() is True
+    handler.assert_called_once_with()
+    assert view.scene.bulk_selection_active is False
+    assert view.scene.signalsBlocked() is False
+
+
+def test_bulk_mutation_switches_off_index_for_many_items(view):
+    bsp = QtWidgets.QGraphicsScene.ItemIndexMethod.BspTreeIndex
+    with view.scene.bulk_mutation(1000):
+        assert view.scene.itemIndexMethod() == (
+            QtWidgets.QGraphicsScene.ItemIndexMethod.NoIndex)
+        assert view.scene.bulk_mutation_active is True
+        assert view.scene.bulk_selection_active is True
+        item = BeePixmapItem(
+            QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32))
+        view.scene.addItem(item)
+    assert view.scene.itemIndexMethod() == bsp
+    assert view.scene.bulk_mutation_active is False
+    assert view.scene.bulk_selection_active is False
+    assert view.scene.items(QtCore.QRectF(0, 0, 5, 5)) == [item]
+
+
+def test_bulk_mutation_keeps_index_for_few_items(view):
+    bsp = QtWidgets.QGraphicsScene.ItemIndexMethod.BspTreeIndex
+    with view.scene.bulk_mutation(2):
+        assert view.scene.itemIndexMethod() == bsp
+        assert view.scene.bulk_mutation_active is True
+    assert view.scene.bulk_mutation_active is False
+
+
+def test_bulk_mutation_nested(view):
+    handler = MagicMock()
+    view.scene.selectionChanged.connect(handler)
+    with view.scene.bulk_mutation(1000):
+        with view.scene.bulk_mutation(1000):
+            view.scene.addItem(BeePixmapItem(QtGui.QImage()))
+        assert view.scene.bulk_mutation_active is True
+        assert view.scene.signalsBlocked() is True
+    handler.assert_called_once_with()
+    assert view.scene.bulk_mutation_active is False
+    assert view.scene.signalsBlocked() is False
+
+
 def test_set_selected_all_items_when_false(view):
     item1 = BeePixmapItem(QtGui.QImage())
     view.scene.addItem(item1)
@@ -1037,6 +1497,8 @@ def test_items_bounding_rect_given_items(view):
                       return_value=QtCore.QRectF(0, 0, 100, 100)):
         with patch.object(item2, 'bounding_rect_unselected',
                           return_value=QtCore.QRectF(0, 0, 100, 100)):
+            view.scene.mark_bounds_dirty(item1)
+            view.scene.mark_bounds_dirty(item2)
             rect = view.scene.itemsBoundingRect(items=[item1, item2])
 
     assert rect.topLeft().x() == -33
@@ -1045,6 +1507,65 @@ def test_items_bounding_rect_given_items(view):
     assert rect.bottomRight().y() == 122
 
 
+def test_items_bounding_rect_follows_item_changes(view):
+    img = QtGui.QImage(10, 20, QtGui.QImage.Format.Format_RGB32)
+    item1 = BeePixmapItem(img)
+    view.scene.addItem(item1)
+    item2 = BeePixmapItem(img)
+    view.scene.addItem(item2)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 10, 20)
+    item2.setPos(100, 50)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 110, 70)
+    item2.setScale(2)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 120, 90)
+    item2.crop = QtCore.QRectF(0, 0, 5, 5)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 110, 60)
+    view.scene.removeItem(item2)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 10, 20)
+
+
+def test_items_bounding_rect_follows_selection(view):
+    img = QtGui.QImage(10, 20, QtGui.QImage.Format.Format_RGB32)
+    item1 = BeePixmapItem(img)
+    view.scene.addItem(item1)
+    item2 = BeePixmapItem(img)
+    item2.setPos(100, 50)
+    view.scene.addItem(item2)
+    assert view.scene.itemsBoundingRect(selection_only=True) == (
+        QtCore.QRectF(0, 0, 0, 0))
+    item2.setSelected(True)
+    assert view.scene.itemsBoundingRect(selection_only=True) == (
+        QtCore.QRectF(100, 50, 10, 20))
+    item1.setSelected(True)
+    item2.setSelected(False)
+    assert view.scene.itemsBoundingRect(selection_only=True) == (
+        QtCore.QRectF(0, 0, 10, 20))
+
+
+def test_clear_resets_bounds(view):
+    img = QtGui.QImage(10, 20, QtGui.QImage.Format.Format_RGB32)
+    item = BeePixmapItem(img)
+    view.scene.addItem(item)
+    item.setSelected(True)
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 10, 20)
+    assert view.scene.has_selection() is True
+    item.setPos(5, 5)
+    view.scene.clear()
+    assert view.scene.bounds_dirty == set()
+    assert view.scene.itemsBoundingRect() == QtCore.QRectF(0, 0, 0, 0)
+    assert view.scene.itemsBoundingRect(selection_only=True) == (
+        QtCore.QRectF(0, 0, 0, 0))
+    assert view.scene.has_selection() is False
+
+
+def test_items_bounding_rect_follows_text_changes(view):
+    item = BeeTextItem('foo')
+    view.scene.addItem(item)
+    width = view.scene.itemsBoundingRect().width()
+    item.setPlainText('foo bar baz')
+    assert view.scene.itemsBoundingRect().width() > width
+
+
 def test_items_bounding_rect_two_items_selection_only(view):
     item1 = BeePixmapItem(QtGui.QImage())
     view.scene.addItem(item1)
@@ -1063,6 +1584,8 @@ def test_items_bounding_rect_two_items_selection_only(view):
                       return_value=QtCore.QRectF(0, 0, 100, 100)):
         with patch.object(item2, 'bounding_rect_unselected',
                           return_value=QtCore.QRectF(0, 0, 100, 100)):
+            view.scene.mark_bounds_dirty(item1)
+            view.scene.mark_bounds_dirty(item2)
             rect = view.scene.itemsBoundingRect(selection_only=True)
 
     assert rect.topLeft().x() == -33
@@ -1197,6 +1720,13 @@ def test_on_change_when_no_multi_select(view):
     view.scene.multi_select_item.fit_selection_area.assert_not_called()
 
 
+def test_add_queued_items_registers_pending(view):
+    with patch('beeref.scene.get_pixel_cache') as cache_mock:
+        view.scene.add_item_later({'type': 'text', 'data': {'text': 'foo'}})
+        view.scene.add_queued_items()
+    cache_mock.return_value.register_pending.assert_called_once_with()
+
+
 def test_add_queued_items_unselected(view):
     data = {'type': 'text', 'z': 0.33, 'data': {'text': 'foo'}}
     view.scene.add_item_later(data, selected=False)
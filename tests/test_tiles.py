@@ -0,0 +1,141 @@
+import os.path
+from unittest.mock import call, patch
+
+from PyQt6 import QtCore, QtGui
+
+from beeref import tiles
+from beeref.tiles import TileCache, TileStore
+
+
+def make_image_file(tmpdir, width, height, fmt='PNG'):
+    img = QtGui.QImage(width, height, QtGui.QImage.Format.Format_RGB32)
+    img.fill(QtGui.QColor(0, 0, 255))
+    for x in range(width):
+        img.setPixelColor(x, 0, QtGui.QColor(255, 0, 0))
+    path = os.path.join(tmpdir, f'big.{fmt.lower()}')
+    img.save(path, fmt)
+    return path
+
+
+def test_tile_store_levels():
+    assert TileStore(QtCore.QSize(512, 100), 512).levels == 1
+    assert TileStore(QtCore.QSize(513, 100), 512).levels == 2
+    assert TileStore(QtCore.QSize(100, 4000), 512).levels == 4
+
+
+def test_tile_store_grid():
+    store = TileStore(QtCore.QSize(100, 50), 16)
+    assert store.grid(0) == (7, 4)
+    assert store.grid(1) == (4, 2)
+    assert store.grid(store.levels - 1) == (1, 1)
+
+
+def test_tile_store_tile_rect():
+    store = TileStore(QtCore.QSize(100, 50), 16)
+    assert store.tile_rect(0, 0, 0) == QtCore.QRect(0, 0, 16, 16)
+    assert store.tile_rect(0, 6, 3) == QtCore.QRect(96, 48, 4, 2)
+    assert store.tile_rect(1, 3, 1) == QtCore.QRect(48, 16, 2, 9)
+
+
+def test_tile_store_put_and_get():
+    store = TileStore(QtCore.QSize(100, 50), 16)
+    store.put(0, 1, 2, b'foo')
+    store.put(1, 0, 0, b'bar')
+    assert store.get(0, 1, 2) == b'foo'
+    assert store.get(1, 0, 0) == b'bar'
+    assert store.get(0, 0, 0) is None
+    assert list(store) == [(0, 1, 2, b'foo'), (1, 0, 0, b'bar')]
+    assert len(store) == 2
+
+
+def test_tile_image_file(qapp, tmpdir):
+    path = make_image_file(tmpdir, 40, 20)
+    store = tiles.tile_image_file(path, tile_size=16)
+    assert store.size == QtCore.QSize(40, 20)
+    assert store.levels == 3
+    assert len(store) == 3 * 2 + 2 * 1 + 1
+    tile = store.decode(0, 2, 1)
+    assert tile.size() == QtCore.QSize(8, 4)
+    assert tile.pixelColor(0, 0) == QtGui.QColor(0, 0, 255)
+    top = store.decode(2, 0, 0)
+    assert top.size() == QtCore.QSize(10, 5)
+
+
+def test_tile_image_file_in_bands(qapp, tmpdir):
+    path = make_image_file(tmpdir, 40, 50, 'JPG')
+    band_mb = 2 * 40 * 16 * 4 / 2**20
+    with patch('PyQt6.QtGui.QImageReader.setClipRect') as clip_mock:
+        store = tiles.tile_image_file(path, tile_size=16, band_mb=band_mb)
+        clip_mock.assert_has_calls([
+            call(QtCore.QRect(0, 0, 40, 32)),
+            call(QtCore.QRect(0, 32, 40, 18))])
+    assert store.size == QtCore.QSize(40, 50)
+
+
+def test_tile_image_file_in_bands_tiles(qapp, tmpdir):
+    path = make_image_file(tmpdir, 40, 50, 'JPG')
+    band_mb = 2 * 40 * 16 * 4 / 2**20
+    store = tiles.tile_image_file(path, tile_size=16, band_mb=band_mb)
+    assert store.decode(0, 0, 0).size() == QtCore.QSize(16, 16)
+    assert store.decode(0, 0, 2).size() == QtCore.QSize(16, 16)
+    assert store.decode(0, 0, 3).size() == QtCore.QSize(16, 2)
+    assert store.decode(0, 0, 0).pixelColor(0, 0).red() > 100
+    assert store.decode(0, 0, 2).pixelColor(0, 0).blue() > 200
+
+
+def test_tile_image_file_reads_small_image_in_one_go(qapp, tmpdir):
+    path = make_image_file(tmpdir, 40, 50, 'JPG')
+    with patch('PyQt6.QtGui.QImageReader.setClipRect') as clip_mock:
+        store = tiles.tile_image_file(path, tile_size=16)
+        clip_mock.assert_not_called()
+    assert store.decode(0, 0, 3).size() == QtCore.QSize(16, 2)
+
+
+def test_tile_image_file_keeps_jpeg_quality(qapp, tmpdir):
+    path = make_image_file(tmpdir, 40, 20, 'JPG')
+    with patch('beeref.utils.image_to_bytes',
+               return_value=b'foo') as encode_mock:
+        tiles.tile_image_file(path, tile_size=16)
+        for args in encode_mock.call_args_list:
+            assert args[0][1:] == ('JPG', tiles.JPEG_QUALITY)
+
+
+def test_set_allocation_limit(settings):
+    limit = QtGui.QImageReader.allocationLimit()
+    settings.setValue('Items/image_allocation_limit_mb', 1000)
+    try:
+        tiles.set_allocation_limit()
+        assert QtGui.QImageReader.allocationLimit() == 1000
+    finally:
+        QtGui.QImageReader.setAllocationLimit(limit)
+
+
+def test_tile_image_file_when_invalid(qapp, tmpdir):
+    path = os.path.join(tmpdir, 'foo.png')
+    with open(path, 'w') as f:
+        f.write('foo')
+    assert tiles.tile_image_file(path) is None
+
+
+def test_is_large_image(qapp, tmpdir, settings):
+    path = make_image_file(tmpdir, 40, 20)
+    assert tiles.is_large_image(path) is False
+    settings.setValue('Items/tiled_threshold_mp', 0)
+    assert tiles.is_large_image(path) is True
+
+
+def test_is_large_image_when_invalid(qapp, tmpdir):
+    assert tiles.is_large_image(os.path.join(tmpdir, 'foo.png')) is False
+
+
+def test_tile_cache_evicts_least_recently_used(qapp, tmpdir):
+    path = make_image_file(tmpdir, 32, 16)
+    store = tiles.tile_image_file(path, tile_size=16)
+    tile_bytes = store.decode(0, 0, 0).sizeInBytes()
+    cache = TileCache(budget=2 * tile_bytes)
+    first = cache.get(store, 0, 0, 0)
+    cache.get(store, 0, 1, 0)
+    assert cache.get(store, 0, 0, 0) is first
+    cache.get(store, 1, 0, 0)
+    assert list(cache.tiles.keys()) == [
+        (store.id, 0, 0, 0), (store.id, 1, 0, 0)]
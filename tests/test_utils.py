@@ -63,3 +63,66 @@ def test_get_rect_from_points_given_topright_bottomleft():
                           (3.1, 0.5, 3.0)])
 def test_round_to(number, base, expected):
     assert utils.round_to(number, base) == expected
+
+
+def test_is_opaque_without_alpha_channel(qapp):
+    img = QtGui.QImage(5, 5, QtGui.QImage.Format.Format_RGB32)
+    assert utils.is_opaque(img) is True
+
+
+def test_is_opaque_with_opaque_alpha_channel(qapp):
+    img = QtGui.QImage(5, 5, QtGui.QImage.Format.Format_ARGB32)
+    img.fill(QtGui.QColor(10, 20, 30, 255))
+    assert utils.is_opaque(img) is True
+
+
+def test_is_opaque_with_transparent_pixel(qapp):
+    img = QtGui.QImage(5, 5, QtGui.QImage.Format.Format_ARGB32)
+    img.fill(QtGui.QColor(10, 20, 30, 255))
+    img.setPixelColor(4, 4, QtGui.QColor(10, 20, 30, 254))
+    assert utils.is_opaque(img) is False
+
+
+def test_optimize_pixel_format_with_alpha(qapp):
+    img = QtGui.QImage(10, 10, QtGui.QImage.Format.Format_ARGB32)
+    img.fill(QtGui.QColor(10, 20, 30, 100))
+    assert utils.optimize_pixel_format(img).format() == (
+        QtGui.QImage.Format.Format_ARGB32_Premultiplied)
+
+
+def test_optimize_pixel_format_without_alpha(qapp):
+    img = QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32)
+    img.fill(QtGui.QColor(10, 20, 30))
+    assert utils.optimize_pixel_format(img).format() == (
+        QtGui.QImage.Format.Format_RGB888)
+
+
+@pytest.mark.parametrize(
+    'fmt,color,expected',
+    [('Format_RGB32', (10, 20, 30, 255), 'Format_RGB888'),
+     ('Format_ARGB32', (10, 20, 30, 255), 'Format_RGB888'),
+     ('Format_RGB32', (20, 20, 20, 255), 'Format_Grayscale8'),
+     ('Format_ARGB32', (20, 20, 20, 255), 'Format_Grayscale8'),
+     ('Format_ARGB32', (10, 20, 30, 100), 'Format_ARGB32_Premultiplied'),
+     ('Format_ARGB32', (20, 20, 20, 100), 'Format_ARGB32_Premultiplied'),
+     ('Format_Grayscale8', (20, 20, 20, 255), 'Format_Grayscale8'),
+     ('Format_Grayscale16', (20, 20, 20, 255), 'Format_Grayscale16'),
+     ('Format_RGB888', (10, 20, 30, 255), 'Format_RGB888')])
+def test_optimize_pixel_format(fmt, color, expected, qapp):
+    img = QtGui.QImage(5, 5, getattr(QtGui.QImage.Format, fmt))
+    img.fill(QtGui.QColor(*color))
+    result = utils.optimize_pixel_format(img)
+    assert result.format() == getattr(QtGui.QImage.Format, expected)
+    assert result.pixelColor(2, 2).red() == img.pixelColor(2, 2).red()
+
+
+def test_optimize_pixel_format_keeps_indexed(qapp):
+    img = QtGui.QImage(5, 5, QtGui.QImage.Format.Format_Indexed8)
+    img.setColorTable([QtGui.QColor(10, 20, 30).rgb()])
+    img.fill(0)
+    result = utils.optimize_pixel_format(img)
+    assert result.format() == QtGui.QImage.Format.Format_Indexed8
+
+
+def test_optimize_pixel_format_when_null(qapp):
+    assert utils.optimize_pixel_format(QtGui.QImage()).isNull()
@@ -3,9 +3,12 @@ import shutil
 import sqlite3
 from unittest.mock import MagicMock, patch, mock_open
 
+from pytest import approx
+
 from PyQt6 import QtCore, QtGui, QtWidgets
 from PyQt6.QtCore import Qt
 
+from beeref import commands
 from beeref.config import logfile_name
 from beeref.items import BeePixmapItem, BeeTextItem
 from beeref.view import BeeGraphicsView
@@ -149,9 +152,11 @@ def test_fit_rect_toggle_when_previous(center_mock, fit_mock, view):
 
 
 @patch('beeref.view.BeeGraphicsView.clear_scene')
-def test_open_from_file(clear_mock, view, qtbot):
+def test_open_from_file(clear_mock, view, qtbot, tmpdir):
+    # Opening migrates older files in place, so work on a copy
     root = os.path.dirname(__file__)
-    filename = os.path.join(root, 'assets', 'test1item.bee')
+    filename = os.path.join(tmpdir, 'test1item.bee')
+    shutil.copyfile(os.path.join(root, 'assets', 'test1item.bee'), filename)
     view.on_loading_finished = MagicMock()
     view.open_from_file(filename)
     view.worker.wait()
@@ -175,11 +180,12 @@ def test_open_from_file_when_error(view, qtbot):
 
 
 @patch('PyQt6.QtWidgets.QFileDialog.getOpenFileName')
-def test_on_action_open(dialog_mock, view, qtbot):
+def test_on_action_open(dialog_mock, view, qtbot, tmpdir):
     # FIXME: #1
     # Can't check signal handling currently
     root = os.path.dirname(__file__)
-    filename = os.path.join(root, 'assets', 'test1item.bee')
+    filename = os.path.join(tmpdir, 'test1item.bee')
+    shutil.copyfile(os.path.join(root, 'assets', 'test1item.bee'), filename)
     dialog_mock.return_value = (filename, None)
     view.on_loading_finished = MagicMock()
     view.scene.cancel_crop_mode = MagicMock()
@@ -362,6 +368,235 @@ def test_on_action_insert_images_when_error(
     view.scene.cancel_crop_mode.assert_called_once_with()
 
 
+@patch('beeref.fileio.load_images_from_archives')
+@patch('beeref.fileio.load_images')
+def test_do_insert_images_when_archives(
+        load_mock, load_archives_mock, view, qtbot):
+    view.on_insert_images_finished = MagicMock()
+    load_archives_mock.side_effect = (
+        lambda *args, worker: worker.finished.emit('', []))
+    view.do_insert_images(['foo.zip', 'bar.tar.gz'])
+    qtbot.waitUntil(lambda: view.on_insert_images_finished.called is True)
+    load_archives_mock.assert_called_once()
+    assert load_archives_mock.call_args[0][0] == ['foo.zip', 'bar.tar.gz']
+    load_mock.assert_not_called()
+
+
+@patch('beeref.fileio.load_images_from_archives')
+@patch('beeref.fileio.load_images')
+def test_do_insert_images_when_mixed_with_archives(
+        load_mock, load_archives_mock, view, qtbot):
+    view.on_insert_images_finished = MagicMock()
+    load_mock.side_effect = (
+        lambda *args, worker: worker.finished.emit('', []))
+    view.do_insert_images(['foo.zip', 'bar.png'])
+    qtbot.waitUntil(lambda: view.on_insert_images_finished.called is True)
+    load_mock.assert_called_once()
+    load_archives_mock.assert_not_called()
+
+
+def test_link_folder(view, tmpdir, imgfilename3x3, qtbot):
+    filename = os.path.join(tmpdir, 'a.png')
+    shutil.copy(imgfilename3x3, filename)
+    item = BeePixmapItem(QtGui.QImage(imgfilename3x3), filename)
+    view.scene.addItem(item)
+    with patch('beeref.view.BeeGraphicsView.start_folder_sync') as sync_mock:
+        view.link_folder(str(tmpdir))
+        assert view.folder_watcher.path == tmpdir
+        assert filename in view.folder_watcher.known
+        assert view.bee_actions['unlink_folder'].isEnabled() is True
+        view.unlink_folder()
+        assert view.folder_watcher is None
+        assert view.bee_actions['unlink_folder'].isEnabled() is False
+        sync_mock.assert_not_called()
+
+
+def test_clear_scene_unlinks_folder(view, tmpdir):
+    view.link_folder(str(tmpdir))
+    view.clear_scene()
+    assert view.folder_watcher is None
+
+
+def test_folder_sync_inserts_new_and_updates_existing(
+        view, tmpdir, imgfilename3x3, qtbot):
+    existing = os.path.join(tmpdir, 'a.png')
+    new = os.path.join(tmpdir, 'b.png')
+    item = BeePixmapItem(QtGui.QImage(), existing)
+    view.scene.addItem(item)
+    view.link_folder(str(tmpdir))
+    shutil.copy(imgfilename3x3, existing)
+    shutil.copy(imgfilename3x3, new)
+    view.on_linked_files_ready([existing, new])
+    qtbot.waitUntil(lambda: view.folder_sync_worker is None)
+    assert item.pixmap().size() == QtCore.QSize(3, 3)
+    assert len(list(view.scene.items_for_save())) == 2
+    new_item = [i for i in view.scene.items_for_save() if i is not item][0]
+    assert new_item.filename == new
+    assert new_item.isSelected() is True
+    assert view.undo_stack.count() == 2
+    assert view.undo_stack.isClean() is False
+    view.undo_stack.undo()
+    view.undo_stack.undo()
+    assert item.pixmap().isNull() is True
+    view.unlink_folder()
+
+
+def test_folder_sync_starts_pending_sync_when_thread_finished(
+        view, tmpdir, imgfilename3x3, qtbot):
+    view.link_folder(str(tmpdir))
+    worker = MagicMock()
+    view.folder_sync_worker = worker
+    view.on_linked_files_ready([imgfilename3x3])
+    assert view.folder_sync_pending == [imgfilename3x3]
+    with patch('beeref.view.BeeGraphicsView.start_folder_sync') as sync_mock:
+        view.on_folder_sync_thread_finished(worker)
+        sync_mock.assert_called_once_with()
+    assert view.folder_sync_worker is None
+    view.unlink_folder()
+
+
+def test_folder_sync_when_unlinked(view, tmpdir, imgfilename3x3, qtbot):
+    view.link_folder(str(tmpdir))
+    view.on_linked_files_ready([imgfilename3x3])
+    view.unlink_folder()
+    qtbot.waitUntil(lambda: view.folder_sync_worker is None)
+    assert view.scene.items() == []
+
+
+def test_on_action_arrange_optimal(view):
+    for i in range(2):
+        item = BeePixmapItem(QtGui.QImage())
+        view.scene.addItem(item)
+        item.setSelected(True)
+        item.crop = QtCore.QRectF(0, 0, 100, 80)
+    view.on_action_arrange_optimal()
+    assert view.arrange_worker is None
+    assert view.undo_stack.count() == 1
+
+
+def test_arrange_optimal_calls_callback_when_no_items(view):
+    callback = MagicMock()
+    view.arrange_optimal(callback=callback)
+    callback.assert_called_once_with()
+    assert view.undo_stack.count() == 0
+
+
+@patch('beeref.view.ARRANGE_IN_BACKGROUND_THRESHOLD', 2)
+def test_arrange_optimal_in_background(view, qtbot):
+    for i in range(4):
+        item = BeePixmapItem(QtGui.QImage())
+        view.scene.addItem(item)
+        item.setSelected(True)
+        item.crop = QtCore.QRectF(0, 0, 100, 80)
+    callback = MagicMock()
+    view.arrange_optimal(callback=callback)
+    assert view.arrange_worker
+    qtbot.waitUntil(lambda: callback.called is True)
+    callback.assert_called_once_with()
+    assert view.undo_stack.count() == 1
+    expected_positions = {(-50, -40), (50, -40), (-50, 40), (50, 40)}
+    actual_positions = {
+        (i.pos().x(), i.pos().y())
+        for i in view.scene.selectedItems(user_only=True)}
+    assert expected_positions == actual_positions
+
+
+def test_on_insert_images_finished_ends_macro(view):
+    view.undo_stack.beginMacro('Insert Images')
+    view.on_action_fit_scene = MagicMock()
+    view.on_insert_images_finished(True, '', [])
+    assert view.undo_stack.count() == 1
+    assert view.undo_stack.index() == 1
+    view.on_action_fit_scene.assert_called_once_with()
+
+
+def test_on_action_bake_crop(view, qtbot, imgfilename3x3):
+    item1 = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item1.crop = QtCore.QRectF(1, 1, 2, 2)
+    view.scene.addItem(item1)
+    item1.setSelected(True)
+    item2 = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item2.crop = QtCore.QRectF(1, 1, 2, 2)
+    view.scene.addItem(item2)
+    view.on_action_bake_crop()
+    qtbot.waitUntil(lambda: view.undo_stack.count() == 1)
+    assert item1.image().size() == QtCore.QSize(2, 2)
+    assert item2.image().size() == QtCore.QSize(3, 3)
+    assert view.undo_stack.count() == 1
+
+
+def test_on_action_bake_all_crops(view, qtbot, imgfilename3x3):
+    item1 = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item1.crop = QtCore.QRectF(1, 1, 2, 2)
+    view.scene.addItem(item1)
+    item2 = BeePixmapItem(QtGui.QImage(imgfilename3x3))
+    item2.crop = QtCore.QRectF(0, 0, 1, 2)
+    view.scene.addItem(item2)
+    view.on_action_bake_all_crops()
+    qtbot.waitUntil(lambda: view.undo_stack.count() == 1)
+    assert item1.image().size() == QtCore.QSize(2, 2)
+    assert item2.image().size() == QtCore.QSize(1, 2)
+    assert view.undo_stack.count() == 1
+
+
+@patch('PyQt6.QtWidgets.QInputDialog.getDouble', return_value=(2, True))
+def test_on_action_optimize_resolution(dialog_mock, view, qtbot, settings):
+    item1 = BeePixmapItem(QtGui.QImage(
+        100, 50, QtGui.QImage.Format.Format_RGB32))
+    item1.setScale(0.2)
+    view.scene.addItem(item1)
+    item2 = BeePixmapItem(QtGui.QImage(
+        100, 50, QtGui.QImage.Format.Format_RGB32))
+    view.scene.addItem(item2)
+    view.scene.addItem(BeeTextItem('foo'))
+    view.on_action_optimize_resolution()
+    qtbot.waitUntil(lambda: view.undo_stack.count() == 1)
+    assert item1.image().size() == QtCore.QSize(40, 20)
+    assert item1.scale() == 0.5
+    assert item1.source_bytes.startswith(b'\x89PNG')
+    assert item2.image().size() == QtCore.QSize(100, 50)
+    assert settings.value('Items/oversampling', type=float) == 2
+
+
+@patch('PyQt6.QtWidgets.QInputDialog.getDouble', return_value=(2, False))
+def test_on_action_optimize_resolution_when_canceled(dialog_mock, view):
+    item = BeePixmapItem(QtGui.QImage(
+        100, 50, QtGui.QImage.Format.Format_RGB32))
+    item.setScale(0.2)
+    view.scene.addItem(item)
+    view.on_action_optimize_resolution()
+    assert item.image().size() == QtCore.QSize(100, 50)
+    assert view.undo_stack.count() == 0
+
+
+def test_on_action_bake_all_crops_when_nothing_cropped(
+        view, imgfilename3x3):
+    view.scene.addItem(BeePixmapItem(QtGui.QImage(imgfilename3x3)))
+    view.scene.addItem(BeeTextItem('foo'))
+    with patch('beeref.fileio.ThreadedIO') as worker_mock:
+        view.on_action_bake_all_crops()
+        worker_mock.assert_not_called()
+    assert view.undo_stack.count() == 0
+
+
+def test_on_bake_crops_finished_when_worker_canceled(view):
+    item = BeePixmapItem(QtGui.QImage(
+        10, 20, QtGui.QImage.Format.Format_RGB32))
+    jobs = [{'item': item, 'result': QtGui.QImage(
+        5, 6, QtGui.QImage.Format.Format_RGB32)}]
+    view.on_bake_crops_finished(jobs, MagicMock(canceled=True), '', [])
+    assert view.undo_stack.count() == 0
+
+
+def test_on_resample_finished_when_worker_canceled(view):
+    item = BeePixmapItem(QtGui.QImage(
+        100, 50, QtGui.QImage.Format.Format_RGB32))
+    jobs = [{'item': item, 'result': QtGui.QImage(
+        40, 20, QtGui.QImage.Format.Format_RGB32)}]
+    view.on_resample_finished(jobs, MagicMock(canceled=True), '', [])
+    assert view.undo_stack.count() == 0
+
+
 @patch('beeref.scene.BeeGraphicsScene.clearSelection')
 def test_on_action_insert_text(clear_mock, view):
     view.scene.cancel_crop_mode = MagicMock()
@@ -420,6 +655,25 @@ def test_on_action_paste_external_new_scene(
     view.scene.cancel_crop_mode.assert_called_once_with()
 
 
+@patch('beeref.view.BeeGraphicsView.on_action_fit_scene')
+@patch('PyQt6.QtGui.QClipboard.mimeData')
+def test_on_action_paste_external_encoded(
+        mimedata_mock, fit_mock, view, imgdata3x3, qtbot):
+    mimedata = QtCore.QMimeData()
+    mimedata.setData('image/png', imgdata3x3)
+    mimedata_mock.return_value = mimedata
+    view.on_action_paste()
+    assert len(view.scene.items()) == 1
+    item = view.scene.items()[0]
+    assert item.isSelected() is True
+    assert item.width == 3
+    qtbot.waitUntil(lambda: item.is_placeholder is False)
+    assert item.pixmap().size() == QtCore.QSize(3, 3)
+    assert item.source_bytes == imgdata3x3
+    qtbot.waitUntil(lambda: view.image_data_workers == [])
+    fit_mock.assert_called_once_with()
+
+
 @patch('beeref.view.BeeGraphicsView.on_action_fit_scene')
 @patch('beeref.scene.BeeGraphicsScene.clearSelection')
 @patch('PyQt6.QtGui.QClipboard.image')
@@ -514,6 +768,159 @@ def test_on_action_always_on_top_unchecked(
     create_mock.assert_called_once()
 
 
+def test_smooth_rendering_enabled_by_default(view):
+    assert view.smooth_rendering is True
+    assert view.renderHints() & QtGui.QPainter.RenderHint.Antialiasing
+    assert (view.renderHints()
+            & QtGui.QPainter.RenderHint.SmoothPixmapTransform)
+
+
+def test_on_action_smooth_rendering_unchecked(view):
+    view.begin_fast_rendering()
+    view.on_action_smooth_rendering(False)
+    assert view.smooth_rendering is False
+    assert view.smooth_rendering_timer.isActive() is False
+    assert not view.renderHints() & QtGui.QPainter.RenderHint.Antialiasing
+
+
+def test_begin_fast_rendering(view):
+    view.begin_fast_rendering()
+    assert not view.renderHints() & QtGui.QPainter.RenderHint.Antialiasing
+    assert view.smooth_rendering_timer.isActive() is True
+    view.smooth_rendering_timer.stop()
+    view.on_smooth_rendering_timeout()
+    assert view.renderHints() & QtGui.QPainter.RenderHint.Antialiasing
+
+
+def test_begin_fast_rendering_when_smooth_rendering_off(view):
+    view.on_action_smooth_rendering(False)
+    view.begin_fast_rendering()
+    assert view.smooth_rendering_timer.isActive() is False
+
+
+def test_on_smooth_rendering_timeout_when_smooth_rendering_off(view):
+    view.on_action_smooth_rendering(False)
+    view.on_smooth_rendering_timeout()
+    assert not view.renderHints() & QtGui.QPainter.RenderHint.Antialiasing
+
+
+def test_set_render_quality_updates_only_on_change(view):
+    with patch.object(view.viewport(), 'update') as update_mock:
+        view.set_render_quality(smooth=True)
+        update_mock.assert_not_called()
+        view.set_render_quality(smooth=False)
+        update_mock.assert_called_once_with()
+
+
+@patch('PyQt6.QtWidgets.QGraphicsView.mouseMoveEvent')
+@patch('beeref.view.BeeGraphicsView.begin_fast_rendering')
+def test_mouse_move_begins_fast_rendering_when_moving_items(
+        fast_mock, mouse_event_mock, view, item):
+    view.scene.addItem(item)
+    view.scene.move_active = True
+    event = MagicMock()
+    view.mouseMoveEvent(event)
+    mouse_event_mock.assert_called_once_with(event)
+    fast_mock.assert_called_once_with()
+
+
+@patch('PyQt6.QtWidgets.QGraphicsView.mouseMoveEvent')
+@patch('beeref.view.BeeGraphicsView.begin_fast_rendering')
+def test_mouse_move_keeps_smooth_rendering_when_idle(
+        fast_mock, mouse_event_mock, view):
+    event = MagicMock()
+    view.mouseMoveEvent(event)
+    fast_mock.assert_not_called()
+
+
+def test_on_action_viewport_cache(view):
+    view.on_action_viewport_cache(True)
+    assert view.viewport_cache is not None
+    view.on_action_viewport_cache(False)
+    assert view.viewport_cache is None
+
+
+def test_scale_transform(view):
+    view.setTransform(QtGui.QTransform(2, 0, 0, 2, 30, 40))
+    assert view.scale_transform() == QtGui.QTransform.fromScale(2, 2)
+
+
+def test_render_viewport_tile(view):
+    view.on_action_viewport_cache(True)
+    view.scale(2, 2)
+    img = QtGui.QImage(10, 10, QtGui.QImage.Format.Format_RGB32)
+    img.fill(QtGui.QColor(255, 0, 0))
+    item = BeePixmapItem(img)
+    item.setPos(64, 0)
+    view.scene.addItem(item)
+    tile = view.render_viewport_tile(0, 0)
+    assert tile.size() == QtCore.QSize(256, 256)
+    assert tile.pixelColor(140, 10) == QtGui.QColor(255, 0, 0)
+    assert tile.pixelColor(10, 10) == view.backgroundBrush().color()
+
+
+def test_paint_event_with_viewport_cache_uses_cached_tiles(view, item):
+    view.scene.addItem(item)
+    view.on_action_viewport_cache(True)
+    view.render_viewport_tile = MagicMock(
+        return_value=QtGui.QImage(
+            256, 256, QtGui.QImage.Format.Format_ARGB32_Premultiplied))
+    event = QtGui.QPaintEvent(QtCore.QRect(0, 0, 10, 10))
+    view.paintEvent(event)
+    count = view.render_viewport_tile.call_count
+    assert count > 0
+    view.paintEvent(event)
+    assert view.render_viewport_tile.call_count == count
+
+
+def test_on_scene_changed_invalidates_viewport_cache(view, item):
+    view.scene.addItem(item)
+    view.on_action_viewport_cache(True)
+    view.viewport_cache.invalidate = MagicMock()
+    view.on_scene_changed([QtCore.QRectF(10, 20, 30, 40)])
+    view.viewport_cache.invalidate.assert_called_once_with(
+        QtCore.QRectF(8, 18, 34, 44))
+
+
+def test_viewport_update_mode_default(view):
+    assert view.viewportUpdateMode() == (
+        QtWidgets.QGraphicsView.ViewportUpdateMode.MinimalViewportUpdate)
+
+
+def test_set_viewport_update_mode(view):
+    view.set_viewport_update_mode('full')
+    assert view.viewportUpdateMode() == (
+        QtWidgets.QGraphicsView.ViewportUpdateMode.FullViewportUpdate)
+
+
+def test_set_viewport_update_mode_when_unknown(view):
+    view.set_viewport_update_mode('full')
+    view.set_viewport_update_mode('foo')
+    assert view.viewportUpdateMode() == (
+        QtWidgets.QGraphicsView.ViewportUpdateMode.MinimalViewportUpdate)
+
+
+def test_on_selection_changed_does_not_repaint(view, item):
+    view.scene.addItem(item)
+    with patch.object(view.viewport(), 'repaint') as repaint_mock:
+        item.setSelected(True)
+        view.on_selection_changed()
+        repaint_mock.assert_not_called()
+
+
+def test_paint_event_counts_paints(view):
+    count = view.paint_count
+    view.paintEvent(QtGui.QPaintEvent(QtCore.QRect(0, 0, 10, 10)))
+    assert view.paint_count == count + 1
+
+
+def test_on_action_render_cache(view):
+    view.on_action_render_cache(True)
+    assert view.scene.render_cache is True
+    view.on_action_render_cache(False)
+    assert view.scene.render_cache is False
+
+
 def test_on_action_show_menubar(view):
     view.toplevel_menus = [QtWidgets.QMenu('Foo')]
     view.on_action_show_menubar(True)
@@ -598,6 +1005,7 @@ def test_pan(scroll_value_mock, view, item):
     view.scene.addItem(item)
     view.pan(QtCore.QPointF(5, 10))
     assert scroll_value_mock.call_count == 2
+    assert view.smooth_rendering_timer.isActive() is True
 
 
 @patch('PyQt6.QtWidgets.QScrollBar.setValue')
@@ -670,14 +1078,62 @@ def test_delta_zero(pan_mock, reset_mock, view, item):
     pan_mock.assert_not_called()
 
 
-@patch('beeref.view.BeeGraphicsView.zoom')
+@patch('beeref.view.BeeGraphicsView.zoom_by_factor')
 def test_wheel_event(zoom_mock, view):
     event = MagicMock()
     event.angleDelta.return_value = QtCore.QPointF(0, 40)
     event.position.return_value = QtCore.QPointF(10, 20)
     view.wheelEvent(event)
-    zoom_mock.assert_called_once_with(40, QtCore.QPointF(10, 20))
+    zoom_mock.assert_not_called()
+    assert view.input_timer.isActive() is True
     event.accept.assert_called_once_with()
+    view.flush_input()
+    zoom_mock.assert_called_once_with(1.04, QtCore.QPointF(10, 20))
+
+
+@patch('beeref.view.BeeGraphicsView.zoom_by_factor')
+def test_wheel_events_are_coalesced(zoom_mock, view):
+    event = MagicMock()
+    event.angleDelta.return_value = QtCore.QPointF(0, 40)
+    event.position.return_value = QtCore.QPointF(10, 20)
+    view.wheelEvent(event)
+    view.wheelEvent(event)
+    event.angleDelta.return_value = QtCore.QPointF(0, -100)
+    event.position.return_value = QtCore.QPointF(11, 21)
+    view.wheelEvent(event)
+    view.flush_input()
+    zoom_mock.assert_called_once()
+    factor, anchor = zoom_mock.call_args[0]
+    assert factor == approx(1.04 * 1.04 / 1.1)
+    assert anchor == QtCore.QPointF(11, 21)
+    assert view.pending_zoom_factor == 1
+
+
+@patch('beeref.view.BeeGraphicsView.zoom_by_factor')
+@patch('beeref.view.BeeGraphicsView.pan')
+def test_flush_input_pans_and_zooms(pan_mock, zoom_mock, view):
+    view.queue_pan(QtCore.QPointF(5, 6))
+    view.queue_pan(QtCore.QPointF(1, 2))
+    view.queue_zoom(40, QtCore.QPointF(10, 20))
+    view.flush_input()
+    pan_mock.assert_called_once_with(QtCore.QPointF(6, 8))
+    zoom_mock.assert_called_once_with(1.04, QtCore.QPointF(10, 20))
+    assert view.pending_pan == QtCore.QPointF(0, 0)
+    assert view.input_timer.isActive() is False
+
+
+@patch('beeref.view.BeeGraphicsView.zoom_by_factor')
+@patch('beeref.view.BeeGraphicsView.pan')
+def test_flush_input_when_nothing_pending(pan_mock, zoom_mock, view):
+    view.flush_input()
+    pan_mock.assert_not_called()
+    zoom_mock.assert_not_called()
+
+
+def test_queue_zoom_when_zero_delta(view):
+    view.queue_zoom(0, QtCore.QPointF(10, 20))
+    assert view.pending_zoom_factor == 1
+    assert view.input_timer.isActive() is False
 
 
 @patch('PyQt6.QtWidgets.QGraphicsView.mousePressEvent')
@@ -758,7 +1214,7 @@ def test_mouse_press_unhandled(mouse_event_mock, view):
 
 
 @patch('PyQt6.QtWidgets.QGraphicsView.mouseMoveEvent')
-@patch('beeref.view.BeeGraphicsView.pan')
+@patch('beeref.view.BeeGraphicsView.queue_pan')
 def test_mouse_move_pan(pan_mock, mouse_event_mock, view):
     view.pan_active = True
     view.event_start = QtCore.QPointF(55, 66)
@@ -771,7 +1227,7 @@ def test_mouse_move_pan(pan_mock, mouse_event_mock, view):
 
 
 @patch('PyQt6.QtWidgets.QGraphicsView.mouseMoveEvent')
-@patch('beeref.view.BeeGraphicsView.zoom')
+@patch('beeref.view.BeeGraphicsView.queue_zoom')
 def test_mouse_move_zoom(zoom_mock, mouse_event_mock, view):
     view.zoom_active = True
     view.event_anchor = QtCore.QPointF(55, 66)
@@ -811,7 +1267,9 @@ def test_mouse_release_pan(mouse_event_mock, view):
     event = MagicMock()
     view.pan_active = True
     view.setCursor(Qt.CursorShape.ClosedHandCursor)
+    view.flush_input = MagicMock()
     view.mouseReleaseEvent(event)
+    view.flush_input.assert_called_once_with()
     mouse_event_mock.assert_not_called()
     assert view.pan_active is False
     event.accept.assert_called_once_with()
@@ -822,7 +1280,9 @@ def test_mouse_release_pan(mouse_event_mock, view):
 def test_mouse_release_zoom(mouse_event_mock, view):
     event = MagicMock()
     view.zoom_active = True
+    view.flush_input = MagicMock()
     view.mouseReleaseEvent(event)
+    view.flush_input.assert_called_once_with()
     mouse_event_mock.assert_not_called()
     assert view.zoom_active is False
     event.accept.assert_called_once_with()
@@ -939,3 +1399,52 @@ def test_drop_when_img(view, imgfilename3x3):
     view.dropEvent(event)
     assert len(view.scene.items()) == 1
     assert view.scene.items()[0].isSelected() is True
+
+
+def test_do_insert_image_data_inserts_placeholder(
+        view, imgfilename3x3, qtbot):
+    view.do_insert_image_data(
+        QtGui.QImage(imgfilename3x3), QtCore.QPointF(10, 20))
+    assert len(view.scene.items()) == 1
+    item = view.scene.items()[0]
+    assert item.is_placeholder is True
+    assert item.center_scene_coords == QtCore.QPointF(10, 20)
+    qtbot.waitUntil(lambda: item.is_placeholder is False)
+    assert item.pixmap().size() == QtCore.QSize(3, 3)
+    assert item.center_scene_coords == QtCore.QPointF(10, 20)
+    assert view.undo_stack.count() == 1
+
+
+@patch('PyQt6.QtWidgets.QMessageBox.warning')
+def test_do_insert_image_data_when_error(warning_mock, view, qtbot):
+    view.do_insert_image_data(b'foo', QtCore.QPointF(10, 20))
+    qtbot.waitUntil(lambda: warning_mock.called is True)
+    assert view.scene.items() == []
+    assert view.undo_stack.count() == 0
+    qtbot.waitUntil(lambda: view.image_data_workers == [])
+
+
+@patch('PyQt6.QtWidgets.QMessageBox.warning')
+def test_do_insert_image_data_when_error_after_other_command(
+        warning_mock, view, qtbot):
+    view.do_insert_image_data(b'foo', QtCore.QPointF(10, 20))
+    view.undo_stack.push(commands.InsertItems(
+        view.scene, [BeeTextItem('foo')]))
+    qtbot.waitUntil(lambda: warning_mock.called is True)
+    assert len(view.scene.items()) == 1
+    view.undo_stack.undo()
+    view.undo_stack.undo()
+    assert view.scene.items() == []
+    assert view.undo_stack.count() == 1
+    assert view.undo_stack.index() == 0
+
+
+@patch('PyQt6.QtWidgets.QMessageBox.warning')
+@patch('beeref.fileio.save_bee')
+def test_do_save_while_image_data_loading(
+        save_mock, warning_mock, view, tmpdir):
+    item = BeePixmapItem.create_placeholder(QtCore.QSize(3, 3))
+    view.scene.addItem(item)
+    view.do_save(os.path.join(tmpdir, 'test.bee'), create_new=True)
+    warning_mock.assert_called_once()
+    save_mock.assert_not_called()
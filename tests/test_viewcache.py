@@ -0,0 +1,109 @@
+from unittest.mock import MagicMock
+
+from PyQt6 import QtCore, QtGui
+
+from beeref.viewcache import ViewportTileCache
+
+
+def make_tile(size=16):
+    return QtGui.QImage(size, size, QtGui.QImage.Format.Format_RGB32)
+
+
+def test_tiles_for_rect():
+    cache = ViewportTileCache(budget=1000, tile_size=16)
+    assert list(cache.tiles_for_rect(QtCore.QRectF(-5, 10, 30, 10))) == [
+        (-1, 0), (0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)]
+
+
+def test_tiles_for_rect_when_empty():
+    cache = ViewportTileCache(budget=1000, tile_size=16)
+    assert list(cache.tiles_for_rect(QtCore.QRectF())) == []
+
+
+def test_tile_rect():
+    cache = ViewportTileCache(budget=1000, tile_size=16)
+    assert cache.tile_rect(-1, 2) == QtCore.QRectF(-16, 32, 16, 16)
+
+
+def test_get_renders_once():
+    cache = ViewportTileCache(budget=10000, tile_size=16)
+    render = MagicMock(return_value=make_tile())
+    tile = cache.get(1, 2, render)
+    assert cache.get(1, 2, render) is tile
+    render.assert_called_once_with(1, 2)
+    assert cache.size == tile.sizeInBytes()
+
+
+def test_get_evicts_least_recently_used():
+    cache = ViewportTileCache(budget=2 * make_tile().sizeInBytes(),
+                              tile_size=16)
+    cache.get(0, 0, lambda col, row: make_tile())
+    cache.get(1, 0, lambda col, row: make_tile())
+    cache.get(0, 0, lambda col, row: make_tile())
+    cache.get(2, 0, lambda col, row: make_tile())
+    assert list(cache.tiles.keys()) == [(0, 0, 0), (0, 2, 0)]
+    assert cache.size == 2 * make_tile().sizeInBytes()
+
+
+def test_invalidate():
+    cache = ViewportTileCache(budget=10000, tile_size=16)
+    for col in range(3):
+        cache.get(col, 0, lambda col, row: make_tile())
+    cache.invalidate(QtCore.QRectF(20, 5, 2, 2))
+    assert list(cache.tiles.keys()) == [(0, 0, 0), (0, 2, 0)]
+    assert cache.size == 2 * make_tile().sizeInBytes()
+
+
+def test_invalidate_huge_rect():
+    cache = ViewportTileCache(budget=10000, tile_size=16)
+    cache.get(0, 0, lambda col, row: make_tile())
+    cache.get(5, 0, lambda col, row: make_tile())
+    cache.invalidate(QtCore.QRectF(-1e9, -1e9, 1e9 + 20, 2e9))
+    assert list(cache.tiles.keys()) == [(0, 5, 0)]
+
+
+def test_invalidate_when_empty_rect():
+    cache = ViewportTileCache(budget=10000, tile_size=16)
+    cache.get(0, 0, lambda col, row: make_tile())
+    cache.invalidate(QtCore.QRectF())
+    assert len(cache) == 1
+
+
+def test_invalidate_drops_tiles_of_all_render_hints():
+    cache = ViewportTileCache(budget=10000, tile_size=16)
+    cache.set_key(QtGui.QTransform(), 1.0,
+                  QtGui.QPainter.RenderHint.Antialiasing)
+    cache.get(0, 0, lambda col, row: make_tile())
+    cache.set_key(QtGui.QTransform(), 1.0, QtGui.QPainter.RenderHint(0))
+    cache.get(0, 0, lambda col, row: make_tile())
+    cache.invalidate(QtCore.QRectF(5, 5, 2, 2))
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+def test_set_key_clears_on_change():
+    cache = ViewportTileCache(budget=10000, tile_size=16)
+    hints = QtGui.QPainter.RenderHint.Antialiasing
+    cache.set_key(QtGui.QTransform(), 1.0, hints)
+    cache.get(0, 0, lambda col, row: make_tile())
+    cache.set_key(QtGui.QTransform(), 1.0, hints)
+    assert len(cache) == 1
+    cache.set_key(QtGui.QTransform.fromScale(2, 2), 1.0, hints)
+    assert len(cache) == 0
+    assert cache.size == 0
+
+
+def test_set_key_keeps_tiles_per_render_hints():
+    cache = ViewportTileCache(budget=10000, tile_size=16)
+    smooth = QtGui.QPainter.RenderHint.Antialiasing
+    fast = QtGui.QPainter.RenderHint(0)
+    cache.set_key(QtGui.QTransform(), 1.0, smooth)
+    smooth_tile = cache.get(0, 0, lambda col, row: make_tile())
+    cache.set_key(QtGui.QTransform(), 1.0, fast)
+    fast_tile = cache.get(0, 0, lambda col, row: make_tile())
+    assert fast_tile is not smooth_tile
+    assert len(cache) == 2
+    cache.set_key(QtGui.QTransform(), 1.0, smooth)
+    render = MagicMock()
+    assert cache.get(0, 0, render) is smooth_tile
+    render.assert_not_called()